@@ -1133,7 +1133,7 @@ namespace TeknoParrotBigBox
             return null;
         }
 
-        private static readonly string[] VideoExtensions = { ".mp4", ".avi", ".webm", ".mkv", ".wmv", ".m4v" };
+        private static readonly string[] VideoExtensions = { ".mp4", ".avi", ".webm", ".mkv", ".wmv", ".m4v", ".mov" };
 
         private static string ResolveVideoPath(string videosDir, string profileId, string displayName)
         {
@@ -1145,6 +1145,9 @@ namespace TeknoParrotBigBox
                 string TryVideo(string baseName)
                 {
                     if (string.IsNullOrWhiteSpace(baseName)) return null;
+                    // build_video_previews.py 生成的预览片段（短小、moov 前置）优先
+                    var preview = Path.Combine(videosDir, "previews", baseName + ".mp4");
+                    if (File.Exists(preview)) return preview;
                     foreach (var ext in VideoExtensions)
                     {
                         var path = Path.Combine(videosDir, baseName + ext);
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+稀疏二分图最大权匹配（允许不匹配），用于「游戏 -> 图片」的全局最优分配。
+
+输入只包含候选边（例如每个游戏相似度最高的前 k 张图片），
+按左侧顶点逐个加入，每次用带势能的 Dijkstra 在残量图上找一条最短增广路
+（稀疏版匈牙利算法 / successive shortest path）。
+每个左侧顶点都有一条权重为 0 的「不匹配」边，因此结果是总权重最大的匹配，
+而不要求所有顶点都被匹配。
+
+Dijkstra 在弹出汇点后立即停止，只更新访问过的顶点的势能；
+大多数图片都还空闲时，增广路很短，单次搜索只涉及很小的局部。
+"""
+
+from __future__ import annotations
+
+import heapq
+from typing import Dict, Hashable, Iterable, Optional, Tuple
+
+
+_SINK = ("T", None)
+
+
+def max_weight_matching(
+    edges: Dict[Hashable, Dict[Hashable, float]],
+    order: Optional[Iterable[Hashable]] = None,
+) -> Dict[Hashable, Hashable]:
+    """
+    edges: { 左顶点: { 右顶点: 权重(>0) } }
+    order: 左顶点的加入顺序（只影响等权时的取舍），默认按 edges 的顺序。
+    返回: { 左顶点: 右顶点 }，只包含被匹配的左顶点。
+    """
+    match_left: Dict[Hashable, Hashable] = {}
+    match_right: Dict[Hashable, Hashable] = {}
+    # 势能：reduced(x->y) = cost(x->y) + pot[x] - pot[y] >= 0，汇点势能恒为 0
+    pot: Dict[Tuple[str, Hashable], float] = {}
+
+    for u in (order if order is not None else edges):
+        adj = edges.get(u)
+        if not adj:
+            continue
+
+        src = ("L", u)
+        pot[src] = max(0.0, max(w + pot.get(("R", v), 0.0) for v, w in adj.items()))
+
+        dist: Dict[Tuple[str, Hashable], float] = {src: 0.0}
+        parent: Dict[Tuple[str, Hashable], Tuple[str, Hashable]] = {}
+        done = set()
+        heap = [(0.0, 0, src)]
+        counter = 1
+        dist_sink = None
+
+        while heap:
+            d, _, node = heapq.heappop(heap)
+            if node in done:
+                continue
+            done.add(node)
+            if node == _SINK:
+                dist_sink = d
+                break
+
+            kind, key = node
+            if kind == "L":
+                p_node = pot[node]
+                # 不匹配：左顶点直接到汇点，cost 0
+                steps = [(_SINK, d + p_node)]
+                current = match_left.get(key)
+                for v, w in edges[key].items():
+                    if v == current:
+                        continue
+                    r_node = ("R", v)
+                    steps.append((r_node, d - w + p_node - pot.get(r_node, 0.0)))
+            else:
+                owner = match_right.get(key)
+                p_node = pot.get(node, 0.0)
+                if owner is None:
+                    steps = [(_SINK, d + p_node)]
+                else:
+                    l_node = ("L", owner)
+                    steps = [(l_node, d + edges[owner][key] + p_node - pot[l_node])]
+
+            for nxt, nd in steps:
+                if nxt in done:
+                    continue
+                if nd < dist.get(nxt, float("inf")):
+                    dist[nxt] = nd
+                    parent[nxt] = node
+                    heapq.heappush(heap, (nd, counter, nxt))
+                    counter += 1
+
+        # 汇点总能到达（至少有 u -> 不匹配），这里只是防御
+        if dist_sink is None:
+            continue
+
+        for node in done:
+            if node != _SINK:
+                pot[node] = pot.get(node, 0.0) + dist[node] - dist_sink
+
+        # 沿 parent 回溯增广
+        node = _SINK
+        prev = parent[node]
+        if prev[0] == "L":
+            # 以「不匹配」结束：该左顶点放弃原来的匹配
+            old = match_left.pop(prev[1], None)
+            if old is not None:
+                match_right.pop(old, None)
+        node = prev
+        while node != src:
+            prev = parent[node]
+            if node[0] == "R" and prev[0] == "L":
+                left, right = prev[1], node[1]
+                match_left[left] = right
+                match_right[right] = left
+            node = prev
+
+    return match_left
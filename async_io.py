@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+高延迟目录（SMB / NAS 共享）上的并发文件发现与读取。
+
+脚本中的每次 os.stat / os.scandir / 读 bat 首行、profile XML，在网络共享上都要等一次往返；
+逐个执行时这些延迟直接相加。这里用 asyncio 把阻塞调用交给线程池执行，
+并用信号量限制同时进行中的请求数（--io-concurrency），让各文件的等待相互重叠。
+结果及其顺序与逐个调用完全相同。
+
+    from async_io import map_limited, stat_many, walk_files
+
+    stats = stat_many(paths, limit=16)                  # [os.stat_result 或 None, ...]
+    values = map_limited(read_first_line, paths, 16)    # 按 paths 顺序返回
+
+本机磁盘上收益很小；limit <= 1 时退化为逐个执行，不创建事件循环。
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+DEFAULT_CONCURRENCY = 16
+
+
+async def _gather_limited(func: Callable[[T], R], items: List[T], limit: int) -> List[R]:
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(limit)
+    with ThreadPoolExecutor(max_workers=limit) as pool:
+
+        async def run_one(item: T) -> R:
+            async with semaphore:
+                return await loop.run_in_executor(pool, func, item)
+
+        return await asyncio.gather(*(run_one(item) for item in items))
+
+
+def map_limited(
+    func: Callable[[T], R],
+    items: Iterable[T],
+    limit: int = DEFAULT_CONCURRENCY,
+) -> List[R]:
+    """
+    对每个 item 调用 func（阻塞 I/O），最多 limit 个同时进行；返回与 items 顺序一致的结果。
+    func 抛出的异常会原样抛出，需要逐个容错时由 func 自行捕获。
+    """
+    items = list(items)
+    if limit <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+    return asyncio.run(_gather_limited(func, items, limit))
+
+
+def _stat_or_none(path: str) -> Optional[os.stat_result]:
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
+
+def stat_many(paths: Iterable[str], limit: int = DEFAULT_CONCURRENCY) -> List[Optional[os.stat_result]]:
+    """并发 os.stat；文件不存在或无法访问时对应位置为 None。"""
+    return map_limited(_stat_or_none, paths, limit)
+
+
+def _list_dir(path: str) -> Optional[Tuple[List[str], List[str]]]:
+    """
+    返回 (需要递归的子目录名, 文件名)，顺序与 os.scandir 一致；无法列出时返回 None。
+    与 os.walk 相同，不进入符号链接目录。
+    """
+    dirs: List[str] = []
+    files: List[str] = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if not is_dir:
+                    files.append(entry.name)
+                elif not entry.is_symlink():
+                    dirs.append(entry.name)
+    except OSError:
+        return None
+    return dirs, files
+
+
+def walk_files(
+    top: str,
+    limit: int = DEFAULT_CONCURRENCY,
+) -> List[Tuple[str, List[str]]]:
+    """
+    与 [(root, files) for root, _dirs, files in os.walk(top)] 结果相同（自顶向下、同样的顺序），
+    但同一层的各目录并发列出，目录层数多、每层目录多时往返次数大大减少。
+    """
+    listings: Dict[str, Optional[Tuple[List[str], List[str]]]] = {}
+    level = [top]
+    while level:
+        for path, listing in zip(level, map_limited(_list_dir, level, limit)):
+            listings[path] = listing
+        level = [
+            os.path.join(path, d)
+            for path in level if listings[path] is not None
+            for d in listings[path][0]
+        ]
+
+    out: List[Tuple[str, List[str]]] = []
+    stack = [top]
+    while stack:
+        path = stack.pop()
+        listing = listings[path]
+        if listing is None:
+            continue  # 与 os.walk 相同：无法列出的目录直接跳过
+        dirs, files = listing
+        out.append((path, files))
+        stack.extend(os.path.join(path, d) for d in reversed(dirs))
+    return out
+
+
+def add_io_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--io-concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help="stat / 读取 bat、profile XML 时同时进行的请求数，"
+        "网络共享上可调大（默认 %d；1 = 逐个执行）" % DEFAULT_CONCURRENCY,
+    )
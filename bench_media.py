@@ -0,0 +1,370 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+媒体脚本的基准测试：在 synthetic_library.py 生成的模拟游戏库上，
+分阶段测量各流程在 1k / 10k / 100k 规模下的耗时与内存峰值。
+
+阶段:
+    xml_load            流式解析 Teknoparrot.xml（extract_launchbox_descriptions 的字段）
+    profile_cold        无缓存解析全部 bat 的 profileId 与 UserProfiles 的 GamePath
+    profile_warm        同上，缓存已存在（只 stat 不读文件）
+    index_build         扫描封面目录、规范化文件名并建立 n-gram 索引
+    matching            Metadata game_name -> 图片的贪心匹配
+    transfer            将 Box - 3D 封面并发复制到临时目标目录
+
+每个阶段在单独的子进程中运行，前置数据（例如匹配所需的索引）在计时开始前准备好；
+记录墙钟时间、CPU 时间与该子进程的内存峰值（峰值包含前置数据）。
+
+使用方式:
+
+    python bench_media.py                                  # 默认 1000,10000 两种规模
+    python bench_media.py --sizes 1000,10000,100000
+    python bench_media.py --save-baseline bench_baseline.json
+    python bench_media.py --baseline bench_baseline.json   # 与基线比较，耗时或内存峰值超出阈值视为回归
+
+模拟库默认生成在系统临时目录的 teknoparrot_bench 下，参数相同时复用。
+结果同时写入 bench_output.txt（可用 --output 修改）。
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_WORK_DIR = os.path.join(tempfile.gettempdir(), "teknoparrot_bench")
+DEFAULT_OUTPUT = os.path.join(BASE_DIR, "bench_output.txt")
+
+STAGES = (
+    "xml_load",
+    "profile_cold",
+    "profile_warm",
+    "index_build",
+    "matching",
+    "transfer",
+)
+
+LIBRARY_MARKER = ".synthetic_library.json"
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """当前进程的内存峰值（字节）；无法获取时返回 None。"""
+    # Linux 的 ru_maxrss 会跨 exec 继承父进程的峰值，优先读取只属于本进程的 VmHWM
+    try:
+        with io.open("/proc/self/status", "r", encoding="ascii") as fp:
+            for line in fp:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (IOError, OSError, ValueError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        resource = None
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 以 KB 为单位，macOS 以字节为单位
+        return peak if sys.platform == "darwin" else peak * 1024
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        handle = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+            return int(counters.PeakWorkingSetSize)
+    return None
+
+
+# ---------- 子进程：运行单个阶段 ----------
+
+def _list_files(directory: str, suffix: str) -> List[str]:
+    return sorted(
+        os.path.join(directory, f) for f in os.listdir(directory) if f.lower().endswith(suffix)
+    )
+
+
+def _prepare_and_run(stage: str, root: str) -> Dict:
+    """准备阶段所需数据后计时运行，返回 {"count": 处理条目数, ...}。"""
+    from extract_launchbox_descriptions import GAME_FIELDS
+    from launchbox_xml import iter_launchbox_games
+    from profile_cache import ProfileResolutionCache
+    from profile_scanner import scan_profiles
+
+    xml_path = os.path.join(root, "Teknoparrot.xml")
+    bat_dir = os.path.join(root, "bat")
+    profiles_dir = os.path.join(root, "UserProfiles")
+    cache_path = os.path.join(root, "bench_profile_cache.json")
+
+    def resolve_profiles(cache: ProfileResolutionCache) -> int:
+        count = 0
+        for path in _list_files(bat_dir, ".bat"):
+            if cache.bat_profile_id(path):
+                count += 1
+        for info in scan_profiles([profiles_dir], cache).values():
+            if info["game_path"]:
+                count += 1
+        cache.save()
+        return count
+
+    if stage == "xml_load":
+        start = _start()
+        count = sum(1 for _ in iter_launchbox_games(xml_path, GAME_FIELDS))
+        return _finish(start, count)
+
+    if stage == "profile_cold":
+        start = _start()
+        count = resolve_profiles(ProfileResolutionCache(cache_path, rebuild=True))
+        return _finish(start, count)
+
+    if stage == "profile_warm":
+        if not os.path.isfile(cache_path):
+            resolve_profiles(ProfileResolutionCache(cache_path, rebuild=True))
+        start = _start()
+        count = resolve_profiles(ProfileResolutionCache(cache_path))
+        return _finish(start, count)
+
+    from fuzzy_match import FuzzyIndex
+    from match_keys import normalize_for_match
+    from rename_covers_from_metadata import assign_greedy, collect_images, load_metadata
+
+    covers_dir = os.path.join(root, "covers")
+    if stage == "index_build":
+        start = _start()
+        images, _dirs = collect_images(covers_dir)
+        index = FuzzyIndex([normalize_for_match(base) for _, base in images])
+        return _finish(start, len(index.keys))
+
+    if stage == "matching":
+        images, _dirs = collect_images(covers_dir)
+        index = FuzzyIndex([normalize_for_match(base) for _, base in images])
+        metadata, _dirs = load_metadata(os.path.join(root, "Metadata"))
+        ordered = sorted(metadata.items(), key=lambda x: -len(x[1]))
+        start = _start()
+        assigned = assign_greedy(ordered, index, 0.25)
+        result = _finish(start, len(assigned))
+        result["comparisons"] = index.comparisons
+        return result
+
+    if stage == "transfer":
+        from media_transfer import TransferTask, run_transfers
+
+        dest_dir = os.path.join(root, "bench_dest")
+        shutil.rmtree(dest_dir, ignore_errors=True)
+        os.makedirs(dest_dir)
+        box3d = os.path.join(covers_dir, "Box - 3D")
+        tasks = [
+            TransferTask(path, os.path.join(dest_dir, "{}.png".format(i)))
+            for i, path in enumerate(_list_files(box3d, "-01.png"))
+        ]
+        start = _start()
+        results = run_transfers(tasks, jobs=4)
+        result = _finish(start, sum(1 for r in results if r.ok))
+        shutil.rmtree(dest_dir, ignore_errors=True)
+        return result
+
+    raise ValueError("未知阶段: {}".format(stage))
+
+
+def _start() -> Dict[str, float]:
+    return {"wall": time.perf_counter(), "cpu": time.process_time()}
+
+
+def _finish(start: Dict[str, float], count: int) -> Dict:
+    return {
+        "wall": time.perf_counter() - start["wall"],
+        "cpu": time.process_time() - start["cpu"],
+        "count": count,
+    }
+
+
+def run_stage_child(stage: str, root: str) -> int:
+    result = _prepare_and_run(stage, root)
+    result["peak_rss"] = peak_rss_bytes()
+    print(json.dumps(result))
+    return 0
+
+
+# ---------- 主进程：生成模拟库、调度各阶段、比较基线 ----------
+
+def ensure_library(work_dir: str, games: int, seed: int) -> str:
+    """参数相同的模拟库已存在时直接复用，否则重新生成。"""
+    from synthetic_library import generate_library
+
+    root = os.path.join(work_dir, "lib_{}_s{}".format(games, seed))
+    marker = os.path.join(root, LIBRARY_MARKER)
+    params = {"games": games, "seed": seed}
+    if os.path.isfile(marker):
+        try:
+            with io.open(marker, "r", encoding="utf-8") as fp:
+                if json.load(fp) == params:
+                    return root
+        except Exception:
+            pass
+    shutil.rmtree(root, ignore_errors=True)
+    print("生成模拟游戏库: {} 个游戏 -> {}".format(games, root))
+    started = time.perf_counter()
+    generate_library(root, games, seed)
+    with io.open(marker, "w", encoding="utf-8") as fp:
+        json.dump(params, fp)
+    print("  生成耗时 {:.1f} s".format(time.perf_counter() - started))
+    return root
+
+
+def run_stage(stage: str, root: str) -> Dict:
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--run-stage", stage, "--root", root],
+        cwd=BASE_DIR,
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def compare_baseline(
+    results: Dict[str, Dict],
+    baseline: Dict[str, Dict],
+    threshold: float,
+    rss_threshold: float,
+) -> List[str]:
+    """
+    返回回归说明列表：耗时超出基线 threshold（比例）、或内存峰值超出基线 rss_threshold 的阶段。
+    任一方没有内存峰值（无法获取）时不比较内存。
+    """
+    regressions: List[str] = []
+    for key, current in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        if base.get("wall"):
+            ratio = current["wall"] / base["wall"]
+            if ratio > 1.0 + threshold:
+                regressions.append(
+                    "{} 耗时: {:.3f}s -> {:.3f}s (x{:.2f})".format(key, base["wall"], current["wall"], ratio)
+                )
+        if base.get("peak_rss") and current.get("peak_rss"):
+            ratio = float(current["peak_rss"]) / base["peak_rss"]
+            if ratio > 1.0 + rss_threshold:
+                regressions.append(
+                    "{} 内存峰值: {}MB -> {}MB (x{:.2f})".format(
+                        key, _format_rss(base["peak_rss"]), _format_rss(current["peak_rss"]), ratio
+                    )
+                )
+    return regressions
+
+
+def _format_rss(value: Optional[int]) -> str:
+    return "{:.1f}".format(value / 1048576.0) if value else "-"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="在模拟游戏库上分阶段测量媒体脚本的耗时与内存峰值")
+    parser.add_argument("--sizes", default="1000,10000", help="游戏数量，逗号分隔（默认 1000,10000）")
+    parser.add_argument("--stages", default=",".join(STAGES), help="要运行的阶段，逗号分隔（默认全部）")
+    parser.add_argument("--seed", type=int, default=1, help="模拟库随机种子（默认 1）")
+    parser.add_argument("--work-dir", default=DEFAULT_WORK_DIR, help="模拟库存放目录")
+    parser.add_argument("--repeat", type=int, default=1, help="每个阶段重复次数，取最短耗时（默认 1）")
+    parser.add_argument("--baseline", help="与该基线 JSON 比较")
+    parser.add_argument("--save-baseline", help="把本次结果保存为基线 JSON")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="耗时超出基线的比例阈值，超过即视为回归（默认 0.2 = 20%%）",
+    )
+    parser.add_argument(
+        "--rss-threshold",
+        type=float,
+        default=0.2,
+        help="内存峰值超出基线的比例阈值，超过即视为回归（默认 0.2 = 20%%）",
+    )
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="结果文本输出路径（默认 bench_output.txt）")
+    parser.add_argument("--run-stage", help=argparse.SUPPRESS)
+    parser.add_argument("--root", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_stage:
+        return run_stage_child(args.run_stage, args.root)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        print("未知阶段:", ", ".join(unknown))
+        return 1
+
+    results: Dict[str, Dict] = {}
+    lines = ["{:<10} {:<14} {:>9} {:>9} {:>10} {:>9}".format(
+        "games", "stage", "wall(s)", "cpu(s)", "rss(MB)", "count")]
+    for games in sizes:
+        root = ensure_library(args.work_dir, games, args.seed)
+        for stage in stages:
+            best = None
+            for _ in range(max(1, args.repeat)):
+                result = run_stage(stage, root)
+                if best is None or result["wall"] < best["wall"]:
+                    best = result
+            results["{}/{}".format(games, stage)] = best
+            line = "{:<10} {:<14} {:>9.3f} {:>9.3f} {:>10} {:>9}".format(
+                games, stage, best["wall"], best["cpu"], _format_rss(best["peak_rss"]), best["count"])
+            print(line)
+            lines.append(line)
+
+    status = 0
+    if args.baseline:
+        with io.open(args.baseline, "r", encoding="utf-8") as fp:
+            baseline = json.load(fp)
+        regressions = compare_baseline(
+            results, baseline.get("results", {}), args.threshold, args.rss_threshold
+        )
+        lines.append("")
+        if regressions:
+            lines.append("相对基线的回归（耗时阈值 {:.0f}%，内存阈值 {:.0f}%）:".format(
+                args.threshold * 100, args.rss_threshold * 100))
+            lines.extend("  " + r for r in regressions)
+            status = 2
+        else:
+            lines.append("与基线相比没有超出阈值的阶段")
+        print("\n".join(lines[-(len(regressions) + 1 if regressions else 1):]))
+
+    if args.save_baseline:
+        with io.open(args.save_baseline, "w", encoding="utf-8") as fp:
+            json.dump(
+                {"python": sys.version.split()[0], "platform": sys.platform, "results": results},
+                fp,
+                indent=2,
+                sort_keys=True,
+            )
+        print("已保存基线:", args.save_baseline)
+
+    with io.open(args.output, "w", encoding="utf-8") as fp:
+        fp.write("\n".join(lines) + "\n")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
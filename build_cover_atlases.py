@@ -0,0 +1,462 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+把每个分类的封面缩略图拼成少量图集（atlas），封面墙切换分类时只需解码一两张大图，
+而不是逐个打开 Media/Covers 下的几百个文件。
+
+在 build_cover_thumbnails.py 之后运行:
+
+    python build_cover_atlases.py
+    python build_cover_atlases.py --force     # 丢弃旧索引，全部重新分配、重新拼图
+
+分类（与封面墙 MainWindow.xaml.cs 的分组一致，图集才能按分类整张使用）:
+    __favorites      favorites.json 中的收藏（按收藏顺序；去首尾空白、不区分大小写）
+    {分类}           Metadata/{profileId}.json 的 game_genre 优先，其次 launchbox_descriptions.json 的
+                     genre，按 GetLocalizedCategory 的规则本地化（如 Racing / Driving 都归为「竞速」；
+                     都为空时为「未分类」）；分类名不区分大小写
+
+输出（Media/Covers/atlases/）:
+    {分类}-{短哈希}_{序号}.jpg|.png    图集：固定网格，每格 200×300（与 thumb 尺寸一致），
+                                         每张最多 10 列 × 6 行；有透明封面时保存为 PNG
+    atlas_index.json                     索引：
+        { "version", "cell": [宽, 高],
+          "atlases": { 图集名: { "file", "category", "width", "height", "slots", "signature" } },
+          "categories": { 分类: { profileId: { "atlas", "x", "y", "w", "h" } } } }
+
+增量:
+- 已在某张图集中的封面保持原来的格子；新封面填入该分类图集的空格，满了才新建图集；
+  已删除的封面只空出格子，不移动其它封面。
+- 每张图集记录其格子内容（profileId + 缩略图哈希）的签名，签名未变且文件仍在时不重新拼图，
+  因此修改一张封面只会重新生成它所在的图集。
+
+依赖 Pillow（pip install Pillow）。
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from build_cover_thumbnails import COVERS_DIR, MANIFEST_NAME, Image
+from media_metrics import add_metrics_arguments, count, finish_metrics, stage
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FAVORITES_JSON = os.path.join(BASE_DIR, "favorites.json")
+METADATA_DIR = os.path.join(BASE_DIR, "Metadata")
+LAUNCHBOX_DESCRIPTIONS_JSON = os.path.join(BASE_DIR, "launchbox_descriptions.json")
+
+ATLAS_DIR_NAME = "atlases"
+INDEX_NAME = "atlas_index.json"
+INDEX_VERSION = 1
+
+VARIANT = "thumb"
+CELL_WIDTH = 200
+CELL_HEIGHT = 300
+ATLAS_COLUMNS = 10
+ATLAS_ROWS = 6
+SLOTS_PER_ATLAS = ATLAS_COLUMNS * ATLAS_ROWS
+JPEG_QUALITY = 88
+
+FAVORITES_CATEGORY = "__favorites"
+UNCATEGORIZED = "未分类"
+
+# 英文类型 -> 中文分类名，与 MainWindow.xaml.cs 的 GetLocalizedCategory 保持一致（修改时两边同步）
+LOCALIZED_GENRES = {
+    "action": "动作",
+    "fighting": "格斗",
+    "racing": "竞速",
+    "driving": "竞速",
+    "shooter": "射击",
+    "light gun": "射击",
+    "first person shooter": "射击",
+    "fps": "射击",
+    "music": "音乐",
+    "music/rhythm": "音乐",
+    "sports": "体育",
+    "platform": "平台",
+    "platformer": "平台",
+    "puzzle": "益智",
+    "rhythm": "节奏",
+    "beat 'em up": "横版过关",
+    "beat'em up": "横版过关",
+    "beat em up": "横版过关",
+    "adventure": "冒险",
+    "adventure game": "冒险",
+    "simulation": "模拟",
+    "sim": "模拟",
+    "role-playing": "角色扮演",
+    "roleplaying": "角色扮演",
+    "rpg": "角色扮演",
+    "arcade": "街机",
+    "misc": "其他",
+    "miscellaneous": "其他",
+    "other": "其他",
+    "pinball": "弹珠",
+    "card": "卡牌",
+    "card game": "卡牌",
+    "board": "桌游",
+    "board game": "桌游",
+    "trivia": "问答",
+    "compilation": "合集",
+    "party": "聚会",
+    "party game": "聚会",
+    "horror": "恐怖",
+    "strategy": "策略",
+    "flight": "飞行",
+    "flight simulation": "飞行",
+}
+
+
+def _load_json(path: str):
+    if not os.path.isfile(path):
+        return None
+    try:
+        with io.open(path, "r", encoding="utf-8") as fp:
+            return json.load(fp)
+    except (IOError, OSError, ValueError) as exc:
+        print("读取失败:", path, "错误:", exc)
+        return None
+
+
+def localized_category(meta_genre: Optional[str], lb_genre: Optional[str]) -> str:
+    """MainWindow.xaml.cs GetLocalizedCategory 的 Python 版本：Metadata 的类型优先，再本地化。"""
+    raw = ""
+    if meta_genre and meta_genre.strip():
+        raw = meta_genre.strip()
+    elif lb_genre and lb_genre.strip():
+        raw = lb_genre.strip()
+    if not raw:
+        return UNCATEGORIZED
+    # 本身已含中文时直接使用
+    if any("\u4e00" <= c <= "\u9fff" for c in raw):
+        return raw
+    return LOCALIZED_GENRES.get(raw.lower(), raw)
+
+
+def _genre_field(entry, key: str) -> Optional[str]:
+    value = entry.get(key) if isinstance(entry, dict) else None
+    return value if isinstance(value, str) else None
+
+
+def load_metadata_genres(profile_ids: List[str]) -> Dict[str, str]:
+    """
+    读取 Metadata/{profileId}.json 的 game_genre（文件名不区分大小写，与前端一致），
+    只读给定 profile 的文件；返回 { 小写 profileId: game_genre }。
+    """
+    if not os.path.isdir(METADATA_DIR):
+        return {}
+    wanted = {p.lower() for p in profile_ids}
+    genres: Dict[str, str] = {}
+    for fname in os.listdir(METADATA_DIR):
+        stem, ext = os.path.splitext(fname)
+        if ext.lower() != ".json" or stem.lower() not in wanted:
+            continue
+        genre = _genre_field(_load_json(os.path.join(METADATA_DIR, fname)), "game_genre")
+        if genre is not None:
+            genres[stem.lower()] = genre
+    return genres
+
+
+def load_categories(thumbs: Dict[str, Dict]) -> Dict[str, List[str]]:
+    """
+    返回 { 分类: [profileId, ...] }，只包含已有缩略图的 profile。
+    收藏按 favorites.json 的顺序，其余分类按 profileId 排序。
+    profileId 与分类名的比较都不区分大小写（与封面墙的字典一致），分类名取第一次出现时的写法。
+    """
+    categories: Dict[str, List[str]] = {}
+    by_lower = {profile_id.lower(): profile_id for profile_id in sorted(thumbs)}
+
+    favorites = _load_json(FAVORITES_JSON)
+    if isinstance(favorites, dict) and isinstance(favorites.get("favorites"), list):
+        seen = set()
+        for raw_id in favorites["favorites"]:
+            if not isinstance(raw_id, str) or not raw_id.strip():
+                continue
+            profile_id = by_lower.get(raw_id.strip().lower())
+            if profile_id is not None and profile_id not in seen:
+                seen.add(profile_id)
+                categories.setdefault(FAVORITES_CATEGORY, []).append(profile_id)
+
+    descriptions = _load_json(LAUNCHBOX_DESCRIPTIONS_JSON)
+    if not isinstance(descriptions, dict):
+        descriptions = {}
+    descriptions = {str(k).lower(): v for k, v in descriptions.items()}
+    meta_genres = load_metadata_genres(list(thumbs))
+    names: Dict[str, str] = {}
+    for profile_id in sorted(thumbs):
+        key = profile_id.lower()
+        category = localized_category(
+            meta_genres.get(key), _genre_field(descriptions.get(key), "genre")
+        )
+        category = names.setdefault(category.lower(), category)
+        categories.setdefault(category, []).append(profile_id)
+    return categories
+
+
+def load_thumbnails(covers_dir: str) -> Dict[str, Dict]:
+    """
+    从 build_cover_thumbnails 的清单读取 thumb 变体:
+    返回 { profileId: { "file", "width", "height", "hash" } }（文件路径相对 covers_dir）。
+    """
+    manifest = _load_json(os.path.join(covers_dir, MANIFEST_NAME))
+    thumbs: Dict[str, Dict] = {}
+    if not isinstance(manifest, dict) or not isinstance(manifest.get("entries"), dict):
+        return thumbs
+    for profile_id, entry in manifest["entries"].items():
+        variant = (entry.get("variants") or {}).get(VARIANT)
+        if not variant:
+            continue
+        thumbs[profile_id] = {
+            "file": variant["file"],
+            "width": variant["width"],
+            "height": variant["height"],
+            "hash": "{}:{}".format(entry.get("hash"), variant.get("bytes")),
+        }
+    return thumbs
+
+
+def atlas_base_name(category: str) -> str:
+    """分类名可能含中文、空格或 "/"：保留文字字符，再加短哈希避免重名。"""
+    digest = hashlib.sha1(category.encode("utf-8")).hexdigest()[:6]
+    safe = re.sub(r"[^\w]+", "_", category, flags=re.UNICODE).strip("_") or "category"
+    return "{}-{}".format(safe, digest)
+
+
+def assign_slots(
+    categories: Dict[str, List[str]],
+    previous: Dict[str, Dict],
+) -> Dict[str, Dict]:
+    """
+    为每个分类分配图集与格子，尽量沿用上次的位置。
+    返回 { 图集名: { "category", "slots": [profileId 或 None, ...] } }。
+    """
+    atlases: Dict[str, Dict] = {}
+    for category, members in categories.items():
+        wanted = set(members)
+        base = atlas_base_name(category)
+        # 上次属于该分类的图集，按序号排列
+        mine = sorted(
+            (name for name, info in previous.items() if info.get("category") == category),
+            key=lambda name: int(name.rsplit("_", 1)[1]),
+        )
+        placed = set()
+        for name in mine:
+            slots = [p if p in wanted and p not in placed else None for p in previous[name]["slots"]]
+            slots += [None] * (SLOTS_PER_ATLAS - len(slots))
+            placed.update(p for p in slots if p)
+            atlases[name] = {"category": category, "slots": slots}
+
+        serial = 1 + max([int(name.rsplit("_", 1)[1]) for name in mine] or [-1])
+        for profile_id in members:
+            if profile_id in placed:
+                continue
+            target = None
+            for name in mine:
+                if None in atlases[name]["slots"]:
+                    target = name
+                    break
+            if target is None:
+                target = "{}_{}".format(base, serial)
+                serial += 1
+                atlases[target] = {"category": category, "slots": [None] * SLOTS_PER_ATLAS}
+                mine.append(target)
+            slots = atlases[target]["slots"]
+            slots[slots.index(None)] = profile_id
+            placed.add(profile_id)
+
+        # 空出的图集不再保留
+        for name in mine:
+            if not any(atlases[name]["slots"]):
+                del atlases[name]
+    return atlases
+
+
+def _slot_origin(slot: int) -> Tuple[int, int]:
+    return (slot % ATLAS_COLUMNS) * CELL_WIDTH, (slot // ATLAS_COLUMNS) * CELL_HEIGHT
+
+
+def _signature(slots: List[Optional[str]], thumbs: Dict[str, Dict]) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for profile_id in slots:
+        h.update(b"\0")
+        if profile_id:
+            h.update(profile_id.encode("utf-8"))
+            h.update(thumbs[profile_id]["hash"].encode("utf-8"))
+    return h.hexdigest()
+
+
+def render_atlas(covers_dir: str, atlas_dir: str, name: str, slots: List[Optional[str]], thumbs: Dict[str, Dict]) -> Dict:
+    """拼出一张图集，返回 { "file", "width", "height" }。"""
+    used = max(i for i, p in enumerate(slots) if p) + 1
+    rows = (used + ATLAS_COLUMNS - 1) // ATLAS_COLUMNS
+    columns = min(used, ATLAS_COLUMNS) if rows == 1 else ATLAS_COLUMNS
+    width, height = columns * CELL_WIDTH, rows * CELL_HEIGHT
+
+    sheet = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    has_alpha = False
+    for slot, profile_id in enumerate(slots):
+        if not profile_id:
+            continue
+        path = os.path.join(covers_dir, thumbs[profile_id]["file"])
+        with Image.open(path) as img:
+            count("files_opened")
+            count("bytes_read", os.path.getsize(path))
+            if img.mode in ("RGBA", "LA") or "transparency" in img.info:
+                has_alpha = True
+            sheet.paste(img.convert("RGBA"), _slot_origin(slot))
+
+    if has_alpha:
+        fname, fmt, options = name + ".png", "PNG", {"optimize": True}
+    else:
+        sheet = sheet.convert("RGB")
+        fname, fmt, options = name + ".jpg", "JPEG", {"quality": JPEG_QUALITY, "optimize": True}
+    dest = os.path.join(atlas_dir, fname)
+    part = dest + ".part"
+    sheet.save(part, fmt, **options)
+    os.replace(part, dest)
+    count("files_opened")
+    count("bytes_written", os.path.getsize(dest))
+    return {"file": fname, "width": width, "height": height}
+
+
+def build_atlases(covers_dir: str = COVERS_DIR, force: bool = False) -> Dict[str, int]:
+    """
+    生成/更新图集与索引，返回统计:
+        { "covers", "categories", "atlases", "rendered", "unchanged", "removed" }
+    """
+    atlas_dir = os.path.join(covers_dir, ATLAS_DIR_NAME)
+    if not os.path.isdir(atlas_dir):
+        os.makedirs(atlas_dir)
+    index_path = os.path.join(atlas_dir, INDEX_NAME)
+
+    previous: Dict[str, Dict] = {}
+    if not force:
+        data = _load_json(index_path)
+        if isinstance(data, dict) and data.get("version") == INDEX_VERSION:
+            previous = data.get("atlases") or {}
+
+    with stage("media_scan"):
+        thumbs = load_thumbnails(covers_dir)
+        categories = load_categories(thumbs)
+    with stage("matching"):
+        atlases = assign_slots(categories, previous)
+
+    stats = dict.fromkeys(("covers", "categories", "atlases", "rendered", "unchanged", "removed"), 0)
+    stats["covers"] = len(thumbs)
+    stats["categories"] = len(categories)
+    stats["atlases"] = len(atlases)
+
+    with stage("transform"):
+        for name, info in sorted(atlases.items()):
+            info["signature"] = _signature(info["slots"], thumbs)
+            old = previous.get(name)
+            if (
+                old is not None
+                and old.get("signature") == info["signature"]
+                and os.path.isfile(os.path.join(atlas_dir, old.get("file", "")))
+            ):
+                info.update({k: old[k] for k in ("file", "width", "height")})
+                stats["unchanged"] += 1
+                continue
+            info.update(render_atlas(covers_dir, atlas_dir, name, info["slots"], thumbs))
+            if old is not None and old.get("file") and old["file"] != info["file"]:
+                _remove(os.path.join(atlas_dir, old["file"]))
+            stats["rendered"] += 1
+
+    for name, old in previous.items():
+        if name not in atlases and old.get("file"):
+            _remove(os.path.join(atlas_dir, old["file"]))
+            stats["removed"] += 1
+
+    entries: Dict[str, Dict[str, Dict]] = {}
+    for name, info in sorted(atlases.items()):
+        rects = entries.setdefault(info["category"], {})
+        for slot, profile_id in enumerate(info["slots"]):
+            if not profile_id:
+                continue
+            x, y = _slot_origin(slot)
+            thumb = thumbs[profile_id]
+            rects[profile_id] = {
+                "atlas": info["file"],
+                "x": x,
+                "y": y,
+                "w": thumb["width"],
+                "h": thumb["height"],
+            }
+
+    tmp_path = index_path + ".tmp"
+    with io.open(tmp_path, "w", encoding="utf-8") as fp:
+        json.dump(
+            {
+                "version": INDEX_VERSION,
+                "cell": [CELL_WIDTH, CELL_HEIGHT],
+                "atlases": atlases,
+                "categories": entries,
+            },
+            fp,
+            ensure_ascii=False,
+            indent=2,
+            sort_keys=True,
+        )
+    os.replace(tmp_path, index_path)
+    return stats
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def report_atlases(stats: Dict[str, int]) -> None:
+    print("  封面数量:", stats["covers"])
+    print("  分类数量:", stats["categories"])
+    print("  图集数量:", stats["atlases"])
+    print("  本次重新拼图:", stats["rendered"])
+    print("  未变化、沿用:", stats["unchanged"])
+    if stats["removed"]:
+        print("  已不再需要、删除:", stats["removed"])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="按收藏/类型把封面缩略图拼成图集，并写出 profileId -> 图集矩形的索引"
+    )
+    parser.add_argument(
+        "--covers",
+        default=COVERS_DIR,
+        help="封面目录（默认: ./Media/Covers）",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="丢弃旧索引，重新分配格子并重新拼所有图集",
+    )
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    if Image is None:
+        print("未安装 Pillow，无法生成图集。请先运行: pip install Pillow")
+        return 1
+    if not os.path.isfile(os.path.join(args.covers, MANIFEST_NAME)):
+        print("未找到缩略图清单，请先运行 build_cover_thumbnails.py:", os.path.join(args.covers, MANIFEST_NAME))
+        return 1
+
+    stats = build_atlases(args.covers, args.force)
+    print("处理完成。")
+    report_atlases(stats)
+    print("  索引:", os.path.join(args.covers, ATLAS_DIR_NAME, INDEX_NAME))
+    finish_metrics(args, "build_cover_atlases")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,390 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+为 Media/Covers/{profileId}.png|.jpg 生成缩小、重新编码的封面变体，供封面墙使用，
+避免前端为每个格子解码整张 Box - 3D 原图。
+
+在封面脚本（rename_covers_from_box3d.py / rename_covers_from_coverdata.py）之后运行:
+
+    python build_cover_thumbnails.py
+    python build_cover_thumbnails.py --jobs 8
+    python build_cover_thumbnails.py --force          # 忽略缓存，全部重新编码
+
+输出:
+    Media/Covers/thumb/{profileId}.jpg|.png   最大 200×300，约 < 100KB
+    Media/Covers/mid/{profileId}.jpg|.png     最大 400×600，< 500KB（coverdata/README 推荐规格）
+    Media/Covers/thumbnails.json              清单：源文件哈希、各尺寸的宽高与字节数
+
+- 等比缩小到框内，不放大；带透明通道的图片保存为 PNG，其余保存为 JPEG。
+  超过字节上限时，JPEG 逐级降低质量，PNG 改存为逐级减少颜色数的调色板 PNG（保留透明度）；
+  都用尽仍超限的变体在清单中标记 over_limit，并在结束时汇总。
+- 清单同时作为缓存：源文件内容哈希与编码参数都未变、输出文件仍在时不重新编码；
+  源文件 mtime/size 未变时直接沿用记录的哈希，不再读取。
+- 源封面被删除后，对应的变体文件与清单记录一并删除。
+- 编码在多个进程中并行（--jobs，默认按 CPU 数）。
+
+依赖 Pillow（pip install Pillow）；未安装时脚本提示后退出，不影响其它脚本。
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from dir_index import DirIndex
+from media_dedup import full_hash
+from media_metrics import add_metrics_arguments, count, finish_metrics, stage
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow 为可选依赖
+    Image = None
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+COVERS_DIR = os.path.join(BASE_DIR, "Media", "Covers")
+MANIFEST_NAME = "thumbnails.json"
+MANIFEST_VERSION = 1
+
+# (名称, 最大宽, 最大高, 字节上限)
+VARIANTS: Tuple[Tuple[str, int, int, int], ...] = (
+    ("thumb", 200, 300, 100 * 1024),
+    ("mid", 400, 600, 500 * 1024),
+)
+JPEG_QUALITIES = (88, 80, 72, 64, 56)
+# 带透明通道的 PNG 超过字节上限时，依次尝试的调色板颜色数
+PNG_PALETTE_COLORS = (256, 128, 64)
+
+# 与前端 ResolveCoverPath 的查找顺序一致：同名时 .png 优先
+SOURCE_EXTENSIONS = (".png", ".jpg")
+
+
+def encoder_signature() -> str:
+    """编码参数的签名；变化后所有变体重新生成。"""
+    return json.dumps([VARIANTS, JPEG_QUALITIES, PNG_PALETTE_COLORS])
+
+
+def list_sources(covers_dir: str, dir_index: Optional[DirIndex] = None) -> Dict[str, str]:
+    """返回 { profileId: 源封面文件名 }，只看目录第一层（传入 dir_index 时使用其快照）。"""
+    by_ext: Dict[str, Dict[str, str]] = {}
+    if dir_index is None:
+        dir_index = DirIndex(covers_dir)
+    for fname in dir_index.names(SOURCE_EXTENSIONS):
+        base, ext = os.path.splitext(fname)
+        by_ext.setdefault(base, {})[ext.lower()] = fname
+    sources: Dict[str, str] = {}
+    for profile_id, files in by_ext.items():
+        for ext in SOURCE_EXTENSIONS:
+            if ext in files:
+                sources[profile_id] = files[ext]
+                break
+    return sources
+
+
+def _png_bytes(image) -> bytes:
+    data = io.BytesIO()
+    image.save(data, "PNG", optimize=True)
+    return data.getvalue()
+
+
+def _save_variant(image, dest_base: str, max_bytes: int) -> Tuple[str, int]:
+    """保存一个变体，返回 (实际写出的路径, 字节数)；字节数可能仍超过 max_bytes。"""
+    has_alpha = image.mode in ("RGBA", "LA") or (
+        image.mode == "P" and "transparency" in image.info
+    )
+    if has_alpha:
+        rgba = image.convert("RGBA")
+        payload = _png_bytes(rgba)
+        if len(payload) > max_bytes:
+            # 调色板 PNG（FASTOCTREE 支持 RGBA，透明度保留在调色板中）
+            method = Image.Quantize.FASTOCTREE if hasattr(Image, "Quantize") else Image.FASTOCTREE
+            for colors in PNG_PALETTE_COLORS:
+                quantized = _png_bytes(rgba.quantize(colors=colors, method=method))
+                if len(quantized) < len(payload):
+                    payload = quantized
+                if len(payload) <= max_bytes:
+                    break
+        dest = dest_base + ".png"
+    else:
+        rgb = image.convert("RGB")
+        payload = b""
+        for quality in JPEG_QUALITIES:
+            data = io.BytesIO()
+            rgb.save(data, "JPEG", quality=quality, optimize=True, progressive=True)
+            payload = data.getvalue()
+            if len(payload) <= max_bytes:
+                break
+        dest = dest_base + ".jpg"
+
+    part = dest + ".part"
+    with io.open(part, "wb") as fp:
+        fp.write(payload)
+    os.replace(part, dest)
+    return dest, len(payload)
+
+
+def encode_cover(src: str, covers_dir: str, profile_id: str) -> Dict:
+    """
+    进程池中执行：解码一次源图，生成所有变体。
+    返回 { "width", "height", "variants": { 名称: {"file", "width", "height", "bytes"} } }，
+    失败时返回 { "error": 错误信息 }。
+    """
+    try:
+        with Image.open(src) as img:
+            img.load()
+            width, height = img.size
+            variants: Dict[str, Dict] = {}
+            for name, max_w, max_h, max_bytes in VARIANTS:
+                resized = img.copy()
+                resized.thumbnail((max_w, max_h), Image.LANCZOS)
+                dest_base = os.path.join(covers_dir, name, profile_id)
+                dest, size = _save_variant(resized, dest_base, max_bytes)
+                variants[name] = {
+                    "file": os.path.relpath(dest, covers_dir).replace(os.sep, "/"),
+                    "width": resized.size[0],
+                    "height": resized.size[1],
+                    "bytes": size,
+                }
+                if size > max_bytes:
+                    variants[name]["over_limit"] = True
+        return {"width": width, "height": height, "variants": variants}
+    except Exception as exc:
+        return {"error": str(exc)}
+
+
+class ThumbnailManifest(object):
+    """
+    Media/Covers/thumbnails.json:
+        { "version", "encoder", "entries": { profileId: {
+              "source", "mtime_ns", "size", "hash", "width", "height", "variants" } } }
+    """
+
+    def __init__(self, covers_dir: str, rebuild: bool = False):
+        self.path = os.path.join(covers_dir, MANIFEST_NAME)
+        self.entries: Dict[str, Dict] = {}
+        if rebuild or not os.path.isfile(self.path):
+            return
+        try:
+            with io.open(self.path, "r", encoding="utf-8") as fp:
+                data = json.load(fp)
+        except (IOError, OSError, ValueError):
+            return
+        if (
+            isinstance(data, dict)
+            and data.get("version") == MANIFEST_VERSION
+            and data.get("encoder") == encoder_signature()
+            and isinstance(data.get("entries"), dict)
+        ):
+            self.entries = data["entries"]
+
+    def save(self) -> None:
+        tmp_path = self.path + ".tmp"
+        try:
+            with io.open(tmp_path, "w", encoding="utf-8") as fp:
+                json.dump(
+                    {
+                        "version": MANIFEST_VERSION,
+                        "encoder": encoder_signature(),
+                        "entries": self.entries,
+                    },
+                    fp,
+                    ensure_ascii=False,
+                    indent=2,
+                    sort_keys=True,
+                )
+            os.replace(tmp_path, self.path)
+        except (IOError, OSError) as exc:
+            print("写入缩略图清单失败:", self.path, "错误:", exc)
+
+
+def _outputs_present(variant_dirs: Dict[str, DirIndex], entry: Dict) -> bool:
+    """记录中的各变体文件都在且大小一致（variant_dirs 为各变体目录的快照）。"""
+    variants = entry.get("variants") or {}
+    if set(variants) != set(name for name, _w, _h, _b in VARIANTS):
+        return False
+    for info in variants.values():
+        folder, fname = os.path.split(info.get("file") or "")
+        index = variant_dirs.get(folder)
+        if index is None or index.size(fname) != info.get("bytes"):
+            return False
+    return True
+
+
+def _remove_outputs(covers_dir: str, variants: Dict[str, Dict], keep: Optional[Dict[str, Dict]] = None) -> None:
+    """删除旧变体文件（keep 中仍在使用的同名文件保留）。"""
+    kept = set(info.get("file") for info in (keep or {}).values())
+    for info in variants.values():
+        rel = info.get("file")
+        if not rel or rel in kept:
+            continue
+        try:
+            os.remove(os.path.join(covers_dir, rel))
+        except OSError:
+            pass
+
+
+def build_thumbnails(covers_dir: str = COVERS_DIR, jobs: int = 0, force: bool = False) -> Dict[str, int]:
+    """
+    生成/更新 covers_dir 下所有封面的变体，返回统计:
+        { "sources", "encoded", "unchanged", "failed", "removed", "over_limit" }
+    over_limit 为清单中超过字节上限的变体数（含沿用缓存的）。
+    """
+    stats = dict.fromkeys(("sources", "encoded", "unchanged", "failed", "removed", "over_limit"), 0)
+    manifest = ThumbnailManifest(covers_dir, rebuild=force)
+    for name, _w, _h, _b in VARIANTS:
+        d = os.path.join(covers_dir, name)
+        if not os.path.isdir(d):
+            os.makedirs(d)
+
+    # 1) 判断哪些封面需要重新编码
+    pending: List[Tuple[str, str, os.stat_result, str]] = []  # (profileId, 源路径, stat, 哈希)
+    with stage("media_scan"):
+        # 源目录与各变体目录各列一次，之后的 stat / 存在性检查都用快照
+        covers_index = DirIndex(covers_dir)
+        variant_dirs = {
+            name: DirIndex(os.path.join(covers_dir, name)) for name, _w, _h, _b in VARIANTS
+        }
+        sources = list_sources(covers_dir, covers_index)
+        stats["sources"] = len(sources)
+        for profile_id, fname in sorted(sources.items()):
+            src = os.path.join(covers_dir, fname)
+            count("files_stat")
+            st = covers_index.stat(fname)
+            if st is None:
+                continue
+            entry = manifest.entries.get(profile_id)
+            if (
+                entry is not None
+                and entry.get("source") == fname
+                and entry.get("mtime_ns") == st.st_mtime_ns
+                and entry.get("size") == st.st_size
+            ):
+                digest = entry.get("hash")
+            else:
+                try:
+                    digest = full_hash(src)
+                except (IOError, OSError) as exc:
+                    print("读取封面失败:", src, "错误:", exc)
+                    stats["failed"] += 1
+                    continue
+            if (
+                entry is not None
+                and entry.get("hash") == digest
+                and _outputs_present(variant_dirs, entry)
+            ):
+                entry.update({"source": fname, "mtime_ns": st.st_mtime_ns, "size": st.st_size})
+                stats["unchanged"] += 1
+                continue
+            pending.append((profile_id, src, st, digest))
+
+    # 2) 并行编码
+    with stage("transform"):
+        workers = jobs if jobs > 0 else (os.cpu_count() or 1)
+        if workers > 1 and len(pending) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [
+                    pool.submit(encode_cover, src, covers_dir, profile_id)
+                    for profile_id, src, _st, _digest in pending
+                ]
+                results = [f.result() for f in futures]
+        else:
+            results = [
+                encode_cover(src, covers_dir, profile_id)
+                for profile_id, src, _st, _digest in pending
+            ]
+
+        for (profile_id, src, st, digest), result in zip(pending, results):
+            if "error" in result:
+                print("生成缩略图失败:", src, "错误:", result["error"])
+                stats["failed"] += 1
+                continue
+            count("files_opened", 1 + len(result["variants"]))
+            count("bytes_read", st.st_size)
+            count("bytes_written", sum(v["bytes"] for v in result["variants"].values()))
+            old = manifest.entries.get(profile_id)
+            if old is not None:
+                # 透明度变化时扩展名会变（.png <-> .jpg），删除旧文件
+                _remove_outputs(covers_dir, old.get("variants") or {}, keep=result["variants"])
+            manifest.entries[profile_id] = {
+                "source": os.path.basename(src),
+                "mtime_ns": st.st_mtime_ns,
+                "size": st.st_size,
+                "hash": digest,
+                "width": result["width"],
+                "height": result["height"],
+                "variants": result["variants"],
+            }
+            stats["encoded"] += 1
+
+    # 3) 源封面已不存在的：删除变体与记录
+    for profile_id in [p for p in manifest.entries if p not in sources]:
+        _remove_outputs(covers_dir, manifest.entries.pop(profile_id).get("variants") or {})
+        stats["removed"] += 1
+
+    stats["over_limit"] = sum(
+        1
+        for entry in manifest.entries.values()
+        for variant in (entry.get("variants") or {}).values()
+        if variant.get("over_limit")
+    )
+    manifest.save()
+    return stats
+
+
+def report_thumbnails(stats: Dict[str, int]) -> None:
+    print("  源封面数量:", stats["sources"])
+    print("  本次重新编码:", stats["encoded"])
+    print("  未变化、沿用缓存:", stats["unchanged"])
+    if stats["removed"]:
+        print("  源封面已删除、清理变体:", stats["removed"])
+    if stats["over_limit"]:
+        print("  降低质量 / 颜色数后仍超过字节上限的变体:", stats["over_limit"])
+    if stats["failed"]:
+        print("  失败:", stats["failed"])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="为 Media/Covers 下的封面生成缩略图与中等尺寸变体，并写出清单"
+    )
+    parser.add_argument(
+        "--covers",
+        default=COVERS_DIR,
+        help="封面目录（默认: ./Media/Covers）",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=0,
+        help="并行编码的进程数（默认 0 = 按 CPU 数；1 = 单进程）",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="忽略清单缓存，全部重新编码",
+    )
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    if Image is None:
+        print("未安装 Pillow，无法生成缩略图。请先运行: pip install Pillow")
+        return 1
+    if not os.path.isdir(args.covers):
+        print("未找到封面目录:", args.covers)
+        return 1
+
+    stats = build_thumbnails(args.covers, args.jobs, args.force)
+    print("处理完成。")
+    report_thumbnails(stats)
+    print("  清单:", os.path.join(args.covers, MANIFEST_NAME))
+    finish_metrics(args, "build_cover_thumbnails")
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
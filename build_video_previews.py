@@ -0,0 +1,407 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+用本机安装的 ffmpeg 为 Media/Videos/{profileId}.* 生成短小、可快速起播的预览片段:
+
+    Media/Videos/previews/{profileId}.mp4
+
+前端选中游戏时优先播放预览片段，不必在几百 MB 的完整视频里定位。
+
+在 rename_videos_from_launchbox.py 之后运行:
+
+    python build_video_previews.py
+    python build_video_previews.py --preview-duration 20 --preview-start 5
+    python build_video_previews.py --preview-jobs 4 --ffmpeg D:\\tools\\ffmpeg\\bin\\ffmpeg.exe
+    python build_video_previews.py --force          # 忽略缓存，全部重新生成
+
+- 源视频为 H.264 + AAC/MP3（或无音轨）时直接重新封装（-c copy，几乎不耗 CPU），
+  否则转码为 H.264 + AAC，高度不超过 --preview-max-height；重新封装失败时也退回转码。
+- 输出均带 +faststart（moov 前置），播放器无需读到文件末尾即可开始播放。
+- 清单 previews/previews.json 同时作为缓存：源视频快速哈希（大小 + 首尾各 1MB）与参数都未变、
+  输出仍在时跳过；源视频 mtime/size 未变时直接沿用记录的哈希。
+- 源视频被删除后，对应的预览片段与记录一并删除。
+- 最多同时运行 --preview-jobs 个 ffmpeg 进程（默认 2）。
+
+ffmpeg 为可选依赖：未找到时脚本提示后退出，不影响其它脚本。
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from dir_index import DirIndex
+from media_metrics import add_metrics_arguments, count, finish_metrics, stage
+from media_transfer import quick_hash
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+VIDEOS_DIR = os.path.join(BASE_DIR, "Media", "Videos")
+PREVIEW_DIR_NAME = "previews"
+MANIFEST_NAME = "previews.json"
+MANIFEST_VERSION = 1
+
+# 与前端 ResolveVideoPath 的查找顺序一致
+SOURCE_EXTENSIONS = (".mp4", ".avi", ".webm", ".mkv", ".wmv", ".m4v", ".mov")
+
+# 可直接封装进 mp4 且前端（Windows Media Foundation）能播放的编码
+COPY_VIDEO_CODECS = ("h264",)
+COPY_AUDIO_CODECS = ("aac", "mp3")
+
+# 单个片段的 ffmpeg 超时（秒）
+FFMPEG_TIMEOUT = 600
+
+MODE_REMUX = "remux"
+MODE_TRANSCODE = "transcode"
+
+_STREAM_RE = re.compile(r"Stream #\d+:\d+.*?: (Video|Audio): (\w+)")
+
+
+def find_ffmpeg(path: Optional[str] = None) -> Optional[str]:
+    """返回可用的 ffmpeg 路径：优先 --ffmpeg，其次 PATH；都没有时返回 None。"""
+    if path:
+        return path if os.path.isfile(path) else shutil.which(path)
+    return shutil.which("ffmpeg")
+
+
+def list_sources(videos_dir: str, dir_index: Optional[DirIndex] = None) -> Dict[str, str]:
+    """
+    返回 { profileId: 源视频文件名 }，同名多个时按前端的扩展名顺序取第一个。
+    传入 dir_index 时使用其快照，不再列目录。
+    """
+    by_ext: Dict[str, Dict[str, str]] = {}
+    if dir_index is None:
+        dir_index = DirIndex(videos_dir)
+    for fname in dir_index.names(SOURCE_EXTENSIONS):
+        base, ext = os.path.splitext(fname)
+        by_ext.setdefault(base, {})[ext.lower()] = fname
+    sources: Dict[str, str] = {}
+    for profile_id, files in by_ext.items():
+        for ext in SOURCE_EXTENSIONS:
+            if ext in files:
+                sources[profile_id] = files[ext]
+                break
+    return sources
+
+
+def probe_codecs(ffmpeg: str, src: str) -> Tuple[Optional[str], Optional[str]]:
+    """用 ffmpeg -i 读取第一个视频/音频流的编码名，无法识别时为 None。"""
+    try:
+        proc = subprocess.run(
+            [ffmpeg, "-hide_banner", "-i", src],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            timeout=60,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None, None
+    video = audio = None
+    for kind, codec in _STREAM_RE.findall(proc.stderr.decode("utf-8", "replace")):
+        if kind == "Video" and video is None:
+            video = codec.lower()
+        elif kind == "Audio" and audio is None:
+            audio = codec.lower()
+    return video, audio
+
+
+def _ffmpeg_command(
+    ffmpeg: str, src: str, dest: str, mode: str, start: float, duration: float, max_height: int
+) -> List[str]:
+    cmd = [ffmpeg, "-hide_banner", "-v", "error", "-y"]
+    if start > 0:
+        cmd += ["-ss", "{:g}".format(start)]
+    cmd += ["-i", src, "-t", "{:g}".format(duration), "-map", "0:v:0", "-map", "0:a:0?", "-sn", "-dn"]
+    if mode == MODE_REMUX:
+        cmd += ["-c", "copy"]
+    else:
+        cmd += [
+            "-vf", "scale=-2:'min({},ih)'".format(max_height),
+            "-c:v", "libx264", "-preset", "veryfast", "-crf", "23", "-pix_fmt", "yuv420p",
+            "-c:a", "aac", "-b:a", "128k",
+        ]
+    cmd += ["-movflags", "+faststart", "-f", "mp4", dest]
+    return cmd
+
+
+def make_preview(
+    ffmpeg: str, src: str, dest: str, start: float, duration: float, max_height: int
+) -> Dict:
+    """
+    生成一个预览片段，返回 { "mode", "bytes", "video_codec", "audio_codec" }，
+    失败时返回 { "error": 错误信息 }。
+    """
+    video, audio = probe_codecs(ffmpeg, src)
+    modes = [MODE_TRANSCODE]
+    if video in COPY_VIDEO_CODECS and (audio is None or audio in COPY_AUDIO_CODECS):
+        modes.insert(0, MODE_REMUX)
+
+    part = dest + ".part"
+    error = ""
+    for mode in modes:
+        cmd = _ffmpeg_command(ffmpeg, src, part, mode, start, duration, max_height)
+        try:
+            proc = subprocess.run(
+                cmd,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                timeout=FFMPEG_TIMEOUT,
+            )
+        except subprocess.TimeoutExpired:
+            error = "ffmpeg 超时"
+            continue
+        except OSError as exc:
+            return {"error": str(exc)}
+        if proc.returncode == 0 and os.path.isfile(part) and os.path.getsize(part) > 0:
+            os.replace(part, dest)
+            return {
+                "mode": mode,
+                "bytes": os.path.getsize(dest),
+                "video_codec": video,
+                "audio_codec": audio,
+            }
+        lines = proc.stderr.decode("utf-8", "replace").strip().splitlines()
+        error = lines[-1] if lines else "ffmpeg 返回码 {}".format(proc.returncode)
+    try:
+        os.remove(part)
+    except OSError:
+        pass
+    return {"error": error}
+
+
+def _settings_signature(start: float, duration: float, max_height: int) -> str:
+    return json.dumps([start, duration, max_height, COPY_VIDEO_CODECS, COPY_AUDIO_CODECS])
+
+
+class PreviewManifest(object):
+    """
+    Media/Videos/previews/previews.json:
+        { "version", "entries": { profileId: {
+              "source", "mtime_ns", "size", "hash", "settings", "mode", "bytes", ... } } }
+    """
+
+    def __init__(self, preview_dir: str, rebuild: bool = False):
+        self.path = os.path.join(preview_dir, MANIFEST_NAME)
+        self.entries: Dict[str, Dict] = {}
+        if rebuild or not os.path.isfile(self.path):
+            return
+        try:
+            with io.open(self.path, "r", encoding="utf-8") as fp:
+                data = json.load(fp)
+        except (IOError, OSError, ValueError):
+            return
+        if (
+            isinstance(data, dict)
+            and data.get("version") == MANIFEST_VERSION
+            and isinstance(data.get("entries"), dict)
+        ):
+            self.entries = data["entries"]
+
+    def save(self) -> None:
+        tmp_path = self.path + ".tmp"
+        try:
+            with io.open(tmp_path, "w", encoding="utf-8") as fp:
+                json.dump(
+                    {"version": MANIFEST_VERSION, "entries": self.entries},
+                    fp,
+                    ensure_ascii=False,
+                    indent=2,
+                    sort_keys=True,
+                )
+            os.replace(tmp_path, self.path)
+        except (IOError, OSError) as exc:
+            print("写入预览片段清单失败:", self.path, "错误:", exc)
+
+
+def build_previews(
+    ffmpeg: str,
+    videos_dir: str = VIDEOS_DIR,
+    jobs: int = 2,
+    start: float = 0.0,
+    duration: float = 30.0,
+    max_height: int = 720,
+    force: bool = False,
+) -> Dict[str, int]:
+    """
+    生成/更新所有预览片段，返回统计:
+        { "sources", "remuxed", "transcoded", "unchanged", "failed", "removed" }
+    """
+    preview_dir = os.path.join(videos_dir, PREVIEW_DIR_NAME)
+    if not os.path.isdir(preview_dir):
+        os.makedirs(preview_dir)
+    manifest = PreviewManifest(preview_dir, rebuild=force)
+    settings = _settings_signature(start, duration, max_height)
+    stats = dict.fromkeys(("sources", "remuxed", "transcoded", "unchanged", "failed", "removed"), 0)
+
+    # 1) 判断哪些视频需要重新生成
+    pending: List[Tuple[str, str, os.stat_result, str]] = []  # (profileId, 源路径, stat, 哈希)
+    with stage("media_scan"):
+        # 源目录与预览目录各列一次，之后的 stat / 存在性检查都用快照
+        videos_index = DirIndex(videos_dir)
+        previews_index = DirIndex(preview_dir)
+        sources = list_sources(videos_dir, videos_index)
+        stats["sources"] = len(sources)
+        for profile_id, fname in sorted(sources.items()):
+            src = os.path.join(videos_dir, fname)
+            count("files_stat")
+            st = videos_index.stat(fname)
+            if st is None:
+                continue
+            entry = manifest.entries.get(profile_id)
+            if (
+                entry is not None
+                and entry.get("source") == fname
+                and entry.get("mtime_ns") == st.st_mtime_ns
+                and entry.get("size") == st.st_size
+            ):
+                digest = entry.get("hash")
+            else:
+                try:
+                    digest = quick_hash(src)
+                except (IOError, OSError) as exc:
+                    print("读取视频失败:", src, "错误:", exc)
+                    stats["failed"] += 1
+                    continue
+            if (
+                entry is not None
+                and entry.get("hash") == digest
+                and entry.get("settings") == settings
+                and previews_index.size(profile_id + ".mp4") == entry.get("bytes")
+            ):
+                entry.update({"source": fname, "mtime_ns": st.st_mtime_ns, "size": st.st_size})
+                stats["unchanged"] += 1
+                continue
+            pending.append((profile_id, src, st, digest))
+
+    # 2) 有界并发：每个线程等待一个 ffmpeg 子进程
+    with stage("transform"):
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+            futures = [
+                pool.submit(
+                    make_preview, ffmpeg, src,
+                    os.path.join(preview_dir, profile_id + ".mp4"),
+                    start, duration, max_height,
+                )
+                for profile_id, src, _st, _digest in pending
+            ]
+            results = [f.result() for f in futures]
+
+        for (profile_id, src, st, digest), result in zip(pending, results):
+            if "error" in result:
+                print("生成预览片段失败:", src, "错误:", result["error"])
+                stats["failed"] += 1
+                continue
+            count("files_opened", 2)
+            count("bytes_written", result["bytes"])
+            manifest.entries[profile_id] = dict(
+                result,
+                source=os.path.basename(src),
+                mtime_ns=st.st_mtime_ns,
+                size=st.st_size,
+                hash=digest,
+                settings=settings,
+            )
+            stats["remuxed" if result["mode"] == MODE_REMUX else "transcoded"] += 1
+
+    # 3) 源视频已不存在的：删除预览片段与记录
+    for profile_id in [p for p in manifest.entries if p not in sources]:
+        manifest.entries.pop(profile_id)
+        try:
+            os.remove(os.path.join(preview_dir, profile_id + ".mp4"))
+        except OSError:
+            pass
+        stats["removed"] += 1
+
+    manifest.save()
+    return stats
+
+
+def report_previews(stats: Dict[str, int]) -> None:
+    print("  源视频数量:", stats["sources"])
+    print("  重新封装:", stats["remuxed"])
+    print("  转码:", stats["transcoded"])
+    print("  未变化、沿用缓存:", stats["unchanged"])
+    if stats["removed"]:
+        print("  源视频已删除、清理预览:", stats["removed"])
+    if stats["failed"]:
+        print("  失败:", stats["failed"])
+
+
+def add_preview_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--ffmpeg",
+        default=None,
+        help="ffmpeg 可执行文件路径（默认: 在 PATH 中查找）",
+    )
+    parser.add_argument(
+        "--preview-start",
+        type=float,
+        default=0.0,
+        help="预览片段起始位置，单位秒（默认 0）",
+    )
+    parser.add_argument(
+        "--preview-duration",
+        type=float,
+        default=30.0,
+        help="预览片段长度，单位秒（默认 30）",
+    )
+    parser.add_argument(
+        "--preview-max-height",
+        type=int,
+        default=720,
+        help="转码时的最大高度（默认 720；重新封装时保持原分辨率）",
+    )
+    parser.add_argument(
+        "--preview-jobs",
+        type=int,
+        default=2,
+        help="同时运行的 ffmpeg 进程数（默认 2）",
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="用 ffmpeg 为 Media/Videos 下的视频生成短小、可快速起播的预览片段"
+    )
+    parser.add_argument(
+        "--videos",
+        default=VIDEOS_DIR,
+        help="视频目录（默认: ./Media/Videos）",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="忽略清单缓存，全部重新生成",
+    )
+    add_preview_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    ffmpeg = find_ffmpeg(args.ffmpeg)
+    if ffmpeg is None:
+        print("未找到 ffmpeg，无法生成预览片段。请安装 ffmpeg 并加入 PATH，或用 --ffmpeg 指定路径")
+        return 1
+    if not os.path.isdir(args.videos):
+        print("未找到视频目录:", args.videos)
+        return 1
+
+    stats = build_previews(
+        ffmpeg, args.videos, args.preview_jobs,
+        args.preview_start, args.preview_duration, args.preview_max_height, args.force,
+    )
+    print("处理完成。")
+    report_previews(stats)
+    print("  清单:", os.path.join(args.videos, PREVIEW_DIR_NAME, MANIFEST_NAME))
+    finish_metrics(args, "build_video_previews")
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
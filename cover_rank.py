@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+按图片尺寸为候选封面排序，供 rename_covers_from_box3d.py / rename_covers_from_coverdata.py 使用。
+
+原来的规则只看文件名（box3d 选 "-01"，否则取列目录的第一个；coverdata 按扩展名），
+同一游戏有多张候选时，选中的可能是横版截图或很小的图。
+--rank-covers 时改为按以下顺序比较（越靠前越优先）:
+
+1) 宽高比与竖版封面 2:3 / 3:4 的接近程度（按 ASPECT_STEP 分档，同档视为一样接近）；
+2) 分辨率（像素数，超过 PIXEL_CAP 的视为一样）；
+3) 文件大小（同尺寸下压缩更少、画质更好）；
+4) 调用方传入的顺序（即原有规则：box3d 的 "-01" 优先、coverdata 的扩展名优先）。
+
+宽高只从文件头读出（PNG IHDR、JPEG SOF、WEBP VP8 / VP8L / VP8X），不解码图片；
+无法识别的文件排在最后。结果经 ProfileResolutionCache 按 (路径, mtime, size) 缓存，
+图片未变化时再次运行不再打开文件。
+
+前端显示时不按 EXIF 方向旋转，因此这里也按文件中存储的宽高计算。
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import math
+import os
+import struct
+from typing import Dict, List, Optional, Tuple
+
+from async_io import DEFAULT_CONCURRENCY
+from profile_cache import KIND_IMAGE, ProfileResolutionCache
+
+# 竖版封面的目标宽高比（宽 / 高）
+TARGET_ASPECTS = (2.0 / 3.0, 3.0 / 4.0)
+# 宽高比偏差（对数差）的分档宽度，约 5%
+ASPECT_STEP = 0.05
+# 超过该像素数的图片在分辨率上视为一样（约 1000x1500）
+PIXEL_CAP = 1500 * 1000
+
+# JPEG 中携带图片尺寸的 SOF 标记（排除 DHT 0xC4、JPG 0xC8、DAC 0xCC）
+_JPEG_SOF = frozenset((0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF))
+# 没有长度字段的 JPEG 标记
+_JPEG_STANDALONE = frozenset([0x01] + list(range(0xD0, 0xD8)))
+
+
+def _png_size(head: bytes) -> Optional[Tuple[int, int]]:
+    if len(head) < 24 or head[12:16] != b"IHDR":
+        return None
+    return struct.unpack(">II", head[16:24])
+
+
+def _webp_size(head: bytes) -> Optional[Tuple[int, int]]:
+    chunk = head[12:16]
+    data = head[20:]
+    if chunk == b"VP8 " and len(data) >= 10 and data[3:6] == b"\x9d\x01\x2a":
+        width, height = struct.unpack("<HH", data[6:10])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and len(data) >= 5 and data[0] == 0x2F:
+        bits = struct.unpack("<I", data[1:5])[0]
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X" and len(data) >= 10:
+        width = int.from_bytes(data[4:7], "little") + 1
+        height = int.from_bytes(data[7:10], "little") + 1
+        return width, height
+    return None
+
+
+def _jpeg_size(fp) -> Optional[Tuple[int, int]]:
+    """逐个跳过 JPEG 段（只读段头），直到 SOF 段；EXIF 缩略图等大段通过 seek 跳过。"""
+    fp.seek(2)
+    while True:
+        byte = fp.read(1)
+        while byte and byte != b"\xff":
+            byte = fp.read(1)
+        while byte == b"\xff":
+            byte = fp.read(1)
+        if not byte:
+            return None
+        marker = byte[0]
+        if marker in _JPEG_STANDALONE:
+            continue
+        if marker in (0xD9, 0xDA):
+            return None  # 图像结束 / 扫描数据开始之前仍未遇到 SOF
+        header = fp.read(2)
+        if len(header) < 2:
+            return None
+        length = struct.unpack(">H", header)[0]
+        if length < 2:
+            return None
+        if marker in _JPEG_SOF:
+            sof = fp.read(5)
+            if len(sof) < 5:
+                return None
+            height, width = struct.unpack(">HH", sof[1:5])
+            return width, height
+        fp.seek(length - 2, os.SEEK_CUR)
+
+
+def read_image_header(path: str) -> List[int]:
+    """
+    只读文件头，返回 [宽, 高, 文件大小]；不是 PNG / JPEG / WEBP 或头部损坏时宽高为 0。
+    无法打开文件时抛出 OSError。
+    """
+    with io.open(path, "rb") as fp:
+        size = os.fstat(fp.fileno()).st_size
+        head = fp.read(32)
+        dims = None
+        if head.startswith(b"\x89PNG\r\n\x1a\n"):
+            dims = _png_size(head)
+        elif head.startswith(b"\xff\xd8"):
+            dims = _jpeg_size(fp)
+        elif head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+            dims = _webp_size(head)
+    width, height = dims or (0, 0)
+    return [width, height, size]
+
+
+def aspect_error(width: int, height: int) -> float:
+    """宽高比与最接近的目标比例的对数差（0 为完全一致）。"""
+    ratio = float(width) / height
+    return min(abs(math.log(ratio / target)) for target in TARGET_ASPECTS)
+
+
+class CoverRanker(object):
+    """
+    按文件头中的宽高为候选封面排序。
+
+        ranker = CoverRanker(cache)
+        ranker.prefetch(all_candidate_paths)   # 可选：并发读取未缓存的文件头
+        best = ranker.best(candidates)
+    """
+
+    def __init__(
+        self,
+        cache: ProfileResolutionCache,
+        io_concurrency: int = DEFAULT_CONCURRENCY,
+    ):
+        self.cache = cache
+        self.io_concurrency = io_concurrency
+        self._headers: Dict[str, Optional[List[int]]] = {}
+
+    def prefetch(self, paths: List[str]) -> None:
+        """一次并发 stat / 读取全部未读过的文件头（候选很多或在网络共享上时）。"""
+        pending = [p for p in dict.fromkeys(paths) if p not in self._headers]
+        if not pending:
+            return
+        resolved = self.cache.resolve_many(KIND_IMAGE, pending, read_image_header, self.io_concurrency)
+        for path in pending:
+            value, error = resolved.get(path, (None, True))
+            self._headers[path] = None if error else value
+
+    def forget(self, path: str) -> None:
+        """文件被修改或删除后调用（常驻进程中），下次用到时重新检查缓存。"""
+        self._headers.pop(path, None)
+
+    def header(self, path: str) -> Optional[List[int]]:
+        """[宽, 高, 文件大小]；文件无法读取时为 None。"""
+        if path not in self._headers:
+            self.prefetch([path])
+        return self._headers[path]
+
+    def sort_key(self, path: str, order: int) -> Tuple:
+        header = self.header(path)
+        if not header or header[0] <= 0 or header[1] <= 0:
+            return (1, 0, 0, 0, order)
+        width, height, size = header
+        return (
+            0,
+            int(aspect_error(width, height) / ASPECT_STEP),
+            -min(width * height, PIXEL_CAP),
+            -size,
+            order,
+        )
+
+    def rank(self, paths: List[str]) -> List[str]:
+        """按上述规则从优到劣排序；各项都相同时保持传入的顺序。"""
+        if len(paths) > 1:
+            self.prefetch(paths)
+        order = sorted(range(len(paths)), key=lambda i: self.sort_key(paths[i], i))
+        return [paths[i] for i in order]
+
+    def best(self, paths: List[str]) -> str:
+        if len(paths) == 1:
+            return paths[0]
+        return self.rank(paths)[0]
+
+
+def add_rank_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--rank-covers",
+        action="store_true",
+        help="同一游戏有多张候选图片时，读取图片头部尺寸，"
+        "优先选接近 2:3 / 3:4 竖版比例、分辨率与文件更大的一张",
+    )
+
+
+def open_ranker_from_args(
+    args: argparse.Namespace,
+    cache: ProfileResolutionCache,
+) -> Optional[CoverRanker]:
+    """未指定 --rank-covers 时返回 None（沿用按文件名选择的规则）。"""
+    if not getattr(args, "rank_covers", False):
+        return None
+    return CoverRanker(cache, getattr(args, "io_concurrency", DEFAULT_CONCURRENCY))
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+单个目录的 os.scandir 快照，供各脚本共用。
+
+原来的写法是 os.listdir 之后再对每个条目（或每个游戏）调用 os.path.isfile / exists / getsize，
+每次调用都是一次系统调用，网络共享上则是一次往返。这里对每个目录只做一次 os.scandir：
+
+- 条目类型来自 DirEntry（大多数系统上列目录时已经得到，不需要额外 stat）；
+- stat 结果由 DirEntry 缓存（Windows 上列目录时已经得到，其它系统第一次用到时 stat 一次）；
+- 之后的存在性检查（与当前系统的文件系统一致：Windows 不区分大小写，其它系统区分）、
+  按名称查找（lookup：先精确、再不区分大小写，适合 bat 文件名）都在内存中完成。
+
+快照只在本进程自己写入 / 删除文件时更新（note_written / note_removed），
+不会感知其它程序同时做的修改；需要时调用 refresh() 重新列出。
+
+    from dir_index import DirIndex
+
+    bats = DirIndex(BAT_DIR)
+    name = bats.lookup("WMMT6RR 競速.BAT")    # 磁盘上的实际文件名，不存在时为 None
+    for fname in bats.names((".png", ".jpg")):
+        st = bats.stat(fname)
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Dict, List, Optional, Set, Tuple
+
+from media_metrics import count
+
+_CASE_INSENSITIVE = os.path.normcase("A") == "a"
+
+
+class _WrittenEntry(object):
+    """本进程写入后的条目：与 DirEntry 相同的用法，stat 在写入后立即取得。"""
+
+    def __init__(self, path: str, st: os.stat_result):
+        self.name = os.path.basename(path)
+        self.path = path
+        self._stat = st
+
+    def is_file(self) -> bool:
+        return True
+
+    def stat(self) -> os.stat_result:
+        return self._stat
+
+
+class DirIndex(object):
+    """
+    目录第一层的文件快照：名称 -> DirEntry（只收录普通文件）。
+    子目录等其它条目只记录名称，供 exists() 判断。目录不存在时为空快照。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._entries: Dict[str, object] = {}
+        self._folded: Dict[str, str] = {}
+        self._others: Set[str] = set()
+        self.refresh()
+
+    def refresh(self) -> None:
+        """重新列出目录（丢弃之前的快照）。"""
+        self._entries = {}
+        self._folded = {}
+        self._others = set()
+        try:
+            it = os.scandir(self.path)
+        except OSError:
+            return
+        with it:
+            for entry in it:
+                try:
+                    is_file = entry.is_file()
+                except OSError:
+                    continue
+                if is_file:
+                    self._add(entry.name, entry)
+                else:
+                    self._others.add(entry.name.casefold() if _CASE_INSENSITIVE else entry.name)
+
+    def _add(self, name: str, entry) -> None:
+        self._entries[name] = entry
+        # 大小写不同的同名文件（只可能出现在区分大小写的文件系统上）以先出现的为准
+        self._folded.setdefault(name.casefold(), name)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, name: str) -> Optional[str]:
+        """返回磁盘上的实际文件名：先精确匹配，再不区分大小写；不存在时返回 None。"""
+        if name in self._entries:
+            return name
+        return self._folded.get(name.casefold())
+
+    def _actual(self, name: str) -> Optional[str]:
+        """按当前系统的文件系统语义查找（同 os.path.isfile：Windows 不区分大小写）。"""
+        if name in self._entries:
+            return name
+        if _CASE_INSENSITIVE:
+            return self._folded.get(name.casefold())
+        return None
+
+    def isfile(self, name: str) -> bool:
+        """与 os.path.isfile(os.path.join(目录, name)) 相同，但只查快照。"""
+        return self._actual(name) is not None
+
+    def exists(self, name: str) -> bool:
+        """与 os.path.exists 相同（文件或子目录等任意条目），但只查快照。"""
+        if self.isfile(name):
+            return True
+        return (name.casefold() if _CASE_INSENSITIVE else name) in self._others
+
+    def stat(self, name: str) -> Optional[os.stat_result]:
+        """条目的 stat 结果（DirEntry 缓存，同一条目只 stat 一次）；不存在时返回 None。"""
+        actual = self._actual(name)
+        if actual is None:
+            return None
+        entry = self._entries[actual]
+        try:
+            return entry.stat()
+        except OSError:
+            return None
+
+    def size(self, name: str) -> Optional[int]:
+        st = self.stat(name)
+        return st.st_size if st is not None else None
+
+    def names(self, suffixes: Optional[Tuple[str, ...]] = None) -> List[str]:
+        """按 scandir 顺序（与 os.listdir 相同）返回文件名；传入 suffixes 时只返回这些扩展名（不区分大小写）。"""
+        if suffixes is None:
+            return list(self._entries)
+        return [name for name in self._entries if name.lower().endswith(suffixes)]
+
+    def note_written(self, name: str) -> None:
+        """本进程写入（新建或替换）了 name 之后调用：重新 stat 这一个文件。"""
+        self.note_removed(name)
+        path = os.path.join(self.path, name)
+        count("files_stat")
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        self._add(name, _WrittenEntry(path, st))
+
+    def note_removed(self, name: str) -> None:
+        """本进程删除或移走了 name 之后调用。"""
+        actual = self._actual(name)
+        if actual is None:
+            return
+        del self._entries[actual]
+        folded = actual.casefold()
+        if self._folded.get(folded) == actual:
+            del self._folded[folded]
+            for other in self._entries:
+                if other.casefold() == folded:
+                    self._folded[folded] = other
+                    break
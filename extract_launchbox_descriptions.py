@@ -23,6 +23,14 @@
 使用方式（在 TeknoParrotBigBox 目录下运行）:
 
     python extract_launchbox_descriptions.py
+    python extract_launchbox_descriptions.py --rebuild-cache   # 重新读取所有 bat
+    python extract_launchbox_descriptions.py --format both     # 同时生成 SQLite 目录库 launchbox_descriptions.db
+    python extract_launchbox_descriptions.py --format sqlite   # 只生成 SQLite 目录库
+    python extract_launchbox_descriptions.py --format pack     # 只生成二进制索引 .idx + 说明数据块 .notes
+    python extract_launchbox_descriptions.py --format all      # JSON、SQLite、二进制索引都写
+    python extract_launchbox_descriptions.py --incremental     # 只更新 DateModified / bat 有变化的条目
+    python extract_launchbox_descriptions.py --metrics         # 打印各阶段耗时与文件读写计数
+    python extract_launchbox_descriptions.py --io-concurrency 64   # bat 在网络共享上时加大并发 stat / 读取
 
 前提约定:
 1. Teknoparrot.xml 位于本脚本同级目录下。
@@ -35,18 +43,48 @@
 
 from __future__ import annotations
 
+import argparse
+import hashlib
 import io
 import json
 import os
 import sys
-import xml.etree.ElementTree as ET
-from typing import Dict, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from async_io import add_io_arguments, stat_many
+from launchbox_catalog import write_catalog
+from launchbox_pack import notes_path_for, write_pack
+from launchbox_xml import iter_launchbox_games
+from media_metrics import add_metrics_arguments, count, finish_metrics, stage
+from profile_cache import (
+    KIND_BAT,
+    add_cache_arguments,
+    extract_profile_id_from_bat,
+    open_cache_from_args,
+)
 
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 LAUNCHBOX_XML = os.path.join(BASE_DIR, "Teknoparrot.xml")
 BAT_DIR = os.path.join(BASE_DIR, "bat")
 OUTPUT_JSON = os.path.join(BASE_DIR, "launchbox_descriptions.json")
+OUTPUT_DB = os.path.join(BASE_DIR, "launchbox_descriptions.db")
+OUTPUT_PACK = os.path.join(BASE_DIR, "launchbox_descriptions.idx")
+# --incremental 使用的状态文件：记录上次运行时每个 bat 的 DateModified / 文件状态，
+# 以及 SQLite 目录库 / 二进制索引写出时的内容摘要
+STATE_JSON = os.path.join(BASE_DIR, "launchbox_descriptions.state.json")
+STATE_VERSION = 1
+
+GAME_FIELDS = (
+    "ApplicationPath",
+    "Title",
+    "Notes",
+    "Genre",
+    "Developer",
+    "Publisher",
+    "ReleaseDate",
+    "DateModified",
+)
 
 
 class LaunchBoxGame(object):
@@ -58,6 +96,7 @@ class LaunchBoxGame(object):
         developer: str,
         publisher: str,
         release_date: str,
+        date_modified: str = "",
     ):
         self.title = title
         self.notes = notes
@@ -65,6 +104,7 @@ class LaunchBoxGame(object):
         self.developer = developer
         self.publisher = publisher
         self.release_date = release_date
+        self.date_modified = date_modified
 
 
 def load_launchbox_games() -> Dict[str, LaunchBoxGame]:
@@ -77,115 +117,336 @@ def load_launchbox_games() -> Dict[str, LaunchBoxGame]:
         return {}
 
     print("读取 LaunchBox XML:", LAUNCHBOX_XML)
-    # 明确使用 UTF-8 读取，避免中文乱码
-    with io.open(LAUNCHBOX_XML, "r", encoding="utf-8") as f:
-        data = f.read()
+    # 流式读取，只取需要的字段（XML 本身为 UTF-8，由解析器按声明解码）
+    games_by_batname = games_by_bat_name(iter_launchbox_games(LAUNCHBOX_XML, GAME_FIELDS))
+    print("从 LaunchBox 读取到游戏条目数:", len(games_by_batname))
+    return games_by_batname
 
-    # ElementTree 直接从字符串解析
-    root = ET.fromstring(data)
-    games_by_batname: Dict[str, LaunchBoxGame] = {}
 
-    for game_elem in root.findall("Game"):
-        app_path = (game_elem.findtext("ApplicationPath") or "").strip()
+def games_by_bat_name(records: Iterable[Dict[str, str]]) -> Dict[str, LaunchBoxGame]:
+    """按 bat 文件名（不含扩展名）索引 iter_launchbox_games 产出的记录。"""
+    games_by_batname: Dict[str, LaunchBoxGame] = {}
+    for game in records:
+        app_path = game["ApplicationPath"].strip()
         if not app_path:
             continue
 
         bat_name = os.path.splitext(os.path.basename(app_path))[0]
-        title = (game_elem.findtext("Title") or "").strip()
-        notes = game_elem.findtext("Notes") or ""
-        genre = (game_elem.findtext("Genre") or "").strip()
-        developer = (game_elem.findtext("Developer") or "").strip()
-        publisher = (game_elem.findtext("Publisher") or "").strip()
-        release_date = (game_elem.findtext("ReleaseDate") or "").strip()
-
         games_by_batname[bat_name] = LaunchBoxGame(
-            title=title,
-            notes=notes,
-            genre=genre,
-            developer=developer,
-            publisher=publisher,
-            release_date=release_date,
+            title=game["Title"].strip(),
+            notes=game["Notes"],
+            genre=game["Genre"].strip(),
+            developer=game["Developer"].strip(),
+            publisher=game["Publisher"].strip(),
+            release_date=game["ReleaseDate"].strip(),
+            date_modified=game["DateModified"].strip(),
         )
-
-    print("从 LaunchBox 读取到游戏条目数:", len(games_by_batname))
     return games_by_batname
 
 
-def extract_profile_id_from_bat(bat_path: str) -> Optional[str]:
-    """
-    从 bat 第一行解析 TeknoParrot profileId:
-        START ..\\TeknoParrotUi.exe --profile=WMMT6RR.xml
-    返回 "WMMT6RR" 或 None。
-    """
+def build_description(profile_id: str, bat_name: str, lb_game: LaunchBoxGame) -> Dict[str, str]:
+    """launchbox_descriptions.json 中的一条记录。"""
+    return {
+        "profile_id": profile_id,
+        "bat_name": bat_name,
+        "title": lb_game.title,
+        "notes": lb_game.notes,
+        "genre": lb_game.genre,
+        "developer": lb_game.developer,
+        "publisher": lb_game.publisher,
+        "release_date": lb_game.release_date,
+    }
+
+
+def _file_signature(path: str) -> List[int]:
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def load_state() -> Dict:
+    """读取上次运行的状态；不存在或版本不符时返回空状态。"""
+    empty = {"version": STATE_VERSION, "xml": None, "bats": {}}
+    if not os.path.isfile(STATE_JSON):
+        return empty
+    try:
+        with io.open(STATE_JSON, "r", encoding="utf-8") as fp:
+            data = json.load(fp)
+    except Exception:
+        return empty
+    if not isinstance(data, dict) or data.get("version") != STATE_VERSION:
+        return empty
+    if not isinstance(data.get("bats"), dict):
+        return empty
+    return data
+
+
+def result_digest(result: Dict[str, Dict]) -> str:
+    """输出内容的摘要（与写出格式无关），用于判断目录库 / 二进制索引是否与本次结果一致。"""
+    text = json.dumps(result, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def output_record(paths: List[str], digest: str) -> Dict:
+    """状态文件中一种输出的记录：写出的内容摘要 + 各文件的 (mtime, size)。"""
+    return {
+        "paths": [os.path.abspath(p) for p in paths],
+        "digest": digest,
+        "files": [_file_signature(p) for p in paths],
+    }
+
+
+def output_current(record: Optional[Dict], paths: List[str], digest: str) -> bool:
+    """上次写出的内容与本次结果相同，且文件写出后未被改动、删除时返回 True。"""
+    if not isinstance(record, dict) or record.get("digest") != digest:
+        return False
+    if record.get("paths") != [os.path.abspath(p) for p in paths]:
+        return False
     try:
-        with io.open(bat_path, "r", encoding="utf-8", errors="ignore") as f:
-            first_line = f.readline()
-    except IOError:
-        return None
+        return record.get("files") == [_file_signature(p) for p in paths]
+    except OSError:
+        return False
 
-    marker = "--profile="
-    idx = first_line.lower().find(marker)
-    if idx < 0:
-        return None
 
-    start = idx + len(marker)
-    end = first_line.lower().find(".xml", start)
-    if end <= start:
-        return None
-    return first_line[start:end].strip()
+def load_existing_output() -> Dict[str, Dict]:
+    if not os.path.isfile(OUTPUT_JSON):
+        return {}
+    try:
+        with io.open(OUTPUT_JSON, "r", encoding="utf-8") as fp:
+            data = json.load(fp)
+    except Exception:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def write_if_changed(path: str, text: str) -> bool:
+    """
+    内容与现有文件完全相同时不写；否则先写临时文件再替换（原子写出）。
+    返回是否实际写入。
+    """
+    data = text.encode("utf-8")
+    if os.path.isfile(path):
+        with io.open(path, "rb") as fp:
+            existing = fp.read()
+        count("files_opened")
+        count("bytes_read", len(existing))
+        if existing == data:
+            return False
+    tmp_path = path + ".tmp"
+    with io.open(tmp_path, "wb") as fp:
+        fp.write(data)
+    count("files_opened")
+    count("bytes_written", len(data))
+    os.replace(tmp_path, path)
+    return True
 
 
 def main() -> int:
-    lb_games = load_launchbox_games()
-    if not lb_games:
-        return 1
+    parser = argparse.ArgumentParser(
+        description="从 Teknoparrot.xml 提取游戏说明，生成 launchbox_descriptions.json"
+    )
+    parser.add_argument(
+        "--format",
+        choices=("json", "sqlite", "pack", "both", "all"),
+        default="json",
+        help="输出格式: json=launchbox_descriptions.json（默认）, sqlite=SQLite 目录库, "
+        "pack=二进制索引 + 说明数据块, both=json 与 sqlite, all=三者都写",
+    )
+    parser.add_argument(
+        "--catalog",
+        default=OUTPUT_DB,
+        help="SQLite 目录库路径（默认: launchbox_descriptions.db）",
+    )
+    parser.add_argument(
+        "--pack",
+        default=OUTPUT_PACK,
+        help="二进制索引路径（默认: launchbox_descriptions.idx，说明数据块为同名 .notes）",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="增量模式：只更新 DateModified 或 bat 文件有变化的条目，其余沿用上次输出",
+    )
+    add_cache_arguments(parser)
+    add_io_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
 
     if not os.path.isdir(BAT_DIR):
         print("未找到 bat 目录:", BAT_DIR)
         return 1
+    if not os.path.isfile(LAUNCHBOX_XML):
+        print("未找到 Teknoparrot.xml:", LAUNCHBOX_XML)
+        return 1
+
+    cache = open_cache_from_args(args)
+
+    # --incremental：XML 文件未变化时不再解析；bat 与 DateModified 都未变化的条目沿用上次输出
+    saved_state = load_state()
+    state = saved_state if args.incremental else {"version": STATE_VERSION, "xml": None, "bats": {}}
+    # 目录库 / 二进制索引上次写出时的内容摘要（与 --format 无关，始终保留）
+    outputs: Dict[str, Dict] = dict(saved_state.get("outputs") or {})
+    previous = load_existing_output() if args.incremental else {}
+    xml_signature = _file_signature(LAUNCHBOX_XML)
+    xml_unchanged = args.incremental and state["xml"] == xml_signature
+    lb_games: Optional[Dict[str, LaunchBoxGame]] = None
+    if xml_unchanged:
+        print("Teknoparrot.xml 未变化，跳过解析")
+    else:
+        with stage("xml_load"):
+            lb_games = load_launchbox_games()
+        if not lb_games:
+            return 1
 
     # 结果字典: key = profileId
     result: Dict[str, Dict] = {}
+    new_bats: Dict[str, Dict] = {}
 
     skipped_no_match = 0
     skipped_no_profile = 0
-
-    for bat_file in sorted(os.listdir(BAT_DIR)):
-        if not bat_file.lower().endswith(".bat"):
-            continue
-
-        bat_path = os.path.join(BAT_DIR, bat_file)
+    reused = 0
+
+    bat_files = sorted(f for f in os.listdir(BAT_DIR) if f.lower().endswith(".bat"))
+    bat_paths = [os.path.join(BAT_DIR, f) for f in bat_files]
+
+    # bat 目录可能在网络共享上：先并发 stat 全部 bat，再并发解析签名有变化、
+    # 且在 LaunchBox 中有对应游戏的 bat，避免下面的循环逐个等待往返
+    signatures: Dict[str, List[int]] = {}
+    prefetched: Dict[str, Tuple[Optional[str], bool]] = {}
+    with stage("profile_resolution"):
+        for bat_path, st in zip(bat_paths, stat_many(bat_paths, args.io_concurrency)):
+            if st is not None:
+                signatures[bat_path] = [st.st_mtime_ns, st.st_size]
+        if lb_games is not None:
+            changed: List[str] = []
+            for bat_file, bat_path in zip(bat_files, bat_paths):
+                bat_name = os.path.splitext(bat_file)[0]
+                prev = state["bats"].get(bat_name)
+                if bat_name in lb_games and (prev is None or prev.get("bat") != signatures.get(bat_path)):
+                    changed.append(bat_path)
+            prefetched = cache.resolve_many(
+                KIND_BAT, changed, extract_profile_id_from_bat, args.io_concurrency
+            )
+
+    for bat_file, bat_path in zip(bat_files, bat_paths):
         bat_name = os.path.splitext(bat_file)[0]
+        bat_signature = signatures.get(bat_path)
+        if bat_signature is None:
+            try:
+                bat_signature = _file_signature(bat_path)
+            except OSError:
+                continue  # 列目录之后被删除或无法访问：与完整扫描时一样跳过
+
+        prev = state["bats"].get(bat_name)
+        if prev is not None and prev.get("bat") == bat_signature:
+            if lb_games is None:
+                same_game = True
+            else:
+                lb_game = lb_games.get(bat_name)
+                if lb_game is None:
+                    same_game = prev.get("skip") == "no_match"
+                else:
+                    # 没有 DateModified 的条目无法判断是否变化，按已变化处理
+                    same_game = bool(lb_game.date_modified) and (
+                        lb_game.date_modified == prev.get("date_modified")
+                    )
+            prev_pid = prev.get("profile_id")
+            # 多个 bat 指向同一 profileId 时，上次输出中的条目可能来自另一个 bat，不能沿用
+            reusable = prev_pid in previous and previous[prev_pid].get("bat_name") == bat_name
+            if same_game and (prev.get("skip") or reusable):
+                new_bats[bat_name] = prev
+                if prev.get("skip") == "no_match":
+                    skipped_no_match += 1
+                elif prev.get("skip") == "no_profile":
+                    skipped_no_profile += 1
+                else:
+                    result[prev_pid] = previous[prev_pid]
+                    reused += 1
+                continue
+
+        if lb_games is None:
+            # XML 未变化但该 bat 有变化：此时才解析 XML
+            with stage("xml_load"):
+                lb_games = load_launchbox_games()
 
         lb_game = lb_games.get(bat_name)
         if lb_game is None:
             skipped_no_match += 1
+            new_bats[bat_name] = {"bat": bat_signature, "skip": "no_match"}
             continue
 
-        profile_id = extract_profile_id_from_bat(bat_path)
+        with stage("profile_resolution"):
+            value, error = prefetched.get(bat_path, (None, True))
+            profile_id = value if not error else cache.bat_profile_id(bat_path)
         if not profile_id:
             skipped_no_profile += 1
+            new_bats[bat_name] = {
+                "bat": bat_signature,
+                "date_modified": lb_game.date_modified,
+                "skip": "no_profile",
+            }
             continue
 
-        result[profile_id] = {
+        result[profile_id] = build_description(profile_id, bat_name, lb_game)
+        new_bats[bat_name] = {
+            "bat": bat_signature,
+            "date_modified": lb_game.date_modified,
             "profile_id": profile_id,
-            "bat_name": bat_name,
-            "title": lb_game.title,
-            "notes": lb_game.notes,
-            "genre": lb_game.genre,
-            "developer": lb_game.developer,
-            "publisher": lb_game.publisher,
-            "release_date": lb_game.release_date,
         }
 
-    # 写出总 JSON 文件
-    with io.open(OUTPUT_JSON, "w", encoding="utf-8") as f:
-        json.dump(result, f, ensure_ascii=False, indent=2)
+    # 写出总 JSON 文件（内容不变时不改写，变化时原子替换）
+    json_written = False
+    if args.format in ("json", "both", "all"):
+        with stage("write_output"):
+            json_written = write_if_changed(
+                OUTPUT_JSON, json.dumps(result, ensure_ascii=False, indent=2)
+            )
+
+    # 写出 SQLite 目录库与二进制索引：增量模式下，只有上次写出的内容摘要与本次结果相同、
+    # 且文件之后未被改动时才跳过（JSON 与目录库可能由不同 --format 的运行分别写出）
+    digest = result_digest(result)
+    fts = None
+    if args.format in ("sqlite", "both", "all"):
+        paths = [args.catalog]
+        if not (args.incremental and output_current(outputs.get("sqlite"), paths, digest)):
+            with stage("write_output"):
+                fts = write_catalog(args.catalog, result)
+            outputs["sqlite"] = output_record(paths, digest)
+
+    # 写出二进制索引与说明数据块（同上）
+    pack_size = None
+    if args.format in ("pack", "all"):
+        paths = [args.pack, notes_path_for(args.pack)]
+        if not (args.incremental and output_current(outputs.get("pack"), paths, digest)):
+            with stage("write_output"):
+                pack_size = write_pack(args.pack, result)
+            outputs["pack"] = output_record(paths, digest)
+
+    # 增量模式以 JSON 输出为基准，只写 SQLite / 二进制索引时 bat 状态沿用上次，只更新输出摘要
+    if args.format in ("json", "both", "all"):
+        new_state = {"version": STATE_VERSION, "xml": xml_signature, "bats": new_bats}
+    else:
+        new_state = {"version": STATE_VERSION, "xml": saved_state["xml"], "bats": saved_state["bats"]}
+    new_state["outputs"] = outputs
+    with stage("write_output"):
+        write_if_changed(STATE_JSON, json.dumps(new_state, ensure_ascii=False, sort_keys=True))
+    cache.save()
 
     print("处理完成。")
-    print("  已写出描述文件:", OUTPUT_JSON)
+    if args.format in ("json", "both", "all"):
+        if json_written:
+            print("  已写出描述文件:", OUTPUT_JSON)
+        else:
+            print("  描述文件内容无变化，未改写:", OUTPUT_JSON)
+    if args.incremental:
+        print("  沿用上次结果的条目:", reused, "，重新生成的条目:", len(result) - reused)
+    if fts is not None:
+        print("  已写出目录库:", args.catalog, "（说明全文索引: {}）".format(fts or "不可用，搜索退回 LIKE"))
+    if pack_size is not None:
+        print("  已写出二进制索引:", args.pack, "（{} 字节），说明数据块:".format(pack_size), notes_path_for(args.pack))
     print("  跳过（未在 LaunchBox 中找到对应 bat 名）的数量:", skipped_no_match)
     print("  跳过（bat 中未解析出 profileId）的数量:", skipped_no_profile)
+    cache.report()
+    finish_metrics(args, "extract_launchbox_descriptions")
     return 0
 
 
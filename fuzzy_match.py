@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+基于 n-gram 倒排索引的模糊匹配，用于替代「每个游戏名 × 每张图片」逐一
+SequenceMatcher 的全量扫描。
+
+- 所有候选名称只在建索引时规范化一次（由调用方传入已规范化的 key）。
+- 拉丁字母按字符三元组（trigram）建倒排；含中日韩文字的名称额外按二元组
+  （bigram）建倒排，短名称（不足 3 个字符）按整体与单字建倒排。
+- 查询时先对「共享 n-gram」的候选计算 SequenceMatcher.ratio()，再用字符 token
+  倒排表补全可能超过当前最高分的候选；每次比较前先用长度上界、公共字符数上界剪枝。
+
+得分与原先 difflib.SequenceMatcher(None, query, key).ratio() 完全相同，
+同分时取原列表中靠前的候选，结果与原先的线性扫描一致。
+
+独立运行时执行一个简单的规模测试:
+
+    python fuzzy_match.py --sizes 1000 2000 4000 8000
+"""
+
+from __future__ import annotations
+
+import argparse
+import difflib
+import math
+import random
+import sys
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+
+def _has_cjk(s: str) -> bool:
+    return any("\u4e00" <= ch <= "\u9fff" or "\u3040" <= ch <= "\u30ff" for ch in s)
+
+
+def ngrams(key: str) -> Set[str]:
+    """返回 key 的 n-gram 集合（trigram；含 CJK 时加 bigram；短串加整体与单字）。"""
+    grams: Set[str] = set()
+    n = len(key)
+    if n == 0:
+        return grams
+    if n < 3:
+        grams.add(key)
+        grams.update(key)
+        return grams
+    for i in range(n - 2):
+        grams.add(key[i:i + 3])
+    if _has_cjk(key):
+        for i in range(n - 1):
+            grams.add(key[i:i + 2])
+    return grams
+
+
+def ratio(query: str, key: str) -> float:
+    """与原脚本相同的相似度定义（输入均为已规范化字符串）。"""
+    if not query or not key:
+        return 0.0
+    if query == key:
+        return 1.0
+    return difflib.SequenceMatcher(None, query, key).ratio()
+
+
+def char_counts(key: str) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for ch in key:
+        counts[ch] = counts.get(ch, 0) + 1
+    return counts
+
+
+def char_tokens(key: str) -> List[Tuple[str, int]]:
+    """把 key 拆成 (字符, 第几次出现) 的 token，两串共享的 token 数即为公共字符数。"""
+    seen: Dict[str, int] = {}
+    out: List[Tuple[str, int]] = []
+    for ch in key:
+        n = seen.get(ch, 0) + 1
+        seen[ch] = n
+        out.append((ch, n))
+    return out
+
+
+class FuzzyIndex(object):
+    """
+    对一组已规范化的 key 建立倒排索引。
+    候选通过下标（与传入列表顺序一致）标识。
+
+    查询分两步:
+    1) n-gram 候选：与查询共享 n-gram 的名称，按共享数从多到少计算得分，
+       通常很快就能得到一个较高的当前最高分。
+    2) 补全：ratio 不超过 2*公共字符数/总长度，按当前最高分算出所需的最少公共字符数，
+       只需探查查询中最稀有的少数字符 token 的倒排表（prefix filtering），
+       就能找出所有「仍可能超过当前最高分」的名称，保证结果与全量扫描一致。
+    """
+
+    def __init__(self, keys: List[str]):
+        self.keys = keys
+        self.postings: Dict[str, List[int]] = {}
+        self.token_postings: Dict[Tuple[str, int], List[int]] = {}
+        self.counts: List[Dict[str, int]] = []
+        self.comparisons = 0
+        for idx, key in enumerate(keys):
+            for gram in ngrams(key):
+                self.postings.setdefault(gram, []).append(idx)
+            for token in char_tokens(key):
+                self.token_postings.setdefault(token, []).append(idx)
+            self.counts.append(char_counts(key))
+
+    def candidates(self, query: str, excluded: Optional[Set[int]] = None) -> List[Tuple[int, int]]:
+        """
+        返回与 query 共享 n-gram 的候选 [(共享数, 下标), ...]，按共享数降序、下标升序。
+        """
+        counts: Dict[int, int] = {}
+        for gram in ngrams(query):
+            for idx in self.postings.get(gram, ()):
+                counts[idx] = counts.get(idx, 0) + 1
+        if excluded:
+            for idx in excluded:
+                counts.pop(idx, None)
+        return sorted(((c, i) for i, c in counts.items()), key=lambda x: (-x[0], x[1]))
+
+    def _prefix_candidates(self, query: str, threshold: float) -> Set[int]:
+        """
+        返回所有可能 ratio >= threshold 的候选下标（超集）。
+        候选需满足: 2*公共字符数/(lq+lk) >= threshold 且 2*min(lq,lk)/(lq+lk) >= threshold。
+        """
+        len_q = len(query)
+        if threshold <= 0.0:
+            return set(range(len(self.keys)))
+        # 满足长度上界的最短 key，对应所需公共字符数的最小值
+        min_len_k = max(1, int(math.ceil(len_q * threshold / (2.0 - threshold) - 1e-9)))
+        need = int(math.ceil(threshold * (len_q + min_len_k) / 2.0 - 1e-9))
+        need = max(1, min(need, len_q))
+        tokens = char_tokens(query)
+        tokens.sort(key=lambda t: len(self.token_postings.get(t, ())))
+        found: Set[int] = set()
+        for token in tokens[: len_q - need + 1]:
+            found.update(self.token_postings.get(token, ()))
+        return found
+
+    def _wins(self, score: float, idx: int, best_score: float, best_idx: int) -> bool:
+        if score > best_score:
+            return True
+        return score == best_score and 0 <= best_idx and idx < best_idx
+
+    def top(
+        self,
+        query: str,
+        k: int,
+        min_ratio: float,
+        excluded: Optional[Set[int]] = None,
+    ) -> List[Tuple[float, int]]:
+        """
+        返回得分最高的至多 k 个候选 [(得分, 下标), ...]（得分均 > min_ratio），
+        按得分降序排列，同分时下标小者在前。
+        """
+        if not query or k <= 0:
+            return []
+        len_q = len(query)
+        q_counts = char_counts(query)
+        found: List[Tuple[float, int]] = []
+        evaluated: Set[int] = set()
+
+        def floor() -> Tuple[float, int]:
+            # 新候选必须胜过的「门槛」：未满 k 个时为 min_ratio，否则为当前第 k 名
+            if len(found) < k:
+                return min_ratio, -1
+            return found[-1]
+
+        def consider(idx: int) -> None:
+            evaluated.add(idx)
+            key = self.keys[idx]
+            if not key:
+                return
+            floor_score, floor_idx = floor()
+            total = len_q + len(key)
+            # 上界剪枝：ratio <= 2*min(len)/total，以及 2*公共字符数/total
+            if not self._wins(2.0 * min(len_q, len(key)) / total, idx, floor_score, floor_idx):
+                return
+            k_counts = self.counts[idx]
+            common = sum(min(n, k_counts.get(ch, 0)) for ch, n in q_counts.items())
+            if not self._wins(2.0 * common / total, idx, floor_score, floor_idx):
+                return
+            self.comparisons += 1
+            if query == key:
+                score = 1.0
+            else:
+                score = difflib.SequenceMatcher(None, query, key).ratio()
+            if self._wins(score, idx, floor_score, floor_idx):
+                found.append((score, idx))
+                found.sort(key=lambda x: (-x[0], x[1]))
+                del found[k:]
+
+        for _shared, idx in self.candidates(query, excluded):
+            consider(idx)
+
+        floor_score = floor()[0]
+        if floor_score < 1.0:
+            for idx in sorted(self._prefix_candidates(query, floor_score)):
+                if idx in evaluated or (excluded and idx in excluded):
+                    continue
+                consider(idx)
+
+        return found
+
+    def best(
+        self,
+        query: str,
+        min_ratio: float,
+        excluded: Optional[Set[int]] = None,
+    ) -> Optional[Tuple[float, int]]:
+        """
+        返回得分最高（且 > min_ratio）的候选 (得分, 下标)；同分取下标最小者。
+        """
+        found = self.top(query, 1, min_ratio, excluded)
+        return found[0] if found else None
+
+
+def linear_best(
+    query: str,
+    keys: List[str],
+    min_ratio: float,
+    excluded: Optional[Set[int]] = None,
+) -> Optional[Tuple[float, int]]:
+    """原先的全量线性扫描（用于对照与 --matcher scan）。"""
+    best_score = min_ratio
+    best_idx = -1
+    for idx, key in enumerate(keys):
+        if excluded and idx in excluded:
+            continue
+        score = ratio(query, key)
+        if score > best_score:
+            best_score = score
+            best_idx = idx
+    if best_idx < 0:
+        return None
+    return best_score, best_idx
+
+
+def _synthetic_names(count: int, rng: random.Random) -> List[str]:
+    words = [
+        "time", "crisis", "wangan", "midnight", "maximum", "tune", "initial",
+        "house", "dead", "virtua", "fighter", "tekken", "mario", "kart",
+        "sega", "rally", "star", "wars", "battle", "gear", "taiko", "drum",
+        "化解危机", "头文字", "湾岸", "午夜", "极速", "太鼓", "达人", "赛车",
+    ]
+    out = []
+    for i in range(count):
+        n = rng.randint(2, 4)
+        out.append("".join(rng.choice(words) for _ in range(n)) + str(i % 97))
+    return out
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="FuzzyIndex 与线性扫描的规模对比")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 2000, 4000, 8000])
+    parser.add_argument("--queries", type=int, default=300, help="每个规模下的查询数")
+    parser.add_argument("--min-ratio", type=float, default=0.25)
+    parser.add_argument("--scan", action="store_true", help="同时计时线性扫描并核对结果")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    print("images  queries  index_build(s)  index_query(s)  comparisons  scan(s)  same")
+    for size in args.sizes:
+        keys = _synthetic_names(size, rng)
+        queries = [rng.choice(keys)[:-1] for _ in range(args.queries)]
+
+        t0 = time.perf_counter()
+        index = FuzzyIndex(keys)
+        t1 = time.perf_counter()
+        got = [index.best(q, args.min_ratio) for q in queries]
+        t2 = time.perf_counter()
+
+        scan_time = "-"
+        same = "-"
+        if args.scan:
+            t3 = time.perf_counter()
+            want = [linear_best(q, keys, args.min_ratio) for q in queries]
+            scan_time = "%.2f" % (time.perf_counter() - t3)
+            same = str(sum(1 for a, b in zip(got, want) if a == b)) + "/" + str(len(queries))
+
+        print("%6d  %7d  %14.3f  %14.3f  %11d  %7s  %s" % (
+            size, len(queries), t1 - t0, t2 - t1, index.comparisons, scan_time, same))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
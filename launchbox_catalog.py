@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+launchbox_descriptions 的 SQLite 版本（目录库）。
+
+与 launchbox_descriptions.json 内容相同，但按 profile_id 建主键，
+title / genre 建索引，notes 建全文索引:
+- SQLite 3.34+ 用 FTS5 的 trigram 分词，中文说明中的任意子串（3 个字符以上）都能走索引；
+- 否则用 FTS5 / FTS4 的默认分词（unicode61，只能按整词匹配），供需要分词检索的读取方直接查询；
+- 都不可用时不建全文索引。
+search_notes 始终是子串匹配：查询整体作为一个短语交给 trigram 索引
+（不解析 AND / OR / 列名等 FTS 语法，结果与 LIKE 一致），其余情况用 LIKE。
+读取方按 profile_id 点查即可，不必在启动时反序列化整份说明。
+
+表结构:
+    games(profile_id PRIMARY KEY, bat_name, title, notes, genre,
+          developer, publisher, release_date)
+    games_fts(notes)          -- 外部内容表，rowid 与 games 一致
+    catalog_meta(key, value)  -- schema_version / fts（"fts5_trigram" / "fts5" / "fts4" / ""）
+"""
+
+from __future__ import annotations
+
+import os
+import pathlib
+import sqlite3
+from typing import Dict, Iterable, List, Optional
+
+SCHEMA_VERSION = "1"
+
+FTS_TRIGRAM = "fts5_trigram"
+# trigram 分词：短于 3 个字符的查询无法用 MATCH
+TRIGRAM_MIN_CHARS = 3
+
+COLUMNS = (
+    "profile_id",
+    "bat_name",
+    "title",
+    "notes",
+    "genre",
+    "developer",
+    "publisher",
+    "release_date",
+)
+
+
+def _create_fts(conn: sqlite3.Connection) -> str:
+    """创建 notes 全文索引，返回使用的模块名（"fts5_trigram"/"fts5"/"fts4"/""）。"""
+    for module in (FTS_TRIGRAM, "fts5", "fts4"):
+        if module == FTS_TRIGRAM:
+            sql = (
+                "CREATE VIRTUAL TABLE games_fts USING fts5("
+                "notes, content='games', content_rowid='rowid', tokenize='trigram')"
+            )
+        elif module == "fts5":
+            sql = (
+                "CREATE VIRTUAL TABLE games_fts USING fts5("
+                "notes, content='games', content_rowid='rowid')"
+            )
+        else:
+            sql = "CREATE VIRTUAL TABLE games_fts USING fts4(content='games', notes)"
+        try:
+            conn.execute(sql)
+            return module
+        except sqlite3.OperationalError:
+            continue
+    return ""
+
+
+def _fts_phrase(query: str) -> str:
+    """把查询整体写成一个 FTS5 短语，避免 "-"、":"、AND 等被当作查询语法。"""
+    return '"' + query.replace('"', '""') + '"'
+
+
+def write_catalog(db_path: str, entries: Dict[str, Dict]) -> str:
+    """
+    将 { profile_id: 说明字典 } 写成 SQLite 目录库。
+    先写到临时文件再替换，读取方不会看到写了一半的库。
+    返回全文索引使用的模块名（空字符串表示未建全文索引）。
+    """
+    tmp_path = db_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute(
+            "CREATE TABLE games ("
+            "profile_id TEXT PRIMARY KEY, bat_name TEXT, title TEXT, notes TEXT, "
+            "genre TEXT, developer TEXT, publisher TEXT, release_date TEXT)"
+        )
+        conn.execute("CREATE TABLE catalog_meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.executemany(
+            "INSERT INTO games VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                tuple(entries[pid].get(col, "") for col in COLUMNS)
+                for pid in sorted(entries)
+            ),
+        )
+        conn.execute("CREATE INDEX idx_games_title ON games(title COLLATE NOCASE)")
+        conn.execute("CREATE INDEX idx_games_genre ON games(genre)")
+
+        fts = _create_fts(conn)
+        if fts:
+            conn.execute("INSERT INTO games_fts(rowid, notes) SELECT rowid, notes FROM games")
+        conn.executemany(
+            "INSERT INTO catalog_meta VALUES (?, ?)",
+            [("schema_version", SCHEMA_VERSION), ("fts", fts)],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+    os.replace(tmp_path, db_path)
+    return fts
+
+
+class LaunchBoxCatalog(object):
+    """只读访问目录库：按 profile_id / 标题 / 分类查询，按说明全文搜索。"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        # 路径转成 file: URI（百分号转义），Windows 路径及含 ? # % 的文件名也能只读打开
+        uri = pathlib.Path(db_path).resolve().as_uri() + "?mode=ro"
+        self.conn = sqlite3.connect(uri, uri=True)
+        self.conn.row_factory = sqlite3.Row
+        row = self.conn.execute("SELECT value FROM catalog_meta WHERE key = 'fts'").fetchone()
+        self.fts = row[0] if row else ""
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def get(self, profile_id: str) -> Optional[Dict[str, str]]:
+        row = self.conn.execute(
+            "SELECT * FROM games WHERE profile_id = ?", (profile_id,)
+        ).fetchone()
+        return dict(row) if row is not None else None
+
+    def by_title(self, title: str) -> List[Dict[str, str]]:
+        rows = self.conn.execute(
+            "SELECT * FROM games WHERE title = ? COLLATE NOCASE", (title,)
+        )
+        return [dict(r) for r in rows]
+
+    def by_genre(self, genre: str) -> List[Dict[str, str]]:
+        rows = self.conn.execute(
+            "SELECT * FROM games WHERE genre = ? ORDER BY profile_id", (genre,)
+        )
+        return [dict(r) for r in rows]
+
+    def search_notes(self, query: str, limit: int = 50) -> List[Dict[str, str]]:
+        """
+        在 notes 中搜索 query 这个子串。trigram 索引可用且查询不少于 3 个字符时用 MATCH，
+        否则（或 MATCH 执行出错时）用 LIKE；默认分词的索引只能整词匹配，不用于这里。
+        """
+        if self.fts == FTS_TRIGRAM and len(query) >= TRIGRAM_MIN_CHARS:
+            sql = (
+                "SELECT games.* FROM games_fts JOIN games ON games.rowid = games_fts.rowid "
+                "WHERE games_fts MATCH ? LIMIT ?"
+            )
+            try:
+                rows = self.conn.execute(sql, (_fts_phrase(query), limit)).fetchall()
+                return [dict(r) for r in rows]
+            except sqlite3.OperationalError:
+                pass
+        # 转义 LIKE 通配符，查询中的 % / _ 按字面匹配，与 MATCH 短语一致
+        pattern = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        rows = self.conn.execute(
+            "SELECT * FROM games WHERE notes LIKE ? ESCAPE '\\' LIMIT ?",
+            ("%" + pattern + "%", limit),
+        )
+        return [dict(r) for r in rows]
+
+    def profile_ids(self) -> Iterable[str]:
+        for (pid,) in self.conn.execute("SELECT profile_id FROM games ORDER BY profile_id"):
+            yield pid
@@ -0,0 +1,371 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+按 profileId 随机访问 LaunchBox 导出文件（Teknoparrot.xml）中的单个 <Game>。
+
+前端与各工具一次通常只需要少数几个游戏（选中的游戏、favorites.json 中的收藏、某一类型），
+iter_launchbox_games 却每次都要解析全部 <Game>。这里第一次打开时流式扫描一遍 XML，
+记录每个 <Game> 元素的字节偏移与长度，并按 bat 解析出 profileId（规则与
+extract_launchbox_descriptions.py 相同），写入旁路索引文件（默认 Teknoparrot.index.json）；
+之后的查询只 seek 到对应位置、解析这一个元素。
+
+    from launchbox_index import LaunchBoxIndex
+
+    with LaunchBoxIndex.open(LAUNCHBOX_XML) as index:
+        game = index.get("WMMT6RR")              # { 子元素名: 文本 }，不存在时为 None
+        games = index.get_many(favorite_ids)     # 按文件顺序读取，结果按传入顺序
+        shooters = index.by_genre("Shooter")     # { profileId: 记录 }
+
+索引失效:
+- 打开时 stat XML 与 bat 目录：XML 的 mtime / size 或 bat 目录的 mtime（新增、删除、改名 bat）
+  有变化时重新扫描；
+- get 时再 stat 一次该游戏所用的 bat，内容被改写时重新扫描。
+  其它 bat 被原地改写为指向同一 profileId 的情况不会被发现，需要时用 rebuild=True 打开。
+"""
+
+from __future__ import annotations
+
+import io
+import json
+import os
+import xml.etree.ElementTree as ET
+from typing import Dict, Iterable, List, Optional
+from xml.parsers import expat
+
+from async_io import stat_many
+from launchbox_xml import GAME_TAG
+from media_metrics import count
+from profile_cache import BatDirectory, ProfileResolutionCache
+
+INDEX_VERSION = 1
+
+# 扫描时顺便记录的字段（bat 名用于解析 profileId；by_genre / genres 不必再读取 XML）
+_INDEXED_FIELDS = ("Title", "ApplicationPath", "Genre")
+
+# 可以直接截取字节片段解析的编码（片段前补上同样的 XML 声明）
+_BYTE_COMPATIBLE_ENCODINGS = ("utf-8", "utf8", "us-ascii", "ascii", "iso-8859-1", "latin-1", "latin1")
+
+
+def index_path_for(xml_path: str) -> str:
+    """XML 对应的旁路索引路径（Teknoparrot.xml -> Teknoparrot.index.json）。"""
+    return os.path.splitext(xml_path)[0] + ".index.json"
+
+
+def _signature(path: str) -> Optional[List[int]]:
+    count("files_stat")
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def scan_game_offsets(xml_path: str) -> Dict:
+    """
+    流式扫描一遍 XML，返回
+        { "encoding": 声明的编码, "games": [[偏移, 长度, Title, bat 名（不含扩展名）, Genre], ...] }
+    偏移与长度以字节计，覆盖完整的 <Game ...>...</Game> 元素。
+    """
+    games: List[List] = []
+    state = {"depth": 0, "start": 0, "field": None, "encoding": "utf-8"}
+    fields: Dict[str, List[str]] = {}
+    ends: List[int] = []
+
+    parser = expat.ParserCreate()
+
+    def on_decl(version, encoding, standalone):
+        if encoding:
+            state["encoding"] = encoding.lower()
+
+    def on_start(name, attrs):
+        state["depth"] += 1
+        if state["depth"] == 2 and name == GAME_TAG:
+            state["start"] = parser.CurrentByteIndex
+            fields.clear()
+        elif state["depth"] == 3 and name in _INDEXED_FIELDS:
+            state["field"] = name
+            fields[name] = []
+
+    def on_end(name):
+        depth = state["depth"]
+        state["depth"] -= 1
+        if depth == 3:
+            state["field"] = None
+        elif depth == 2 and name == GAME_TAG:
+            app_path = "".join(fields.get("ApplicationPath", ())).strip()
+            bat_name = os.path.splitext(os.path.basename(app_path))[0] if app_path else ""
+            games.append([
+                state["start"],
+                0,
+                "".join(fields.get("Title", ())).strip(),
+                bat_name,
+                "".join(fields.get("Genre", ())).strip(),
+            ])
+            # 结束标签的起始位置，长度在下面统一计算
+            ends.append(parser.CurrentByteIndex)
+
+    def on_text(data):
+        if state["field"] is not None and state["depth"] == 3:
+            fields[state["field"]].append(data)
+
+    parser.XmlDeclHandler = on_decl
+    parser.StartElementHandler = on_start
+    parser.EndElementHandler = on_end
+    parser.CharacterDataHandler = on_text
+
+    count("files_opened")
+    with io.open(xml_path, "rb") as fp:
+        parser.ParseFile(fp)
+        if state["encoding"] not in _BYTE_COMPATIBLE_ENCODINGS:
+            raise ValueError("unsupported XML encoding for offset index: " + state["encoding"])
+        # 每个元素的结尾是结束标签之后的第一个 ">"；<Game/> 则是起始标签本身的 ">"
+        for game, end in zip(games, ends):
+            fp.seek(game[0])
+            head = fp.read(256)
+            close = head.find(b">")
+            if close > 0 and head[close - 1:close] == b"/":
+                game[1] = close + 1
+                continue
+            fp.seek(end)
+            tail = fp.read(64)
+            close = tail.find(b">")
+            if close < 0:
+                raise ValueError("malformed <Game> element at byte %d: %s" % (game[0], xml_path))
+            game[1] = end + close + 1 - game[0]
+    count("bytes_read", os.path.getsize(xml_path))
+    return {"encoding": state["encoding"], "games": games}
+
+
+def _element_fields(elem: ET.Element, fields: Optional[Iterable[str]]) -> Dict[str, str]:
+    """与 iter_launchbox_games 相同的记录格式；fields 为 None 时包含全部子元素。"""
+    if fields is None:
+        return {child.tag: child.text or "" for child in elem}
+    record = {name: "" for name in fields}
+    for child in elem:
+        if child.tag in record:
+            record[child.tag] = child.text or ""
+    return record
+
+
+class LaunchBoxIndex(object):
+    """
+    Teknoparrot.xml 的 profileId -> <Game> 字节位置索引。用 LaunchBoxIndex.open() 创建。
+    """
+
+    def __init__(
+        self,
+        xml_path: str,
+        bat_dir: str,
+        index_path: str,
+        data: Dict,
+        cache: Optional[ProfileResolutionCache] = None,
+    ):
+        self.xml_path = xml_path
+        self.bat_dir = bat_dir
+        self.index_path = index_path
+        self._cache = cache
+        self._games: List[List] = data["games"]
+        self._profiles: Dict[str, int] = data["profiles"]
+        self._bats: Dict[str, List] = data["bats"]  # profileId -> [bat 文件名, mtime_ns, size]
+        encoding = data["encoding"]
+        self._prolog = b"" if encoding in ("utf-8", "utf8") else (
+            '<?xml version="1.0" encoding="%s"?>' % encoding
+        ).encode("ascii")
+        self._fp = None
+
+    # ---- 创建 / 失效检查 ----
+
+    @classmethod
+    def open(
+        cls,
+        xml_path: str,
+        bat_dir: Optional[str] = None,
+        index_path: Optional[str] = None,
+        cache: Optional[ProfileResolutionCache] = None,
+        rebuild: bool = False,
+    ) -> "LaunchBoxIndex":
+        """
+        打开（必要时重新生成）索引。
+        bat_dir 默认为 XML 所在目录下的 bat；cache 只在需要重新扫描时使用，
+        未传入时使用默认的 profile_cache.json（并在扫描后写回）。
+        """
+        if bat_dir is None:
+            bat_dir = os.path.join(os.path.dirname(os.path.abspath(xml_path)), "bat")
+        if index_path is None:
+            index_path = index_path_for(xml_path)
+
+        sources = cls._source_signatures(xml_path, bat_dir)
+        data = None if rebuild else cls._load(index_path, sources)
+        if data is None:
+            data = cls._build(xml_path, bat_dir, cache, sources)
+            cls._save(index_path, data)
+        return cls(xml_path, bat_dir, index_path, data, cache)
+
+    @staticmethod
+    def _source_signatures(xml_path: str, bat_dir: str) -> Dict:
+        bat_dir_sig = _signature(bat_dir)
+        return {
+            "xml": _signature(xml_path),
+            "bat_dir": bat_dir_sig[0] if bat_dir_sig is not None else None,
+        }
+
+    @staticmethod
+    def _load(index_path: str, sources: Dict) -> Optional[Dict]:
+        if not os.path.isfile(index_path):
+            return None
+        try:
+            with io.open(index_path, "r", encoding="utf-8") as fp:
+                data = json.load(fp)
+        except Exception:
+            return None
+        if not isinstance(data, dict) or data.get("version") != INDEX_VERSION:
+            return None
+        if data.get("sources") != sources:
+            return None
+        count("files_opened")
+        return data
+
+    @staticmethod
+    def _build(
+        xml_path: str,
+        bat_dir: str,
+        cache: Optional[ProfileResolutionCache],
+        sources: Dict,
+    ) -> Dict:
+        scanned = scan_game_offsets(xml_path)
+        games = scanned["games"]
+
+        # 与 extract_launchbox_descriptions 相同：同一 bat 名以 XML 中最后一个游戏为准，
+        # 按 bat 文件名排序解析，多个 bat 指向同一 profileId 时以排在后面的为准
+        by_bat: Dict[str, int] = {}
+        for i, game in enumerate(games):
+            if game[3]:
+                by_bat[game[3]] = i
+
+        profiles: Dict[str, int] = {}
+        bats: Dict[str, List] = {}
+        if sources["bat_dir"] is not None:
+            own_cache = cache is None
+            if own_cache:
+                cache = ProfileResolutionCache()
+            directory = BatDirectory(bat_dir, cache)
+            wanted = [f for f in directory.names() if os.path.splitext(f)[0] in by_bat]
+            directory.prefetch(wanted)
+            stats = stat_many([os.path.join(bat_dir, f) for f in wanted])
+            count("files_stat", len(wanted))
+            for bat_file, st in zip(wanted, stats):
+                profile_id = directory.profile_id(bat_file)
+                if not profile_id:
+                    continue
+                profiles[profile_id] = by_bat[os.path.splitext(bat_file)[0]]
+                bats[profile_id] = [bat_file, st.st_mtime_ns, st.st_size] if st else [bat_file, 0, 0]
+            if own_cache:
+                cache.save()
+
+        return {
+            "version": INDEX_VERSION,
+            "sources": sources,
+            "encoding": scanned["encoding"],
+            "games": games,
+            "profiles": profiles,
+            "bats": bats,
+        }
+
+    @staticmethod
+    def _save(index_path: str, data: Dict) -> None:
+        """原子写出索引文件；写入失败时只提示，本次仍使用内存中的索引。"""
+        tmp_path = index_path + ".tmp"
+        try:
+            with io.open(tmp_path, "w", encoding="utf-8") as fp:
+                json.dump(data, fp, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, index_path)
+        except (IOError, OSError) as exc:
+            print("写入 LaunchBox 索引失败:", index_path, "错误:", exc)
+
+    def _bat_changed(self, profile_id: str) -> bool:
+        bat_file, mtime_ns, size = self._bats[profile_id]
+        return _signature(os.path.join(self.bat_dir, bat_file)) != [mtime_ns, size]
+
+    def _reload(self) -> None:
+        """bat 被改写：重新扫描并替换当前内容。"""
+        fresh = LaunchBoxIndex.open(
+            self.xml_path, self.bat_dir, self.index_path, self._cache, rebuild=True
+        )
+        self.close()
+        self.__dict__.update(fresh.__dict__)
+
+    # ---- 读取 ----
+
+    def close(self) -> None:
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+
+    def __enter__(self) -> "LaunchBoxIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._profiles)
+
+    def __contains__(self, profile_id: str) -> bool:
+        return profile_id in self._profiles
+
+    def profile_ids(self) -> List[str]:
+        return sorted(self._profiles)
+
+    def _element(self, i: int) -> ET.Element:
+        offset, length = self._games[i][0], self._games[i][1]
+        if self._fp is None:
+            count("files_opened")
+            self._fp = io.open(self.xml_path, "rb")
+        self._fp.seek(offset)
+        data = self._fp.read(length)
+        count("bytes_read", len(data))
+        return ET.fromstring(self._prolog + data)
+
+    def element(self, profile_id: str) -> Optional[ET.Element]:
+        """profileId 对应的 <Game> 元素；不存在时返回 None。"""
+        if profile_id in self._profiles and self._bat_changed(profile_id):
+            self._reload()
+        i = self._profiles.get(profile_id)
+        return self._element(i) if i is not None else None
+
+    def get(self, profile_id: str, fields: Optional[Iterable[str]] = None) -> Optional[Dict[str, str]]:
+        """
+        profileId 对应游戏的 { 子元素名: 文本 }（不做 strip）；不存在时返回 None。
+        指定 fields 时只包含这些字段，缺失的为 ""（同 iter_launchbox_games）。
+        """
+        elem = self.element(profile_id)
+        return _element_fields(elem, fields) if elem is not None else None
+
+    def _records(self, profile_ids: List[str], fields: Optional[Iterable[str]]) -> Dict[str, Dict[str, str]]:
+        # 按字节偏移顺序读取（顺序读，网络共享上更快），结果保持传入顺序
+        found = [pid for pid in profile_ids if pid in self._profiles]
+        fields = tuple(fields) if fields is not None else None
+        records: Dict[str, Dict[str, str]] = {}
+        for pid in sorted(found, key=lambda p: self._games[self._profiles[p]][0]):
+            records[pid] = _element_fields(self._element(self._profiles[pid]), fields)
+        return {pid: records[pid] for pid in found}
+
+    def get_many(
+        self,
+        profile_ids: Iterable[str],
+        fields: Optional[Iterable[str]] = None,
+    ) -> Dict[str, Dict[str, str]]:
+        """多个 profileId 的记录（如 favorites.json 中的收藏）；不存在的 profileId 不在结果中。"""
+        return self._records(list(dict.fromkeys(profile_ids)), fields)
+
+    def by_genre(self, genre: str, fields: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, str]]:
+        """Genre（strip 后原样比较，与 build_cover_atlases 的分类一致）为 genre 的游戏，按 profileId 排序。"""
+        genre = genre.strip()
+        return self._records(
+            [pid for pid in self.profile_ids() if self._games[self._profiles[pid]][4] == genre],
+            fields,
+        )
+
+    def genres(self) -> List[str]:
+        """出现过的所有 Genre（不读取 XML）。"""
+        return sorted(set(self._games[i][4] for i in self._profiles.values()))
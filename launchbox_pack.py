@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+launchbox_descriptions 的紧凑二进制版本：固定布局的索引文件 + 单独的说明（notes）数据块。
+
+launchbox_descriptions.json 的大部分字节是 notes，而 notes 只在选中游戏时才显示。
+拆分后启动时只需读取很小的索引，notes 按偏移在需要时读取（数据块可 mmap）。
+
+launchbox_descriptions.idx（小端）:
+    文件头  40 字节  magic "LBDX", version u16, 保留 u16, count u32, record_size u32,
+                     strings_offset u32, strings_size u32, notes 数据块摘要 16 字节
+    记录    count × 68 字节，按 profile_id 排序（可二分查找），每条:
+                     7 个文本字段各 (偏移 u32, 长度 u32)，偏移相对字符串区:
+                         profile_id, bat_name, title, genre, developer, publisher, release_date
+                     notes (偏移 u64, 长度 u32)，偏移相对 notes 数据块
+    字符串区 UTF-8 文本依次拼接
+
+launchbox_descriptions.notes:
+    文件头  20 字节  magic "LBDN" + 与索引文件头相同的 16 字节摘要（用于确认两者配套）
+    之后为所有 notes 的 UTF-8 文本依次拼接，没有分隔符
+
+两个文件都先写临时文件再替换；读取时若摘要不一致（只替换了其中一个），抛出 ValueError。
+"""
+
+from __future__ import annotations
+
+import bisect
+import hashlib
+import io
+import mmap
+import os
+import struct
+from typing import Dict, Iterator, List, Optional
+
+PACK_VERSION = 1
+INDEX_MAGIC = b"LBDX"
+NOTES_MAGIC = b"LBDN"
+
+TEXT_FIELDS = (
+    "profile_id",
+    "bat_name",
+    "title",
+    "genre",
+    "developer",
+    "publisher",
+    "release_date",
+)
+
+HEADER = struct.Struct("<4sHHIIII16s")
+RECORD = struct.Struct("<" + "II" * len(TEXT_FIELDS) + "QI")
+NOTES_HEADER = struct.Struct("<4s16s")
+
+
+def notes_path_for(index_path: str) -> str:
+    """索引文件对应的 notes 数据块路径（同名，扩展名 .notes）。"""
+    return os.path.splitext(index_path)[0] + ".notes"
+
+
+def write_pack(index_path: str, entries: Dict[str, Dict]) -> int:
+    """
+    将 { profile_id: 说明字典 } 写成索引 + notes 数据块，返回索引文件字节数。
+    """
+    strings = io.BytesIO()
+    notes = io.BytesIO()
+    string_offsets: Dict[bytes, int] = {}
+    records: List[bytes] = []
+
+    def add_string(text: str):
+        data = (text or "").encode("utf-8")
+        offset = string_offsets.get(data)
+        if offset is None:
+            offset = string_offsets[data] = strings.tell()
+            strings.write(data)
+        return offset, len(data)
+
+    for profile_id in sorted(entries):
+        entry = dict(entries[profile_id], profile_id=profile_id)
+        values: List[int] = []
+        for field in TEXT_FIELDS:
+            values.extend(add_string(entry.get(field, "")))
+        note = (entry.get("notes") or "").encode("utf-8")
+        values.extend((notes.tell(), len(note)))
+        notes.write(note)
+        records.append(RECORD.pack(*values))
+
+    notes_data = notes.getvalue()
+    digest = hashlib.blake2b(notes_data, digest_size=16).digest()
+    strings_offset = HEADER.size + RECORD.size * len(records)
+    strings_data = strings.getvalue()
+    header = HEADER.pack(
+        INDEX_MAGIC, PACK_VERSION, 0, len(records), RECORD.size,
+        strings_offset, len(strings_data), digest,
+    )
+
+    notes_path = notes_path_for(index_path)
+    _write_atomic(notes_path, NOTES_HEADER.pack(NOTES_MAGIC, digest) + notes_data)
+    _write_atomic(index_path, header + b"".join(records) + strings_data)
+    return strings_offset + len(strings_data)
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    tmp_path = path + ".tmp"
+    with io.open(tmp_path, "wb") as fp:
+        fp.write(data)
+    os.replace(tmp_path, path)
+
+
+class LaunchBoxPack(object):
+    """
+    只读访问：打开时只读取索引文件；notes 在调用 notes() 时才从数据块（mmap）读取。
+    """
+
+    def __init__(self, index_path: str):
+        self.index_path = index_path
+        self.notes_path = notes_path_for(index_path)
+        with io.open(index_path, "rb") as fp:
+            data = fp.read()
+        if len(data) < HEADER.size:
+            raise ValueError("index file too short: " + index_path)
+        (magic, version, _reserved, count, record_size,
+         strings_offset, strings_size, digest) = HEADER.unpack_from(data)
+        if magic != INDEX_MAGIC or version != PACK_VERSION or record_size != RECORD.size:
+            raise ValueError("unsupported index file: " + index_path)
+        self._data = data
+        self._count = count
+        self._strings_offset = strings_offset
+        self._digest = digest
+        self._ids = [self._field(i, 0) for i in range(count)]
+        self._notes_fp = None
+        self._notes_map: Optional[mmap.mmap] = None
+
+    def close(self) -> None:
+        if self._notes_map is not None:
+            self._notes_map.close()
+            self._notes_map = None
+        if self._notes_fp is not None:
+            self._notes_fp.close()
+            self._notes_fp = None
+
+    def __enter__(self) -> "LaunchBoxPack":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _record(self, i: int):
+        return RECORD.unpack_from(self._data, HEADER.size + i * RECORD.size)
+
+    def _field(self, i: int, field_index: int) -> str:
+        values = self._record(i)
+        offset, length = values[2 * field_index], values[2 * field_index + 1]
+        start = self._strings_offset + offset
+        return self._data[start:start + length].decode("utf-8")
+
+    def _find(self, profile_id: str) -> int:
+        i = bisect.bisect_left(self._ids, profile_id)
+        if i < self._count and self._ids[i] == profile_id:
+            return i
+        return -1
+
+    def _entry(self, i: int) -> Dict[str, str]:
+        values = self._record(i)
+        entry: Dict[str, str] = {}
+        for k, field in enumerate(TEXT_FIELDS):
+            start = self._strings_offset + values[2 * k]
+            entry[field] = self._data[start:start + values[2 * k + 1]].decode("utf-8")
+        return entry
+
+    def get(self, profile_id: str) -> Optional[Dict[str, str]]:
+        """按 profile_id 查找，返回不含 notes 的说明字典；不存在时返回 None。"""
+        i = self._find(profile_id)
+        return self._entry(i) if i >= 0 else None
+
+    def entries(self) -> Iterator[Dict[str, str]]:
+        """按 profile_id 顺序返回所有条目（不含 notes）。"""
+        for i in range(self._count):
+            yield self._entry(i)
+
+    def profile_ids(self) -> List[str]:
+        return list(self._ids)
+
+    def _notes_buffer(self):
+        if self._notes_map is None:
+            fp = io.open(self.notes_path, "rb")
+            try:
+                head = fp.read(NOTES_HEADER.size)
+                if len(head) < NOTES_HEADER.size:
+                    raise ValueError("notes file too short: " + self.notes_path)
+                magic, digest = NOTES_HEADER.unpack(head)
+                if magic != NOTES_MAGIC or digest != self._digest:
+                    raise ValueError("notes file does not match index: " + self.notes_path)
+                self._notes_map = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            except BaseException:
+                fp.close()
+                raise
+            self._notes_fp = fp
+        return self._notes_map
+
+    def notes(self, profile_id: str) -> Optional[str]:
+        """读取一个游戏的 notes；profile_id 不存在时返回 None。"""
+        i = self._find(profile_id)
+        if i < 0:
+            return None
+        values = self._record(i)
+        offset, length = values[-2], values[-1]
+        if length == 0:
+            return ""
+        start = NOTES_HEADER.size + offset
+        return self._notes_buffer()[start:start + length].decode("utf-8")
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+LaunchBox 导出文件（Teknoparrot.xml）的流式读取工具，供各脚本共用。
+
+基于 ElementTree.iterparse 逐个 <Game> 读取，只保留调用方需要的字段，
+每读完一个顶层元素就清理掉，峰值内存不随 XML 体积增长。
+
+用法示例:
+
+    from launchbox_xml import iter_launchbox_games
+
+    for game in iter_launchbox_games(LAUNCHBOX_XML, ("Title", "ApplicationPath")):
+        print(game["Title"], game["ApplicationPath"])
+
+只需要其中少数几个游戏（按 profileId、收藏或类型）时用 launchbox_index.LaunchBoxIndex，
+按字节偏移只解析用到的 <Game>。
+"""
+
+from __future__ import annotations
+
+import os
+import xml.etree.ElementTree as ET
+from typing import Dict, Iterable, Iterator
+
+from media_metrics import count
+
+
+GAME_TAG = "Game"
+
+
+def iter_launchbox_games(xml_path: str, fields: Iterable[str]) -> Iterator[Dict[str, str]]:
+    """
+    逐条产出 <Game> 记录:
+        { 字段名: 文本 }
+    只包含 fields 中列出的子元素；缺失或空元素的值为 ""（不做 strip，由调用方决定）。
+    非 <Game> 的顶层元素（<Platform>、<AdditionalApplication> 等）直接丢弃。
+    """
+    wanted = frozenset(fields)
+    count("files_stat")
+    count("files_opened")
+    count("bytes_read", os.path.getsize(xml_path))
+    depth = 0
+    root = None
+    record: Dict[str, str] = {}
+
+    for event, elem in ET.iterparse(xml_path, events=("start", "end")):
+        if event == "start":
+            depth += 1
+            if depth == 1:
+                root = elem
+            elif depth == 2:
+                record = {}
+            continue
+
+        depth -= 1
+        if depth == 2:
+            # <Game> 的直接子元素：结束时文本已完整
+            if elem.tag in wanted:
+                record[elem.tag] = elem.text or ""
+        elif depth == 1:
+            if elem.tag == GAME_TAG:
+                for name in wanted:
+                    record.setdefault(name, "")
+                yield record
+            # 清理已读完的顶层元素，避免整棵树留在内存中
+            elem.clear()
+            if root is not None:
+                root.clear()
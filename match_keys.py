@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+各脚本共用的匹配 key 规范化。
+
+规范化规则（原先三个脚本各有一份 normalize_for_match，结果完全相同，统一到这里）:
+    1) Unicode NFKC（全角转半角、兼容字符统一）
+    2) 转小写
+    3) 去掉所有非文字字符（空白、标点、下划线、符号），保留字母、数字、中日韩文字
+
+    "Time Crisis 5"、"time_crisis-5"、"ＴＩＭＥ　ＣＲＩＳＩＳ ５" -> "timecrisis5"
+
+normalize_for_match 带有限大小的内存缓存，同一字符串在一次运行中只计算一次；
+KeyIndex 把源文件名的 key 持久化到磁盘，
+同一图片库再次运行时文件名不再重新规范化；写回时只保留本次运行用到的文件名，
+因此每个脚本使用各自的索引文件（match_keys.<脚本>.json），互不清除对方的记录。
+规则变更时提升 POLICY_VERSION，旧索引自动作废。
+
+命令行参数（由 add_key_index_arguments 统一添加）:
+    --key-index PATH   文件名 key 索引路径（默认: 脚本目录下的 match_keys.<脚本>.json）
+    与 --rebuild-cache 一起使用时丢弃旧索引。
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, Set
+
+POLICY_VERSION = 1
+MEMO_SIZE = 1 << 16
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_KEY_INDEX_PATH = os.path.join(BASE_DIR, "match_keys.json")
+# 各脚本的默认索引文件名；同一文件被多个脚本共用时，save() 的清理会互相删掉对方的记录
+KEY_INDEX_NAME = "match_keys.{}.json"
+
+# \W 不含下划线，需单独去掉；中日韩文字属于 \w，会被保留
+_NON_WORD_RE = re.compile(r"[\W_]+")
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def normalize_for_match(s: str) -> str:
+    """规范化字符串用于匹配：统一 Unicode、转小写、去空格/标点"""
+    if not s:
+        return ""
+    return _NON_WORD_RE.sub("", unicodedata.normalize("NFKC", s).lower())
+
+
+class KeyIndex(object):
+    """
+    源文件名（不含扩展名）-> 规范化 key 的持久索引。
+
+    key 只取决于文件名本身，因此无需记录 mtime；
+    文件改名后按新名字重新计算。save() 只写回本次运行中查询过的文件名，
+    已删除 / 已改名的文件的记录随之清除，索引不会无限增长。
+    """
+
+    def __init__(self, index_path: str = DEFAULT_KEY_INDEX_PATH, rebuild: bool = False):
+        self.index_path = index_path
+        self.keys: Dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+        self._seen: Set[str] = set()
+        self._dirty = False
+        if not rebuild:
+            self._load()
+        else:
+            self._dirty = True
+
+    def _load(self) -> None:
+        if not os.path.isfile(self.index_path):
+            return
+        try:
+            with io.open(self.index_path, "r", encoding="utf-8") as fp:
+                data = json.load(fp)
+        except Exception:
+            return
+        if isinstance(data, dict) and data.get("version") == POLICY_VERSION:
+            keys = data.get("keys")
+            if isinstance(keys, dict):
+                self.keys = keys
+
+    def key(self, name: str) -> str:
+        """返回 normalize_for_match(name)，优先使用索引中的结果。"""
+        self._seen.add(name)
+        key = self.keys.get(name)
+        if key is not None:
+            self.hits += 1
+            return key
+        self.misses += 1
+        key = self.keys[name] = normalize_for_match(name)
+        self._dirty = True
+        return key
+
+    def save(self) -> None:
+        """
+        原子写回索引文件（先写临时文件再替换），只保留本次运行查询过的文件名；
+        没有新增也没有需要清除的记录时不写。
+        """
+        if len(self.keys) != len(self._seen):
+            self.keys = {name: key for name, key in self.keys.items() if name in self._seen}
+            self._dirty = True
+        if not self._dirty:
+            return
+        tmp_path = self.index_path + ".tmp"
+        try:
+            with io.open(tmp_path, "w", encoding="utf-8") as fp:
+                json.dump(
+                    {"version": POLICY_VERSION, "keys": self.keys},
+                    fp,
+                    ensure_ascii=False,
+                    sort_keys=True,
+                )
+            os.replace(tmp_path, self.index_path)
+            self._dirty = False
+        except (IOError, OSError) as exc:
+            print("写入文件名 key 索引失败:", self.index_path, "错误:", exc)
+
+    def report(self) -> None:
+        print("  文件名 key 索引: 命中 {}，重新计算 {}".format(self.hits, self.misses))
+
+
+def add_key_index_arguments(parser: argparse.ArgumentParser, script: str) -> None:
+    """script 为调用脚本的简称，决定默认索引文件名 match_keys.<script>.json。"""
+    name = KEY_INDEX_NAME.format(script)
+    parser.add_argument(
+        "--key-index",
+        default=os.path.join(BASE_DIR, name),
+        help="文件名规范化 key 的索引文件（默认: ./{}）".format(name),
+    )
+
+
+def open_key_index_from_args(args: argparse.Namespace) -> KeyIndex:
+    return KeyIndex(
+        index_path=args.key_index,
+        rebuild=getattr(args, "rebuild_cache", False),
+    )
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+按文件内容建立索引，找出 covers/Box - 3D、covers/Arcade - Cabinet、coverdata 等
+来源中内容完全相同的图片/视频。
+
+分三级筛选，尽量少读文件:
+1) 文件大小：大小唯一的文件不可能有重复，不读取内容。
+2) 部分哈希：大小相同的文件只读开头和结尾各 64KB。
+3) 完整哈希：部分哈希仍相同的文件才完整读取。
+
+同一组重复文件中，最先加入索引的路径作为代表（canonical）。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from media_metrics import count
+
+
+PARTIAL_CHUNK = 64 * 1024
+FULL_CHUNK = 1024 * 1024
+
+
+def partial_hash(path: str, size: int) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with io.open(path, "rb") as fp:
+        count("files_opened")
+        head = fp.read(PARTIAL_CHUNK)
+        h.update(head)
+        count("bytes_read", len(head))
+        if size > PARTIAL_CHUNK:
+            fp.seek(max(PARTIAL_CHUNK, size - PARTIAL_CHUNK))
+            tail = fp.read(PARTIAL_CHUNK)
+            h.update(tail)
+            count("bytes_read", len(tail))
+    return h.hexdigest()
+
+
+def full_hash(path: str) -> str:
+    h = hashlib.blake2b(digest_size=32)
+    with io.open(path, "rb") as fp:
+        count("files_opened")
+        while True:
+            chunk = fp.read(FULL_CHUNK)
+            if not chunk:
+                break
+            h.update(chunk)
+            count("bytes_read", len(chunk))
+    return h.hexdigest()
+
+
+class ContentIndex(object):
+    """
+    内容寻址索引。add() 登记路径，首次查询时统一计算。
+    """
+
+    def __init__(self, paths: Iterable[str] = ()):
+        self._order: Dict[str, int] = {}
+        self._paths: List[str] = []
+        self._canonical: Optional[Dict[str, str]] = None
+        self._sizes: Dict[str, int] = {}
+        self.partial_hashed = 0
+        self.full_hashed = 0
+        for path in paths:
+            self.add(path)
+
+    def add(self, path: str) -> None:
+        key = os.path.normcase(os.path.abspath(path))
+        if key in self._order:
+            return
+        self._order[key] = len(self._paths)
+        self._paths.append(path)
+        self._canonical = None
+
+    def _build(self) -> Dict[str, str]:
+        canonical: Dict[str, str] = {}
+        by_size: Dict[int, List[str]] = {}
+        for path in self._paths:
+            count("files_stat")
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            self._sizes[path] = size
+            by_size.setdefault(size, []).append(path)
+
+        for size, same_size in by_size.items():
+            if len(same_size) < 2:
+                continue
+            by_partial: Dict[str, List[str]] = {}
+            for path in same_size:
+                try:
+                    digest = partial_hash(path, size)
+                except (IOError, OSError):
+                    continue
+                self.partial_hashed += 1
+                by_partial.setdefault(digest, []).append(path)
+            for same_partial in by_partial.values():
+                if len(same_partial) < 2:
+                    continue
+                by_full: Dict[str, List[str]] = {}
+                for path in same_partial:
+                    try:
+                        digest = full_hash(path)
+                    except (IOError, OSError):
+                        continue
+                    self.full_hashed += 1
+                    by_full.setdefault(digest, []).append(path)
+                for group in by_full.values():
+                    for path in group[1:]:
+                        canonical[path] = group[0]
+        return canonical
+
+    def canonical(self, path: str) -> str:
+        """返回与 path 内容相同的代表路径（没有重复时返回 path 本身）。"""
+        if self._canonical is None:
+            self._canonical = self._build()
+        return self._canonical.get(path, path)
+
+    def unique(self, paths: List[str]) -> List[str]:
+        """按内容去重，保留每组中最先出现的路径，顺序不变。"""
+        seen = set()
+        out: List[str] = []
+        for path in paths:
+            key = self.canonical(path)
+            if key in seen:
+                continue
+            seen.add(key)
+            out.append(path)
+        return out
+
+    def duplicate_summary(self) -> Tuple[int, int, int]:
+        """返回 (重复组数, 多余文件数, 多余文件占用字节数)。"""
+        if self._canonical is None:
+            self._canonical = self._build()
+        groups = set(self._canonical.values())
+        extra = len(self._canonical)
+        extra_bytes = sum(self._sizes.get(path, 0) for path in self._canonical)
+        return len(groups), extra, extra_bytes
@@ -0,0 +1,310 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+统一的媒体导入入口：Teknoparrot.xml 只解析一次、bat 目录只扫描一次，
+在内存中依次完成以下阶段（与单独运行对应脚本的结果相同）:
+
+    descriptions   生成 launchbox_descriptions.json   (extract_launchbox_descriptions.py)
+    covers         Box - 3D 封面复制到 Media/Covers   (rename_covers_from_box3d.py)
+    thumbnails     生成封面缩略图与中等尺寸变体       (build_cover_thumbnails.py，需要 Pillow)
+    atlases        按收藏/类型把缩略图拼成图集        (build_cover_atlases.py，需要 Pillow)
+    videos         视频移动到 Media/Videos            (rename_videos_from_launchbox.py)
+    previews       生成视频预览片段                   (build_video_previews.py，需要 ffmpeg)
+    all            依次运行以上各阶段（未安装 Pillow 时跳过 thumbnails / atlases，
+                   找不到 ffmpeg 时跳过 previews）
+
+使用方式（在 TeknoParrotBigBox 目录下运行）:
+
+    python media_ingest.py all
+    python media_ingest.py all --incremental --metrics
+    python media_ingest.py covers --dedup
+    python media_ingest.py covers --rank-covers   # 多张候选封面时按图片尺寸挑选
+    python media_ingest.py videos --link hard
+    python media_ingest.py previews --preview-duration 20 --preview-jobs 4
+    python media_ingest.py descriptions --catalog launchbox_descriptions.db   # 同时写 SQLite 目录库
+    python media_ingest.py descriptions --pack launchbox_descriptions.idx     # 同时写二进制索引
+
+缓存、并发复制、计时相关参数与各脚本相同（--cache / --jobs / --incremental / --metrics-out ...），
+复制/移动参数同时作用于封面和视频阶段。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+from typing import Dict, List, Optional
+
+import build_cover_atlases as atlases
+import build_cover_thumbnails as thumbnails
+import build_video_previews as previews
+import extract_launchbox_descriptions as descriptions
+import rename_covers_from_box3d as covers
+import rename_videos_from_launchbox as videos
+from cover_rank import add_rank_arguments, open_ranker_from_args
+from launchbox_catalog import write_catalog
+from launchbox_pack import write_pack
+from launchbox_xml import iter_launchbox_games
+from media_dedup import ContentIndex
+from media_metrics import add_metrics_arguments, finish_metrics, stage
+from media_transfer import OP_COPY, OP_MOVE, add_transfer_arguments, run_transfers_from_args
+from profile_cache import (
+    BatDirectory,
+    ProfileResolutionCache,
+    add_cache_arguments,
+    open_cache_from_args,
+)
+from profile_scanner import add_scanner_arguments
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LAUNCHBOX_XML = os.path.join(BASE_DIR, "Teknoparrot.xml")
+BAT_DIR = os.path.join(BASE_DIR, "bat")
+
+STAGES = ("descriptions", "covers", "thumbnails", "atlases", "videos", "previews")
+
+
+class IngestContext(object):
+    """各阶段共用的输入：LaunchBox 游戏表（两种索引）与 bat -> profileId。"""
+
+    def __init__(self, cache: ProfileResolutionCache, io_concurrency: int):
+        self.cache = cache
+        with stage("xml_load"):
+            records = list(iter_launchbox_games(LAUNCHBOX_XML, descriptions.GAME_FIELDS))
+        self.games_by_bat = descriptions.games_by_bat_name(records)
+        self.games_by_title = covers.games_by_title(records)
+        print("LaunchBox 中读取到游戏条目数:", len(self.games_by_title))
+
+        self.bats: Optional[BatDirectory] = None
+        if os.path.isdir(BAT_DIR):
+            self.bats = BatDirectory(BAT_DIR, cache)
+            with stage("profile_resolution"):
+                self.bats.scan()
+                # LaunchBox 中有对应游戏的 bat 一次并发解析完（网络共享上各 bat 的往返延迟相互重叠）
+                self.bats.prefetch(
+                    [n for n in self.bats.names() if os.path.splitext(n)[0] in self.games_by_bat],
+                    io_concurrency,
+                )
+
+
+def run_descriptions(ctx: IngestContext, args: argparse.Namespace) -> int:
+    print("======== 说明 (launchbox_descriptions.json) ========")
+    if ctx.bats is None:
+        print("未找到 bat 目录:", BAT_DIR)
+        return 1
+
+    result: Dict[str, Dict] = {}
+    skipped_no_match = 0
+    skipped_no_profile = 0
+    for bat_file in ctx.bats.names():
+        bat_name = os.path.splitext(bat_file)[0]
+        lb_game = ctx.games_by_bat.get(bat_name)
+        if lb_game is None:
+            skipped_no_match += 1
+            continue
+        with stage("profile_resolution"):
+            profile_id = ctx.bats.profile_id(bat_file)
+        if not profile_id:
+            skipped_no_profile += 1
+            continue
+        result[profile_id] = descriptions.build_description(profile_id, bat_name, lb_game)
+
+    with stage("write_output"):
+        written = descriptions.write_if_changed(
+            descriptions.OUTPUT_JSON, json.dumps(result, ensure_ascii=False, indent=2)
+        )
+        if args.catalog:
+            write_catalog(args.catalog, result)
+        if args.pack:
+            write_pack(args.pack, result)
+
+    if written:
+        print("  已写出描述文件:", descriptions.OUTPUT_JSON)
+    else:
+        print("  描述文件内容无变化，未改写:", descriptions.OUTPUT_JSON)
+    if args.catalog:
+        print("  已写出目录库:", args.catalog)
+    if args.pack:
+        print("  已写出二进制索引:", args.pack)
+    print("  跳过（未在 LaunchBox 中找到对应 bat 名）的数量:", skipped_no_match)
+    print("  跳过（bat 中未解析出 profileId）的数量:", skipped_no_profile)
+    return 0
+
+
+def run_covers(ctx: IngestContext, args: argparse.Namespace) -> int:
+    print("======== 封面 (Box - 3D / Arcade - Cabinet) ========")
+    title_to_profile: Dict[str, str] = {}
+    if ctx.bats is None:
+        print("未找到 bat 目录，改用 UserProfiles / launchbox_descriptions 按标题匹配 profileId")
+        with stage("profile_resolution"):
+            title_to_profile = covers.load_title_to_profile_without_bat(
+                ctx.cache, args.profile_jobs, args.io_concurrency
+            )
+        if not title_to_profile:
+            print("也未找到 UserProfiles 或 launchbox_descriptions.json，无法解析 profileId")
+            return 1
+
+    mapping = covers.load_cover_mapping()
+    if not mapping:
+        print("Box - 3D / Arcade - Cabinet 目录中未发现任何图片")
+        return 1
+    if not os.path.isdir(covers.DEST_COVERS_DIR):
+        os.makedirs(covers.DEST_COVERS_DIR)
+
+    content_index = None
+    if args.dedup:
+        content_index = ContentIndex(p for paths in mapping.values() for p in paths)
+
+    ranker = open_ranker_from_args(args, ctx.cache)
+    if ranker is not None:
+        with stage("matching"):
+            ranker.prefetch(covers.multi_candidate_paths(ctx.games_by_title, mapping))
+
+    tasks, skipped = covers.plan_cover_tasks(
+        ctx.games_by_title, mapping, ctx.bats, title_to_profile, content_index, ranker
+    )
+    with stage("transfer"):
+        results = run_transfers_from_args(
+            args, tasks, covers.DEST_COVERS_DIR, "box3d", content_index
+        )
+    covers.report_cover_results(results, skipped)
+    return 0
+
+
+def run_thumbnails(ctx: IngestContext, args: argparse.Namespace) -> int:
+    print("======== 封面缩略图 (Media/Covers/thumb, mid) ========")
+    if thumbnails.Image is None:
+        print("未安装 Pillow，跳过缩略图（pip install Pillow）")
+        return 0 if args.command == "all" else 1
+    if not os.path.isdir(covers.DEST_COVERS_DIR):
+        print("未找到封面目录:", covers.DEST_COVERS_DIR)
+        return 1
+
+    stats = thumbnails.build_thumbnails(covers.DEST_COVERS_DIR, args.thumb_jobs)
+    thumbnails.report_thumbnails(stats)
+    return 1 if stats["failed"] else 0
+
+
+def run_atlases(ctx: IngestContext, args: argparse.Namespace) -> int:
+    print("======== 封面图集 (Media/Covers/atlases) ========")
+    if thumbnails.Image is None:
+        print("未安装 Pillow，跳过图集（pip install Pillow）")
+        return 0 if args.command == "all" else 1
+    if not os.path.isfile(os.path.join(covers.DEST_COVERS_DIR, thumbnails.MANIFEST_NAME)):
+        print("未找到缩略图清单，请先运行 thumbnails 阶段")
+        return 1
+
+    atlases.report_atlases(atlases.build_atlases(covers.DEST_COVERS_DIR))
+    return 0
+
+
+def run_videos(ctx: IngestContext, args: argparse.Namespace) -> int:
+    print("======== 视频 (videos) ========")
+    if ctx.bats is None:
+        print("未找到 bat 目录:", BAT_DIR)
+        return 1
+
+    with stage("media_scan"):
+        video_mapping = videos.load_video_files()
+    if not video_mapping:
+        print("videos 目录中未发现任何视频:", videos.VIDEOS_DIR)
+        return 1
+    if not os.path.isdir(videos.DEST_VIDEOS_DIR):
+        os.makedirs(videos.DEST_VIDEOS_DIR)
+
+    tasks, skipped = videos.plan_video_tasks(
+        ctx.games_by_title, video_mapping, ctx.bats, OP_COPY if args.link else OP_MOVE
+    )
+    with stage("transfer"):
+        results = run_transfers_from_args(args, tasks, videos.DEST_VIDEOS_DIR, "videos")
+        removed = videos.remove_stale_videos(results)
+    videos.report_video_results(results, skipped, len(removed))
+    return 0
+
+
+def run_previews(ctx: IngestContext, args: argparse.Namespace) -> int:
+    print("======== 视频预览片段 (Media/Videos/previews) ========")
+    ffmpeg = previews.find_ffmpeg(args.ffmpeg)
+    if ffmpeg is None:
+        print("未找到 ffmpeg，跳过预览片段（安装 ffmpeg 或用 --ffmpeg 指定路径）")
+        return 0 if args.command == "all" else 1
+    if not os.path.isdir(videos.DEST_VIDEOS_DIR):
+        print("未找到视频目录:", videos.DEST_VIDEOS_DIR)
+        return 1
+
+    stats = previews.build_previews(
+        ffmpeg, videos.DEST_VIDEOS_DIR, args.preview_jobs,
+        args.preview_start, args.preview_duration, args.preview_max_height,
+    )
+    previews.report_previews(stats)
+    return 1 if stats["failed"] else 0
+
+
+RUNNERS = {
+    "descriptions": run_descriptions,
+    "covers": run_covers,
+    "thumbnails": run_thumbnails,
+    "atlases": run_atlases,
+    "videos": run_videos,
+    "previews": run_previews,
+}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="一次读取 Teknoparrot.xml 与 bat 目录，生成说明、复制封面与缩略图、移动视频与预览片段"
+    )
+    parser.add_argument(
+        "command",
+        choices=STAGES + ("all",),
+        help="要运行的阶段: descriptions / covers / thumbnails / atlases / videos / previews / all",
+    )
+    parser.add_argument(
+        "--catalog",
+        default=None,
+        help="descriptions 阶段同时写出 SQLite 目录库到该路径",
+    )
+    parser.add_argument(
+        "--pack",
+        default=None,
+        help="descriptions 阶段同时写出二进制索引到该路径（说明数据块为同名 .notes）",
+    )
+    parser.add_argument(
+        "--thumb-jobs",
+        type=int,
+        default=0,
+        help="thumbnails 阶段并行编码的进程数（默认 0 = 按 CPU 数）",
+    )
+    previews.add_preview_arguments(parser)
+    add_cache_arguments(parser)
+    add_scanner_arguments(parser)
+    add_rank_arguments(parser)
+    add_transfer_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    if not os.path.isfile(LAUNCHBOX_XML):
+        print("未找到 Teknoparrot.xml:", LAUNCHBOX_XML)
+        return 1
+
+    cache = open_cache_from_args(args)
+    ctx = IngestContext(cache, args.io_concurrency)
+    if not ctx.games_by_title:
+        return 1
+
+    selected: List[str] = list(STAGES) if args.command == "all" else [args.command]
+    status = 0
+    for name in selected:
+        if RUNNERS[name](ctx, args) != 0:
+            status = 1
+        print()
+
+    cache.save()
+    cache.report()
+    finish_metrics(args, "media_ingest")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
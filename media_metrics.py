@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+各脚本共用的分阶段计时与计数。
+
+脚本用 stage("xml_load") 包住每个阶段，底层模块在读写文件处调用 count()，
+计数记在当前所在的最内层阶段上（不在任何阶段内时记在 "other"）:
+
+    files_stat      stat 过的文件数
+    files_opened    打开读取/写入的文件数
+    bytes_read      读取的字节数
+    bytes_written   写入的字节数
+    comparisons     匹配时的相似度/子串比较次数
+
+命令行参数（由 add_metrics_arguments 统一添加）:
+    --metrics           运行结束后打印各阶段耗时与计数
+    --metrics-out PATH  以 JSON lines 追加写入 PATH（每个阶段一行，另有一行 total），
+                        便于长期记录、画图对比
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+COUNTERS = ("files_stat", "files_opened", "bytes_read", "bytes_written", "comparisons")
+OTHER_STAGE = "other"
+
+
+class StageMetrics(object):
+    def __init__(self, name: str):
+        self.name = name
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.counters: Dict[str, int] = dict.fromkeys(COUNTERS, 0)
+
+
+class Metrics(object):
+    """
+    按阶段累计墙钟时间、CPU 时间与计数。
+    同名阶段多次进入时累加；count() 可在工作线程中调用。
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, StageMetrics] = {}
+        self._stack: List[str] = []
+        self._lock = threading.Lock()
+        self.started = time.time()
+        # 只累计最外层阶段，嵌套阶段的时间不重复计入 total
+        self._outer_wall = 0.0
+        self._outer_cpu = 0.0
+
+    def _get(self, name: str) -> StageMetrics:
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = StageMetrics(name)
+        return stage
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageMetrics]:
+        with self._lock:
+            current = self._get(name)
+            outermost = not self._stack
+            self._stack.append(name)
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield current
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+            with self._lock:
+                current.wall += wall
+                current.cpu += cpu
+                if outermost:
+                    self._outer_wall += wall
+                    self._outer_cpu += cpu
+                self._stack.pop()
+
+    def count(self, counter: str, n: int = 1) -> None:
+        with self._lock:
+            name = self._stack[-1] if self._stack else OTHER_STAGE
+            counters = self._get(name).counters
+            counters[counter] = counters.get(counter, 0) + n
+
+    def total(self) -> StageMetrics:
+        total = StageMetrics("total")
+        total.wall = self._outer_wall
+        total.cpu = self._outer_cpu
+        for stage in self.stages.values():
+            for key, value in stage.counters.items():
+                total.counters[key] = total.counters.get(key, 0) + value
+        return total
+
+    def report(self) -> None:
+        print("各阶段耗时与计数:")
+        print("  {:<20} {:>9} {:>9} {:>9} {:>9} {:>12} {:>12} {:>11}".format(
+            "阶段", "wall(s)", "cpu(s)", "stat", "open", "读取(B)", "写入(B)", "比较"))
+        for stage in list(self.stages.values()) + [self.total()]:
+            c = stage.counters
+            print("  {:<20} {:>9.3f} {:>9.3f} {:>9} {:>9} {:>12} {:>12} {:>11}".format(
+                stage.name, stage.wall, stage.cpu, c["files_stat"], c["files_opened"],
+                c["bytes_read"], c["bytes_written"], c["comparisons"]))
+
+    def write_jsonl(self, path: str, script: str) -> None:
+        """每个阶段一行追加写入 path，最后一行为 total。"""
+        run_id = "{}-{}".format(time.strftime("%Y%m%dT%H%M%S", time.localtime(self.started)), os.getpid())
+        timestamp = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started))
+        lines = []
+        for stage in list(self.stages.values()) + [self.total()]:
+            record = {
+                "run_id": run_id,
+                "time": timestamp,
+                "script": script,
+                "stage": stage.name,
+                "wall_s": round(stage.wall, 6),
+                "cpu_s": round(stage.cpu, 6),
+            }
+            record.update(stage.counters)
+            lines.append(json.dumps(record, ensure_ascii=False))
+        with io.open(path, "a", encoding="utf-8") as fp:
+            fp.write("\n".join(lines) + "\n")
+
+
+# 进程内共用的记录器：底层模块直接调用 count()，无需层层传参
+METRICS = Metrics()
+
+
+def stage(name: str):
+    return METRICS.stage(name)
+
+
+def count(counter: str, n: int = 1) -> None:
+    METRICS.count(counter, n)
+
+
+def add_metrics_arguments(parser: argparse.ArgumentParser) -> None:
+    """为脚本添加统一的计时/计数输出参数。"""
+    parser.add_argument(
+        "--metrics",
+        action="store_true",
+        help="结束时打印各阶段耗时、文件读写与比较次数",
+    )
+    parser.add_argument(
+        "--metrics-out",
+        default=None,
+        help="将各阶段计时与计数以 JSON lines 追加写入该文件",
+    )
+
+
+def finish_metrics(args: argparse.Namespace, script: str, metrics: Optional[Metrics] = None) -> None:
+    """按 --metrics / --metrics-out 输出本次运行的计时与计数。"""
+    metrics = metrics or METRICS
+    if args.metrics:
+        metrics.report()
+    if args.metrics_out:
+        try:
+            metrics.write_jsonl(args.metrics_out, script)
+        except (IOError, OSError) as exc:
+            print("写入计时数据失败:", args.metrics_out, "错误:", exc)
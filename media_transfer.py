@@ -0,0 +1,711 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+封面/视频的复制、移动阶段，供 rename_covers_from_box3d.py、rename_covers_from_coverdata.py、
+rename_videos_from_launchbox.py 共用。
+
+- 线程池并发（--jobs N），NAS / USB 上各文件的延迟相互重叠而不是累加。
+- 限制同时在传输中的字节数（--max-inflight-mb），避免大视频把内存/带宽占满；
+  单个文件超过上限时，在没有其它传输时单独进行。
+- 先写到 "目标.part" 再原子替换，目标文件存在即表示已完整写入。
+- 每完成一个文件就追加一行到日志（journal，--incremental / --prune 或指定 --journal 时）；
+  中断后重新运行时，日志中已完成、目标大小一致且源文件（mtime、大小）未变化的条目直接跳过。
+  全部成功后日志自动删除。
+- 写同一目标的多个任务按提交顺序在同一个工作线程中依次执行，结果与串行一致。
+- 增量模式（--incremental）：目标已存在且大小、修改时间与源一致（可选再比较
+  首尾数据的快速哈希 --hash）时跳过复制。
+- 放置方式（--link）：reflink（写时复制克隆）、hard（硬链接）、sym（符号链接）、
+  copy（字节复制）。指定的方式不被文件系统支持时按此顺序依次回退，
+  每个文件实际使用的方式会记录在结果中；auto 表示从最省的 reflink 开始尝试。
+  链接同样先建在 "目标.part" 再原子替换，之后任何写入都会替换目标而不会改动源文件。
+- --incremental / --prune 时，目标目录下保存 .sync_manifest.json，记录各脚本写入的「目标 -> 源」；
+  --prune 时删除本脚本上次写入、但本次已不再对应任何源的目标文件
+  （文件若已被其它脚本或手工替换则保留）。
+
+命令行参数（由 add_transfer_arguments 统一添加）:
+    --jobs N              并发数（默认 4）
+    --max-inflight-mb MB  同时传输的最大字节数（默认 256MB）
+    --journal PATH        续传日志路径（默认: --incremental / --prune 时为目标目录下的
+                          .transfer_journal.jsonl，否则不记录）
+    --incremental         跳过未变化的目标
+    --hash                增量比较时额外比较快速内容哈希
+    --prune               删除不再对应任何源的旧目标
+    --link MODE           放置方式: auto / reflink / hard / sym / copy
+"""
+
+from __future__ import annotations
+
+import argparse
+import errno
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from media_dedup import ContentIndex
+from media_metrics import count
+
+
+OP_COPY = "copy"
+OP_MOVE = "move"
+
+LINK_REFLINK = "reflink"
+LINK_HARD = "hard"
+LINK_SYM = "sym"
+LINK_COPY = "copy"
+LINK_AUTO = "auto"
+# 从最省到最通用的回退顺序
+LINK_FALLBACK = (LINK_REFLINK, LINK_HARD, LINK_SYM, LINK_COPY)
+
+# Linux FICLONE ioctl（btrfs / xfs / bcachefs 等支持写时复制克隆）
+_FICLONE = 0x40049409
+
+JOURNAL_NAME = ".transfer_journal.jsonl"
+MANIFEST_NAME = ".sync_manifest.json"
+PART_SUFFIX = ".part"
+
+# FAT / SMB 上的修改时间精度可能只有 2 秒
+MTIME_TOLERANCE = 2.0
+QUICK_HASH_CHUNK = 1024 * 1024
+
+
+class TransferTask(object):
+    def __init__(self, src: str, dest: str, op: str = OP_COPY, tag: Any = None):
+        self.src = src
+        self.dest = dest
+        self.op = op
+        # 调用方附带的数据（例如匹配方式），原样带回到结果中
+        self.tag = tag
+
+
+class TransferResult(object):
+    def __init__(
+        self,
+        task: TransferTask,
+        ok: bool,
+        resumed: bool = False,
+        unchanged: bool = False,
+        error: Optional[BaseException] = None,
+        mode: Optional[str] = None,
+    ):
+        self.task = task
+        self.ok = ok
+        self.resumed = resumed
+        self.unchanged = unchanged
+        self.error = error
+        # 实际使用的放置方式（LINK_*），移动任务为 OP_MOVE，未执行时为 None
+        self.mode = mode
+        # 内容去重：以链接共享同内容目标而节省的字节数
+        self.shared_bytes = 0
+
+
+class ByteBudget(object):
+    """限制同时在传输中的字节数。"""
+
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, size: int) -> None:
+        with self._cond:
+            # 超过上限的单个大文件：等其它传输都结束后单独进行
+            while self.in_flight > 0 and self.in_flight + size > self.limit:
+                self._cond.wait()
+            self.in_flight += size
+
+    def release(self, size: int) -> None:
+        with self._cond:
+            self.in_flight -= size
+            self._cond.notify_all()
+
+
+class TransferJournal(object):
+    """记录已完成的传输（JSON lines），用于中断后续传。"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._fp = None
+        if os.path.isfile(path):
+            try:
+                with io.open(path, "r", encoding="utf-8") as fp:
+                    for line in fp:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            continue  # 中断时可能写了半行
+                        if isinstance(entry, dict) and entry.get("dest"):
+                            self.done[_norm(entry["dest"])] = entry
+            except (IOError, OSError):
+                pass
+
+    def is_done(self, task: TransferTask) -> bool:
+        """
+        日志中已完成、目标大小一致，且源文件与记录时相同（mtime_ns、大小）才算完成。
+        移动任务完成后源已不存在，此时只看目标。
+        """
+        entry = self.done.get(_norm(task.dest))
+        if not entry:
+            return False
+        if entry.get("src") != task.src or entry.get("op") != task.op:
+            return False
+        count("files_stat")
+        try:
+            src_st = os.stat(task.src)
+        except OSError:
+            src_st = None
+        if src_st is None:
+            if task.op != OP_MOVE:
+                return False
+        elif (
+            src_st.st_mtime_ns != entry.get("src_mtime_ns")
+            or src_st.st_size != entry.get("src_size")
+        ):
+            return False
+        try:
+            return os.path.getsize(task.dest) == entry.get("size")
+        except OSError:
+            return False
+
+    def record(self, task: TransferTask, size: int, src_st: os.stat_result) -> None:
+        """src_st 为传输前源文件的 stat 结果。"""
+        with self._lock:
+            if self._fp is None:
+                self._fp = io.open(self.path, "a", encoding="utf-8")
+            self._fp.write(json.dumps(
+                {
+                    "src": task.src,
+                    "dest": task.dest,
+                    "op": task.op,
+                    "size": size,
+                    "src_mtime_ns": src_st.st_mtime_ns,
+                    "src_size": src_st.st_size,
+                },
+                ensure_ascii=False,
+            ) + "\n")
+            self._fp.flush()
+
+    def close(self, remove: bool = False) -> None:
+        with self._lock:
+            if self._fp is not None:
+                self._fp.close()
+                self._fp = None
+        if remove and os.path.isfile(self.path):
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+class SyncManifest(object):
+    """
+    目标目录下的同步清单:
+        { "version": 1, "owners": { 脚本名: { 目标文件名: {"src", "size", "mtime_ns"} } } }
+    """
+
+    def __init__(self, dest_dir: str):
+        self.dest_dir = dest_dir
+        self.path = os.path.join(dest_dir, MANIFEST_NAME)
+        self.owners: Dict[str, Dict[str, Dict]] = {}
+        if os.path.isfile(self.path):
+            try:
+                with io.open(self.path, "r", encoding="utf-8") as fp:
+                    data = json.load(fp)
+                if isinstance(data, dict) and isinstance(data.get("owners"), dict):
+                    self.owners = data["owners"]
+            except (IOError, OSError, ValueError):
+                pass
+
+    def update(self, owner: str, results: List[TransferResult], prune: bool = False) -> List[str]:
+        """
+        用本次结果更新 owner 的记录；prune=True 时删除过期目标。
+        返回被删除的目标路径列表。
+        只记录复制任务：移动后源已不存在，下次运行不会再出现在计划里，不能据此清理。
+        """
+        previous = self.owners.get(owner, {})
+        current: Dict[str, Dict] = {}
+        failed = set()
+        for result in results:
+            if result.task.op != OP_COPY:
+                continue
+            name = os.path.basename(result.task.dest)
+            if not result.ok:
+                failed.add(name)
+                continue
+            try:
+                st = os.stat(result.task.dest)
+            except OSError:
+                continue
+            current[name] = {
+                "src": result.task.src,
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+            }
+
+        pruned: List[str] = []
+        for name, entry in previous.items():
+            if name in current:
+                continue
+            if name in failed or not prune:
+                current[name] = entry  # 本次失败或未要求清理：保留旧记录
+                continue
+            path = os.path.join(self.dest_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue  # 已不存在
+            if st.st_size != entry.get("size") or st.st_mtime_ns != entry.get("mtime_ns"):
+                continue  # 已被其它来源替换，不再归本脚本管理
+            try:
+                os.remove(path)
+                pruned.append(path)
+            except OSError as exc:
+                print("删除过期文件失败:", path, "错误:", exc)
+                current[name] = entry
+
+        self.owners[owner] = current
+        return pruned
+
+    def save(self) -> None:
+        tmp_path = self.path + ".tmp"
+        try:
+            with io.open(tmp_path, "w", encoding="utf-8") as fp:
+                json.dump(
+                    {"version": 1, "owners": self.owners},
+                    fp,
+                    ensure_ascii=False,
+                    sort_keys=True,
+                )
+            os.replace(tmp_path, self.path)
+        except (IOError, OSError) as exc:
+            print("写入同步清单失败:", self.path, "错误:", exc)
+
+
+def quick_hash(path: str) -> str:
+    """快速内容哈希：文件大小 + 开头与结尾各 1MB。"""
+    h = hashlib.blake2b(digest_size=16)
+    size = os.path.getsize(path)
+    h.update(str(size).encode("ascii"))
+    with io.open(path, "rb") as fp:
+        count("files_opened")
+        head = fp.read(QUICK_HASH_CHUNK)
+        h.update(head)
+        count("bytes_read", len(head))
+        if size > QUICK_HASH_CHUNK:
+            fp.seek(max(QUICK_HASH_CHUNK, size - QUICK_HASH_CHUNK))
+            tail = fp.read(QUICK_HASH_CHUNK)
+            h.update(tail)
+            count("bytes_read", len(tail))
+    return h.hexdigest()
+
+
+def is_unchanged(src: str, dest: str, use_hash: bool = False) -> bool:
+    """目标与源大小、修改时间一致（可选再比较快速哈希）时视为未变化。"""
+    count("files_stat", 2)
+    try:
+        src_st = os.stat(src)
+        dest_st = os.stat(dest)
+    except OSError:
+        return False
+    if src_st.st_size != dest_st.st_size:
+        return False
+    if abs(src_st.st_mtime - dest_st.st_mtime) > MTIME_TOLERANCE:
+        return False
+    if use_hash:
+        try:
+            return quick_hash(src) == quick_hash(dest)
+        except (IOError, OSError):
+            return False
+    return True
+
+
+def _norm(path: str) -> str:
+    return os.path.normcase(os.path.abspath(path))
+
+
+def _same_file(a: str, b: str) -> bool:
+    try:
+        return os.path.samefile(a, b)
+    except OSError:
+        return False
+
+
+def _copy_atomic(src: str, dest: str) -> None:
+    part = dest + PART_SUFFIX
+    try:
+        shutil.copy2(src, part)
+        os.replace(part, dest)
+        size = os.path.getsize(dest)
+        count("files_opened", 2)
+        count("bytes_read", size)
+        count("bytes_written", size)
+    except BaseException:
+        try:
+            os.remove(part)
+        except OSError:
+            pass
+        raise
+
+
+def _reflink(src: str, dest: str) -> None:
+    if not sys.platform.startswith("linux"):
+        raise OSError(errno.EOPNOTSUPP, "reflink is not supported on this platform")
+    import fcntl
+
+    with io.open(src, "rb") as fsrc, io.open(dest, "wb") as fdest:
+        count("files_opened", 2)
+        fcntl.ioctl(fdest.fileno(), _FICLONE, fsrc.fileno())
+    shutil.copystat(src, dest)
+
+
+def _symlink(src: str, dest: str) -> None:
+    os.symlink(os.path.abspath(src), dest)
+
+
+_PLACERS = {
+    LINK_REFLINK: _reflink,
+    LINK_HARD: os.link,
+    LINK_SYM: _symlink,
+}
+
+# 表示「该文件系统 / 平台不支持这种放置方式」的错误码；其它错误（如文件被占用、EACCES）
+# 只算这一个文件失败，不影响同目录的其它文件
+_UNSUPPORTED_ERRNOS = frozenset(
+    getattr(errno, name)
+    for name in ("EXDEV", "EOPNOTSUPP", "ENOTSUP", "EPERM", "ENOSYS")
+    if hasattr(errno, name)
+)
+# FICLONE 在不支持克隆的文件系统上还可能返回 EINVAL / ENOTTY
+_REFLINK_UNSUPPORTED_ERRNOS = _UNSUPPORTED_ERRNOS | {errno.EINVAL, errno.ENOTTY}
+# Windows: ERROR_INVALID_FUNCTION（FAT 上硬链接）、ERROR_NOT_SAME_DEVICE、ERROR_NOT_SUPPORTED、
+# ERROR_PRIVILEGE_NOT_HELD（无权限创建符号链接）
+_UNSUPPORTED_WINERRORS = frozenset((1, 17, 50, 1314))
+
+# 已确认不支持的 (方式, 源设备, 目标目录)，避免对每个文件重复失败的系统调用
+_unsupported: Set[Tuple[str, int, str]] = set()
+_unsupported_lock = threading.Lock()
+
+
+def _link_chain(link_mode: str) -> Tuple[str, ...]:
+    if link_mode == LINK_AUTO:
+        return LINK_FALLBACK
+    return LINK_FALLBACK[LINK_FALLBACK.index(link_mode):]
+
+
+def _is_unsupported(mode: str, exc: BaseException) -> bool:
+    """exc 是否表示该目录 / 文件系统不支持 mode（而不是这个文件的临时错误）。"""
+    if isinstance(exc, NotImplementedError):
+        return True
+    if getattr(exc, "winerror", None) in _UNSUPPORTED_WINERRORS:
+        return True
+    errnos = _REFLINK_UNSUPPORTED_ERRNOS if mode == LINK_REFLINK else _UNSUPPORTED_ERRNOS
+    return getattr(exc, "errno", None) in errnos
+
+
+def _remove_part(part: str) -> None:
+    try:
+        if os.path.lexists(part):
+            os.remove(part)
+    except OSError:
+        pass
+
+
+def place_file(src: str, dest: str, link_mode: str = LINK_COPY) -> str:
+    """
+    按 link_mode（及其后的回退顺序）把 src 放到 dest，返回实际使用的方式。
+    某种方式因文件系统不支持而失败时，记住 (方式, 源设备, 目标目录) 并回退到下一种；
+    其它错误（替换目标失败、权限不足等）直接抛出，只算这一个文件失败。
+    """
+    chain = _link_chain(link_mode)
+    if chain[0] == LINK_COPY:
+        _copy_atomic(src, dest)
+        return LINK_COPY
+
+    dest_dir = os.path.dirname(os.path.abspath(dest))
+    src_dev = os.stat(src).st_dev
+    part = dest + PART_SUFFIX
+    for mode in chain:
+        if mode == LINK_COPY:
+            break
+        key = (mode, src_dev, dest_dir)
+        if key in _unsupported:
+            continue
+        if os.path.lexists(part):
+            os.remove(part)
+        try:
+            _PLACERS[mode](src, part)
+        except (OSError, NotImplementedError) as exc:
+            _remove_part(part)
+            if not _is_unsupported(mode, exc):
+                raise
+            with _unsupported_lock:
+                _unsupported.add(key)
+            continue
+        try:
+            os.replace(part, dest)
+        except BaseException:
+            _remove_part(part)
+            raise
+        return mode
+    _copy_atomic(src, dest)
+    return LINK_COPY
+
+
+def transfer_one(task: TransferTask, link_mode: str = LINK_COPY) -> str:
+    """
+    执行单个复制/移动，返回实际使用的方式。
+    移动优先尝试同卷 rename，跨卷时先复制再删除源文件（不受 link_mode 影响）。
+    """
+    if task.op == OP_MOVE:
+        try:
+            os.replace(task.src, task.dest)
+            return OP_MOVE
+        except OSError:
+            if not os.path.isfile(task.src):
+                raise
+        _copy_atomic(task.src, task.dest)
+        os.remove(task.src)
+        return OP_MOVE
+    return place_file(task.src, task.dest, link_mode)
+
+
+def run_transfers(
+    tasks: List[TransferTask],
+    jobs: int = 4,
+    max_inflight_bytes: int = 256 * 1024 * 1024,
+    journal_path: Optional[str] = None,
+    incremental: bool = False,
+    use_hash: bool = False,
+    link_mode: str = LINK_COPY,
+    content_index: Optional[ContentIndex] = None,
+) -> List[TransferResult]:
+    """
+    执行所有任务，返回与 tasks 顺序一致的结果列表。
+    journal_path 为 None 时不记录日志、不续传（run_transfers_from_args 只在 --incremental /
+    --prune 或指定 --journal 时传入）。
+    incremental=True 时，未变化的复制目标直接跳过（移动任务不受影响）。
+    link_mode 决定复制任务的放置方式（见 place_file）。
+    传入 content_index 时，源内容相同的复制任务只放置第一个，
+    其余目标以硬链接（不支持时依次回退为符号链接、复制）共享已放置的文件。
+    """
+    journal = TransferJournal(journal_path) if journal_path else None
+    budget = ByteBudget(max_inflight_bytes)
+    results: List[Optional[TransferResult]] = [None] * len(tasks)
+
+    # 同一目标的任务归为一组，组内按原顺序串行
+    groups: Dict[str, List[int]] = {}
+    for i, task in enumerate(tasks):
+        groups.setdefault(_norm(task.dest), []).append(i)
+
+    # 内容去重：{ 任务下标: 共享其目标的首个同内容任务下标 }。
+    # 同一目标有多个任务时保持原有的串行语义，不参与去重。
+    shared_from: Dict[int, int] = {}
+    if content_index is not None:
+        first_by_content: Dict[str, int] = {}
+        for indices in groups.values():
+            if len(indices) != 1 or tasks[indices[0]].op != OP_COPY:
+                continue
+            i = indices[0]
+            key = content_index.canonical(tasks[i].src)
+            if key in first_by_content:
+                shared_from[i] = first_by_content[key]
+            else:
+                first_by_content[key] = i
+
+    def run_one(i: int) -> None:
+        task = tasks[i]
+        if journal is not None and journal.is_done(task):
+            results[i] = TransferResult(task, ok=True, resumed=True)
+            return
+
+        src = task.src
+        mode = link_mode
+        primary = results[shared_from[i]] if i in shared_from else None
+        shared = primary is not None and primary.ok
+        if shared:
+            # 与已放置的目标内容相同：链接过去即可
+            src = primary.task.dest
+            mode = LINK_HARD
+            if incremental and _same_file(src, task.dest):
+                results[i] = TransferResult(task, ok=True, unchanged=True)
+                return
+        if incremental and task.op == OP_COPY and is_unchanged(task.src, task.dest, use_hash):
+            results[i] = TransferResult(task, ok=True, unchanged=True)
+            return
+
+        count("files_stat")
+        try:
+            src_st = os.stat(src)
+            if shared and journal is not None:
+                count("files_stat")
+                task_src_st = os.stat(task.src)
+            else:
+                task_src_st = src_st
+        except OSError as exc:
+            results[i] = TransferResult(task, ok=False, error=exc)
+            return
+        size = src_st.st_size
+        budget.acquire(size)
+        try:
+            if shared:
+                used = place_file(src, task.dest, mode)
+            else:
+                used = transfer_one(task, mode)
+            if journal is not None:
+                journal.record(task, size, task_src_st)
+            result = TransferResult(task, ok=True, mode=used)
+            if shared and used != LINK_COPY:
+                result.shared_bytes = size
+            results[i] = result
+        except Exception as exc:
+            results[i] = TransferResult(task, ok=False, error=exc)
+        finally:
+            budget.release(size)
+
+    def run_group(indices: List[int]) -> None:
+        for i in indices:
+            if i not in shared_from:
+                run_one(i)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+            for future in [pool.submit(run_group, g) for g in groups.values()]:
+                future.result()
+            # 第二轮：同内容的任务在首个任务完成后再链接
+            for future in [pool.submit(run_one, i) for i in sorted(shared_from)]:
+                future.result()
+    finally:
+        if journal is not None:
+            all_ok = all(r is not None and r.ok for r in results)
+            journal.close(remove=all_ok)
+
+    return [r for r in results if r is not None]
+
+
+def add_transfer_arguments(parser: argparse.ArgumentParser) -> None:
+    """为脚本添加统一的传输相关参数。"""
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=4,
+        help="并发复制/移动的线程数（默认 4）",
+    )
+    parser.add_argument(
+        "--max-inflight-mb",
+        type=int,
+        default=256,
+        help="同时传输中的最大数据量，单位 MB（默认 256）",
+    )
+    parser.add_argument(
+        "--journal",
+        default=None,
+        help="续传日志路径（默认: --incremental / --prune 时为目标目录下的 "
+        + JOURNAL_NAME + "，否则不记录）",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="增量模式：目标与源大小、修改时间一致时跳过",
+    )
+    parser.add_argument(
+        "--hash",
+        action="store_true",
+        help="增量模式下额外比较快速内容哈希（首尾各 1MB）",
+    )
+    parser.add_argument(
+        "--prune",
+        action="store_true",
+        help="删除本脚本上次写入、本次已不再对应任何源的目标文件",
+    )
+    parser.add_argument(
+        "--link",
+        choices=(LINK_AUTO,) + LINK_FALLBACK,
+        default=None,
+        help="放置方式: auto/reflink/hard/sym/copy，不支持时按 reflink>hard>sym>copy 回退"
+        "（默认: 复制；视频脚本默认移动）",
+    )
+    parser.add_argument(
+        "--dedup",
+        action="store_true",
+        help="按内容去重：相同内容的源文件只放置一次，其余目标以硬链接共享",
+    )
+
+
+def run_transfers_from_args(
+    args: argparse.Namespace,
+    tasks: List[TransferTask],
+    dest_dir: str,
+    owner: str,
+    content_index: Optional[ContentIndex] = None,
+) -> List[TransferResult]:
+    """
+    按命令行参数执行 tasks；--incremental / --prune 时记录续传日志并更新 dest_dir 下
+    owner 的同步清单（--prune 时同时删除过期目标），否则不在目标目录写入这些文件。
+    --dedup 且未传入 content_index 时，按本次任务的源文件建立内容索引。
+    """
+    tracked = args.incremental or args.prune
+    journal_path = args.journal or (os.path.join(dest_dir, JOURNAL_NAME) if tracked else None)
+    if args.dedup and content_index is None:
+        content_index = ContentIndex(task.src for task in tasks if task.op == OP_COPY)
+    results = run_transfers(
+        tasks,
+        jobs=args.jobs,
+        max_inflight_bytes=args.max_inflight_mb * 1024 * 1024,
+        journal_path=journal_path,
+        incremental=args.incremental,
+        use_hash=args.hash,
+        link_mode=args.link or LINK_COPY,
+        content_index=content_index if args.dedup else None,
+    )
+
+    pruned: List[str] = []
+    if tracked:
+        manifest = SyncManifest(dest_dir)
+        pruned = manifest.update(owner, results, prune=args.prune)
+        manifest.save()
+    if pruned:
+        print("已删除不再对应任何源的旧文件 %d 个:" % len(pruned))
+        for path in pruned[:20]:
+            print("    -", os.path.basename(path))
+        if len(pruned) > 20:
+            print("    ... 共", len(pruned), "个")
+
+    if args.link:
+        report_placement(results)
+    if args.dedup and content_index is not None:
+        report_dedup(content_index, results)
+    return results
+
+
+def report_dedup(content_index: ContentIndex, results: List[TransferResult]) -> None:
+    """汇总源文件中的重复内容，以及本次以链接共享而节省的空间。"""
+    groups, extra, extra_bytes = content_index.duplicate_summary()
+    shared = [r for r in results if r.shared_bytes]
+    saved = sum(r.shared_bytes for r in shared)
+    print("内容去重:")
+    print("  源文件中内容重复 {} 组，多余文件 {} 个（{:.1f} MB）".format(
+        groups, extra, extra_bytes / 1048576.0))
+    print("  以链接共享的目标 {} 个，节省空间 {:.1f} MB".format(len(shared), saved / 1048576.0))
+    print("  读取部分内容的文件 {} 个，完整哈希的文件 {} 个".format(
+        content_index.partial_hashed, content_index.full_hashed))
+
+
+def report_placement(results: List[TransferResult]) -> None:
+    """逐个列出实际使用的放置方式，并汇总各方式的数量。"""
+    counts: Dict[str, int] = {}
+    for result in results:
+        if not result.ok or result.mode is None:
+            continue
+        counts[result.mode] = counts.get(result.mode, 0) + 1
+        print("  [{}] {} -> {}".format(result.mode, result.task.src, os.path.basename(result.task.dest)))
+    if counts:
+        print("放置方式统计: " + ", ".join(
+            "{} {}".format(mode, counts[mode]) for mode in LINK_FALLBACK + (OP_MOVE,) if mode in counts
+        ))
@@ -0,0 +1,379 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+profileId 解析结果的磁盘缓存，供各脚本共用。
+
+缓存内容（按文件路径索引，并记录 mtime / size）:
+- bat 第一行 --profile=XXXX.xml 解析出的 profileId
+- UserProfiles/*.xml 中第一个 <GamePath> 的文本
+- Metadata/*.json 中的 game_name
+- 候选封面文件头中的宽高（cover_rank.py，--rank-covers 时）
+
+再次运行时只对文件做一次 stat，mtime 与 size 都未变化就直接使用缓存结果，
+不再打开、读取或解析文件；只有新增或修改过的文件才会被重新读取。
+需要一次解析很多文件时用 resolve_many / BatDirectory.prefetch，
+stat 与读取经 async_io 并发进行（网络共享上各文件的往返延迟相互重叠）。
+
+命令行参数（由 add_cache_arguments 统一添加）:
+    --rebuild-cache   丢弃旧缓存，重新读取所有文件
+    --verify-cache    即使 mtime/size 未变也重新读取，并与缓存结果比对、报告差异
+    --cache PATH      缓存文件路径（默认: 脚本目录下的 profile_cache.json）
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import xml.etree.ElementTree as ET
+from typing import Callable, Dict, List, Optional, Tuple
+
+from async_io import DEFAULT_CONCURRENCY, map_limited, stat_many
+from dir_index import DirIndex
+from media_metrics import count
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "profile_cache.json"
+)
+CACHE_VERSION = 1
+
+KIND_BAT = "bat"
+KIND_PROFILE = "profile"
+KIND_METADATA = "metadata"
+KIND_IMAGE = "image"
+
+
+def extract_profile_id_from_bat(bat_path: str) -> Optional[str]:
+    """
+    从 bat 第一行解析 TeknoParrot profileId:
+        START ..\\TeknoParrotUi.exe --profile=WMMT6RR.xml
+    返回 "WMMT6RR" 或 None。
+    """
+    try:
+        with io.open(bat_path, "r", encoding="utf-8", errors="ignore") as f:
+            first_line = f.readline()
+    except IOError:
+        return None
+
+    marker = "--profile="
+    idx = first_line.lower().find(marker)
+    if idx < 0:
+        return None
+
+    start = idx + len(marker)
+    end = first_line.lower().find(".xml", start)
+    if end <= start:
+        return None
+    return first_line[start:end].strip()
+
+
+def read_profile_game_path(xml_path: str) -> Optional[str]:
+    """
+    读取 profile XML 中第一个非空 <GamePath> 的文本（已 strip），没有则返回 None。
+    XML 无法解析时抛出异常，由调用方决定如何处理。
+    """
+    tree = ET.parse(xml_path)
+    for elem in tree.getroot().iter():
+        if elem.tag == "GamePath" and elem.text:
+            return elem.text.strip()
+    return None
+
+
+def read_metadata_game_name(json_path: str) -> Optional[str]:
+    """读取 Metadata/*.json 中的 game_name（已 strip），没有则返回 None。"""
+    with io.open(json_path, "r", encoding="utf-8") as fp:
+        data = json.load(fp)
+    if isinstance(data, dict):
+        name = (data.get("game_name") or "").strip()
+        if name:
+            return name
+    return None
+
+
+class ProfileResolutionCache(object):
+    """
+    以 (路径, mtime, size) 为键的解析结果缓存。
+
+    每条记录: { "kind", "mtime_ns", "size", "value", "error" }
+    error=True 表示上次读取/解析失败，命中时同样抛出 ValueError，
+    保证与不使用缓存时的行为一致。
+    """
+
+    def __init__(
+        self,
+        cache_path: str = DEFAULT_CACHE_PATH,
+        rebuild: bool = False,
+        verify: bool = False,
+    ):
+        self.cache_path = cache_path
+        self.verify = verify
+        self.entries: Dict[str, Dict] = {}
+        self.hits = 0
+        self.misses = 0
+        self.mismatches = 0
+        self._dirty = False
+        if not rebuild:
+            self._load()
+        else:
+            self._dirty = True
+
+    def _load(self) -> None:
+        if not os.path.isfile(self.cache_path):
+            return
+        try:
+            with io.open(self.cache_path, "r", encoding="utf-8") as fp:
+                data = json.load(fp)
+        except Exception:
+            return
+        if isinstance(data, dict) and data.get("version") == CACHE_VERSION:
+            entries = data.get("entries")
+            if isinstance(entries, dict):
+                self.entries = entries
+
+    def save(self) -> None:
+        """原子写回缓存文件（先写临时文件再替换）；没有变化时不写。"""
+        if not self._dirty:
+            return
+        tmp_path = self.cache_path + ".tmp"
+        try:
+            with io.open(tmp_path, "w", encoding="utf-8") as fp:
+                json.dump(
+                    {"version": CACHE_VERSION, "entries": self.entries},
+                    fp,
+                    ensure_ascii=False,
+                    sort_keys=True,
+                )
+            os.replace(tmp_path, self.cache_path)
+            self._dirty = False
+        except (IOError, OSError) as exc:
+            print("写入 profileId 缓存失败:", self.cache_path, "错误:", exc)
+
+    def report(self) -> None:
+        print(
+            "  profileId 缓存: 命中 {}，重新读取 {}".format(self.hits, self.misses)
+        )
+        if self.verify:
+            print("  缓存校验: 与文件内容不一致的条目 {}".format(self.mismatches))
+
+    def lookup(self, kind: str, path: str) -> Tuple[Optional[os.stat_result], Optional[Dict]]:
+        """
+        只 stat 不读取：返回 (stat 结果, 仍然有效的缓存记录)。
+        文件不存在时 stat 结果为 None；缓存失效（或 --verify-cache）时记录为 None。
+        """
+        count("files_stat")
+        try:
+            st = os.stat(path)
+        except OSError:
+            st = None
+        return st, self.check(kind, path, st)
+
+    def check(self, kind: str, path: str, st: Optional[os.stat_result]) -> Optional[Dict]:
+        """
+        用已取得的 stat 结果判断缓存记录是否仍然有效（lookup 的后半部分，供批量 stat 后使用）。
+        st 为 None（文件不存在）时丢弃该记录并返回 None。
+        """
+        key = os.path.normcase(os.path.abspath(path))
+        if st is None:
+            self.entries.pop(key, None)
+            return None
+        entry = self.entries.get(key)
+        fresh = (
+            entry is not None
+            and entry.get("kind") == kind
+            and entry.get("mtime_ns") == st.st_mtime_ns
+            and entry.get("size") == st.st_size
+        )
+        if fresh and not self.verify:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, kind: str, path: str, st: os.stat_result, value, error: bool) -> None:
+        """记录一次实际读取的结果（st 为读取前 stat 的结果）。"""
+        key = os.path.normcase(os.path.abspath(path))
+        self.misses += 1
+        old = self.entries.get(key)
+        if (
+            self.verify
+            and old is not None
+            and old.get("kind") == kind
+            and old.get("mtime_ns") == st.st_mtime_ns
+            and old.get("size") == st.st_size
+            and (bool(old.get("error")) != error or old.get("value") != value)
+        ):
+            self.mismatches += 1
+        self.entries[key] = {
+            "kind": kind,
+            "mtime_ns": st.st_mtime_ns,
+            "size": st.st_size,
+            "value": value,
+            "error": error,
+        }
+        self._dirty = True
+
+    def _resolve(self, kind: str, path: str, reader: Callable[[str], Optional[str]]):
+        st, entry = self.lookup(kind, path)
+        if st is None:
+            # 文件不存在/不可访问：不缓存，交给 reader 按原逻辑处理
+            return reader(path)
+        if entry is not None:
+            if entry.get("error"):
+                raise ValueError("cached parse error: " + path)
+            return entry.get("value")
+
+        count("files_opened")
+        count("bytes_read", st.st_size)
+        error = False
+        value = None
+        try:
+            value = reader(path)
+        except Exception:
+            error = True
+        self.store(kind, path, st, value, error)
+        if error:
+            raise ValueError("parse error: " + path)
+        return value
+
+    def resolve_many(
+        self,
+        kind: str,
+        paths: List[str],
+        reader: Callable[[str], Optional[str]],
+        limit: int = DEFAULT_CONCURRENCY,
+    ) -> Dict[str, Tuple[Optional[str], bool]]:
+        """
+        _resolve 的批量版：先并发 stat 全部文件，再并发读取缓存未命中的文件。
+        返回 { 路径: (值, 是否读取/解析失败) }；不存在的文件不在结果中，
+        由调用方按原逻辑逐个处理。
+        """
+        out: Dict[str, Tuple[Optional[str], bool]] = {}
+        pending: List[Tuple[str, os.stat_result]] = []
+        stats = stat_many(paths, limit)
+        count("files_stat", len(paths))
+        for path, st in zip(paths, stats):
+            if st is None:
+                continue
+            entry = self.check(kind, path, st)
+            if entry is not None:
+                out[path] = (entry.get("value"), bool(entry.get("error")))
+            else:
+                pending.append((path, st))
+
+        def read(path: str) -> Tuple[Optional[str], bool]:
+            try:
+                return reader(path), False
+            except Exception:
+                return None, True
+
+        results = map_limited(read, [path for path, _st in pending], limit)
+        for (path, st), (value, error) in zip(pending, results):
+            count("files_opened")
+            count("bytes_read", st.st_size)
+            self.store(kind, path, st, value, error)
+            out[path] = (value, error)
+        return out
+
+    def bat_profile_id(self, bat_path: str) -> Optional[str]:
+        """带缓存的 extract_profile_id_from_bat。"""
+        return self._resolve(KIND_BAT, bat_path, extract_profile_id_from_bat)
+
+    def profile_game_path(self, xml_path: str) -> Optional[str]:
+        """带缓存的 read_profile_game_path；XML 无法解析时抛出 ValueError。"""
+        return self._resolve(KIND_PROFILE, xml_path, read_profile_game_path)
+
+    def metadata_game_name(self, json_path: str) -> Optional[str]:
+        """带缓存的 read_metadata_game_name；JSON 无法解析时抛出 ValueError。"""
+        return self._resolve(KIND_METADATA, json_path, read_metadata_game_name)
+
+
+class BatDirectory(object):
+    """
+    bat 目录中「bat 文件名 -> profileId」的查询，每个 bat 只解析一次。
+
+    第一次用到时对整个目录做一次 os.scandir（DirIndex），之后的存在性检查都在内存中完成，
+    便于多个阶段（说明、封面、视频）共用同一份结果。
+    bat 文件名先精确匹配、再不区分大小写匹配（LaunchBox 中的 bat 名与磁盘上的大小写可能不同）。
+    """
+
+    def __init__(self, bat_dir: str, cache: ProfileResolutionCache):
+        self.bat_dir = bat_dir
+        self.cache = cache
+        self._index: Optional[DirIndex] = None
+        self._resolved: Dict[str, Optional[str]] = {}  # 实际文件名 -> profileId
+
+    def scan(self) -> None:
+        self._index = DirIndex(self.bat_dir)
+
+    def _dir(self) -> DirIndex:
+        if self._index is None:
+            self.scan()
+        return self._index
+
+    def names(self) -> List[str]:
+        """目录中所有 .bat 文件名（排序后）。"""
+        return sorted(self._dir().names((".bat",)))
+
+    def exists(self, bat_file: str) -> bool:
+        return self._dir().lookup(bat_file) is not None
+
+    def refresh(self, bat_file: str) -> None:
+        """单个 bat 被新增、修改或删除后调用：更新目录快照并丢弃该 bat 的解析结果。"""
+        index = self._dir()
+        self._resolved.pop(index.lookup(bat_file) or bat_file, None)
+        if os.path.isfile(os.path.join(self.bat_dir, bat_file)):
+            index.note_written(bat_file)
+        else:
+            index.note_removed(index.lookup(bat_file) or bat_file)
+
+    def prefetch(self, bat_files: Optional[List[str]] = None, limit: int = DEFAULT_CONCURRENCY) -> None:
+        """
+        一次并发解析多个 bat（默认目录中的全部 bat），之后的 profile_id() 直接命中。
+        不存在或解析失败的 bat 不预取，仍由 profile_id() 按原逻辑处理。
+        """
+        index = self._dir()
+        if bat_files is None:
+            bat_files = self.names()
+        todo: Dict[str, str] = {}
+        for bat_file in bat_files:
+            actual = index.lookup(bat_file)
+            if actual is None or actual in self._resolved:
+                continue
+            todo[os.path.join(self.bat_dir, actual)] = actual
+        resolved = self.cache.resolve_many(KIND_BAT, list(todo), extract_profile_id_from_bat, limit)
+        for path, (value, error) in resolved.items():
+            if not error:
+                self._resolved[todo[path]] = value
+
+    def profile_id(self, bat_file: str) -> Optional[str]:
+        actual = self._dir().lookup(bat_file) or bat_file
+        if actual not in self._resolved:
+            self._resolved[actual] = self.cache.bat_profile_id(os.path.join(self.bat_dir, actual))
+        return self._resolved[actual]
+
+
+def add_cache_arguments(parser: argparse.ArgumentParser) -> None:
+    """为脚本添加统一的缓存相关参数。"""
+    parser.add_argument(
+        "--cache",
+        default=DEFAULT_CACHE_PATH,
+        help="profileId 解析缓存文件（默认: ./profile_cache.json）",
+    )
+    parser.add_argument(
+        "--rebuild-cache",
+        action="store_true",
+        help="丢弃旧缓存，重新读取所有 bat / XML / JSON",
+    )
+    parser.add_argument(
+        "--verify-cache",
+        action="store_true",
+        help="重新读取所有文件并与缓存比对，报告不一致的条目",
+    )
+
+
+def open_cache_from_args(args: argparse.Namespace) -> ProfileResolutionCache:
+    return ProfileResolutionCache(
+        cache_path=args.cache,
+        rebuild=args.rebuild_cache,
+        verify=args.verify_cache,
+    )
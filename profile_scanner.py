@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+UserProfiles / UserProfiles_by_genre 的批量扫描。
+
+每个 profile XML 用 iterparse 流式读取 <GameProfile> 的直接子元素，
+读到第一个非空 <GamePath> 就停止，不再构建整棵树；
+同一遍顺带取出 GamePath 之前出现的游戏名（GameName / GameNameInternal）与类型
+（GameGenre / GameGenreInternal），并记录文件所在的分类子目录（genre_folder）。
+
+需要重新读取的文件较多时（默认 >= 256 个），分给多个进程并行解析；
+结果与 ProfileResolutionCache 共用同一个缓存文件（kind = "profile_info"）。
+列目录与检查缓存所需的 stat 经 async_io 并发进行（--io-concurrency），网络共享上不再逐个等待。
+
+用法示例:
+
+    from profile_scanner import scan_profiles
+
+    for info in scan_profiles(USER_PROFILES_DIRS, cache).values():
+        print(info["profile_id"], info["game_path"], info["genre_folder"])
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from async_io import DEFAULT_CONCURRENCY, add_io_arguments, map_limited, stat_many, walk_files
+from media_metrics import count
+from profile_cache import ProfileResolutionCache
+
+KIND_PROFILE_INFO = "profile_info"
+
+# 需要解析的文件数达到该值才启用进程池（进程启动本身有开销）
+PARALLEL_THRESHOLD = 256
+
+NAME_TAGS = ("GameName", "GameNameInternal")
+GENRE_TAGS = ("GameGenre", "GameGenreInternal")
+
+
+def read_profile_info(xml_path: str) -> Dict[str, str]:
+    """
+    流式读取一个 profile XML，返回:
+        { "game_path": ..., "game_name": ..., "game_genre": ... }（缺失为 ""）
+    game_path 与 read_profile_game_path 相同：第一个文本非空的 <GamePath>（已 strip）。
+    读到 GamePath 即停止，GamePath 之后的元素不再读取；XML 无法解析时抛出异常。
+    """
+    info = {"game_path": "", "game_name": "", "game_genre": ""}
+    context = ET.iterparse(xml_path, events=("start", "end"))
+    depth = 0
+    root = None
+    for event, elem in context:
+        if event == "start":
+            depth += 1
+            if root is None:
+                root = elem
+            continue
+        depth -= 1
+        tag = elem.tag
+        if tag == "GamePath":
+            if elem.text:
+                info["game_path"] = elem.text.strip()
+                break
+        elif depth == 1:
+            text = (elem.text or "").strip()
+            if tag in NAME_TAGS and text and not info["game_name"]:
+                info["game_name"] = text
+            elif tag in GENRE_TAGS and text and not info["game_genre"]:
+                info["game_genre"] = text
+        if depth == 1 and root is not None:
+            # 已读完的 <GameProfile> 子元素不再需要
+            root.clear()
+    return info
+
+
+def _read_profile_info_safe(xml_path: str) -> Tuple[Optional[Dict[str, str]], bool]:
+    """进程池中执行：返回 (结果, 是否出错)，异常不跨进程抛出。"""
+    try:
+        return read_profile_info(xml_path), False
+    except Exception:
+        return None, True
+
+
+def list_profile_files(
+    profiles_dirs: List[str],
+    io_concurrency: int = DEFAULT_CONCURRENCY,
+) -> List[Tuple[str, str, str]]:
+    """
+    递归列出各目录下的 *.xml，返回 [ (profileId, 路径, 分类子目录), ... ]（os.walk 顺序）。
+    分类子目录为相对所在根目录的第一级目录名，直接位于根目录下时为 ""。
+    """
+    out: List[Tuple[str, str, str]] = []
+    for base_dir in profiles_dirs:
+        if not os.path.isdir(base_dir):
+            continue
+        for root, files in walk_files(base_dir, io_concurrency):
+            rel = os.path.relpath(root, base_dir)
+            genre_folder = "" if rel == os.curdir else rel.split(os.sep)[0]
+            for f in files:
+                if not f.lower().endswith(".xml"):
+                    continue
+                profile_id = os.path.splitext(f)[0]
+                if not profile_id:
+                    continue
+                out.append((profile_id, os.path.join(root, f), genre_folder))
+    return out
+
+
+def scan_profiles(
+    profiles_dirs: List[str],
+    cache: Optional[ProfileResolutionCache] = None,
+    jobs: int = 0,
+    io_concurrency: int = DEFAULT_CONCURRENCY,
+) -> Dict[str, Dict]:
+    """
+    扫描所有 profile XML，返回:
+        { profileId: { "profile_id", "path", "genre_folder",
+                       "game_path", "game_name", "game_genre", "error" } }
+    error=True 表示 XML 无法解析（其余字段为 ""）。同名 profileId 以后出现的为准，
+    但解析失败的结果不会覆盖之前已成功解析的同名 profile。
+    jobs: 并行进程数，0 = 按 CPU 数自动；1 = 不使用进程池。
+    io_concurrency: 列目录、stat 时同时进行的请求数。
+    """
+    files = list_profile_files(profiles_dirs, io_concurrency)
+    parsed: Dict[str, Tuple[Optional[Dict[str, str]], bool]] = {}
+    pending: List[Tuple[str, Optional[os.stat_result]]] = []
+
+    if cache is not None:
+        paths = [path for _pid, path, _genre in files]
+        stats = stat_many(paths, io_concurrency)
+        count("files_stat", len(paths))
+        for path, st in zip(paths, stats):
+            entry = cache.check(KIND_PROFILE_INFO, path, st)
+            if entry is not None:
+                parsed[path] = (entry.get("value"), bool(entry.get("error")))
+                continue
+            pending.append((path, st))
+    else:
+        pending.extend((path, None) for _pid, path, _genre in files)
+
+    paths = [path for path, _st in pending]
+    workers = jobs if jobs > 0 else (os.cpu_count() or 1)
+    if workers > 1 and len(paths) >= PARALLEL_THRESHOLD:
+        chunksize = max(1, len(paths) // (workers * 8))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_read_profile_info_safe, paths, chunksize=chunksize))
+    else:
+        # 文件不多时不值得启动进程；用线程并发读取，至少让各文件的 I/O 等待重叠
+        results = map_limited(_read_profile_info_safe, paths, io_concurrency)
+
+    for (path, st), (value, error) in zip(pending, results):
+        parsed[path] = (value, error)
+        count("files_opened")
+        if st is not None:
+            count("bytes_read", st.st_size)
+            cache.store(KIND_PROFILE_INFO, path, st, value, error)
+
+    out: Dict[str, Dict] = {}
+    for profile_id, path, genre_folder in files:
+        value, error = parsed[path]
+        info = {
+            "profile_id": profile_id,
+            "path": path,
+            "genre_folder": genre_folder,
+            "game_path": "",
+            "game_name": "",
+            "game_genre": "",
+            "error": error,
+        }
+        if value:
+            info.update(value)
+        if error and profile_id in out and not out[profile_id]["error"]:
+            continue
+        out[profile_id] = info
+    return out
+
+
+def add_scanner_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--profile-jobs",
+        type=int,
+        default=0,
+        help="解析 UserProfiles XML 的并行进程数（默认 0 = 按 CPU 数；1 = 单进程）",
+    )
+    add_io_arguments(parser)
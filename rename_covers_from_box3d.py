@@ -11,6 +11,14 @@
 使用方式（在 TeknoParrotBigBox 目录下运行）:
 
     python rename_covers_from_box3d.py
+    python rename_covers_from_box3d.py --rebuild-cache   # 重新读取所有 bat / profile XML
+    python rename_covers_from_box3d.py --jobs 8          # 8 线程并发复制
+    python rename_covers_from_box3d.py --incremental --prune   # 只复制有变化的封面，并清理过期封面
+    python rename_covers_from_box3d.py --link auto       # 同一磁盘上用链接代替复制，不重复占用空间
+    python rename_covers_from_box3d.py --dedup           # 内容相同的封面只复制一次，其余以硬链接共享
+    python rename_covers_from_box3d.py --rank-covers     # 多张候选时按图片尺寸（竖版比例、分辨率）挑选
+    python rename_covers_from_box3d.py --metrics         # 打印各阶段耗时与文件读写计数
+    python rename_covers_from_box3d.py --io-concurrency 64   # bat 在网络共享上时加大并发 stat / 读取
 
 默认假设:
 1. Teknoparrot.xml       在当前目录下
@@ -22,7 +30,8 @@
 - LaunchBox <Title> 对应 Box - 3D 里的文件名开头，比如:
     Title: "化解危机 5"
     文件: "化解危机 5-01.png" / "化解危机 5-02.png"
-  会优先选 -01，找不到再选任意同名前缀的文件。
+  会优先选 -01，找不到再选任意同名前缀的文件；
+  指定 --rank-covers 时改为优先选接近 2:3 / 3:4 竖版比例、分辨率更高的图片（见 cover_rank.py）。
 - profileId 从 bat 第一行的 --profile=XXXX.xml 解析为 XXXX。
 - 若没有 bat 目录，则从 UserProfiles/UserProfiles_by_genre 的 XML 与（可选）launchbox_descriptions.json
   按「标题/游戏名」匹配 profileId。
@@ -30,15 +39,34 @@
 
 from __future__ import annotations
 
+import argparse
 import io
 import json
 import os
 import re
-import shutil
 import sys
-import unicodedata
-import xml.etree.ElementTree as ET
-from typing import Dict, Optional, List, Tuple
+from typing import Dict, Iterable, Optional, List, Tuple
+
+from async_io import DEFAULT_CONCURRENCY
+from cover_rank import CoverRanker, add_rank_arguments, open_ranker_from_args
+from dir_index import DirIndex
+from launchbox_xml import iter_launchbox_games
+from match_keys import normalize_for_match
+from media_dedup import ContentIndex
+from media_metrics import add_metrics_arguments, finish_metrics, stage
+from media_transfer import (
+    TransferResult,
+    TransferTask,
+    add_transfer_arguments,
+    run_transfers_from_args,
+)
+from profile_cache import (
+    BatDirectory,
+    ProfileResolutionCache,
+    add_cache_arguments,
+    open_cache_from_args,
+)
+from profile_scanner import add_scanner_arguments, scan_profiles
 
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -69,16 +97,6 @@ def normalize_title(name: str) -> str:
     return base.strip()
 
 
-def normalize_for_match(s: str) -> str:
-    """规范化字符串用于匹配：去空格、转小写、去标点、统一 Unicode"""
-    if not s:
-        return ""
-    s = unicodedata.normalize("NFKC", s)
-    s = re.sub(r"[\s\-_.]+", "", s.lower())
-    s = re.sub(r"[^\w\u4e00-\u9fff]", "", s)
-    return s
-
-
 def _game_name_from_path(game_path: str) -> Optional[str]:
     """从 GamePath 提取游戏文件夹名。"""
     if not game_path:
@@ -92,36 +110,26 @@ def _game_name_from_path(game_path: str) -> Optional[str]:
     return None
 
 
-def load_title_to_profile_without_bat() -> Dict[str, str]:
+def load_title_to_profile_without_bat(
+    cache: Optional[ProfileResolutionCache] = None,
+    jobs: int = 0,
+    io_concurrency: int = DEFAULT_CONCURRENCY,
+) -> Dict[str, str]:
     """
     在无 bat 时使用：从 UserProfiles 与 launchbox_descriptions.json 构建
     normalized_title -> profileId，用于按 LaunchBox 标题匹配 profileId。
+    传入 cache 时，未变化的 profile XML 不再重新解析；jobs 为并行解析的进程数（0 = 自动），
+    io_concurrency 为列目录、stat 时同时进行的请求数。
     """
     mapping: Dict[str, str] = {}
 
     # 1) UserProfiles：profileId + GamePath 文件夹名 -> profileId
-    for profiles_dir in USER_PROFILES_DIRS:
-        if not os.path.isdir(profiles_dir):
-            continue
-        for root, _dirs, files in os.walk(profiles_dir):
-            for f in files:
-                if not f.lower().endswith(".xml"):
-                    continue
-                profile_id = os.path.splitext(f)[0]
-                if not profile_id:
-                    continue
-                mapping[normalize_for_match(profile_id)] = profile_id
-                xml_path = os.path.join(root, f)
-                try:
-                    tree = ET.parse(xml_path)
-                    for elem in tree.getroot().iter():
-                        if elem.tag == "GamePath" and elem.text:
-                            name = _game_name_from_path(elem.text.strip())
-                            if name:
-                                mapping[normalize_for_match(name)] = profile_id
-                            break
-                except Exception:
-                    pass
+    for profile_id, info in scan_profiles(USER_PROFILES_DIRS, cache, jobs, io_concurrency).items():
+        mapping[normalize_for_match(profile_id)] = profile_id
+        if info["game_path"]:
+            name = _game_name_from_path(info["game_path"])
+            if name:
+                mapping[normalize_for_match(name)] = profile_id
 
     # 2) launchbox_descriptions.json：title -> profileId
     if os.path.isfile(LAUNCHBOX_DESCRIPTIONS_JSON):
@@ -146,12 +154,7 @@ def load_image_dir(root_dir: str) -> Dict[str, List[str]]:
     key = 标题前缀（去掉 -01 等）
     """
     mapping: Dict[str, List[str]] = {}
-    if not os.path.isdir(root_dir):
-        return mapping
-
-    for fname in os.listdir(root_dir):
-        if not fname.lower().endswith((".png", ".jpg", ".jpeg")):
-            continue
+    for fname in DirIndex(root_dir).names((".png", ".jpg", ".jpeg")):
         key = normalize_title(fname)
         full_path = os.path.join(root_dir, fname)
         mapping.setdefault(key, []).append(full_path)
@@ -171,84 +174,65 @@ def load_launchbox_games() -> Dict[str, Dict[str, str]]:
         print("未找到 Teknoparrot.xml:", LAUNCHBOX_XML)
         return {}
 
-    with io.open(LAUNCHBOX_XML, "r", encoding="utf-8") as f:
-        data = f.read()
+    result = games_by_title(iter_launchbox_games(LAUNCHBOX_XML, ("Title", "ApplicationPath")))
+    print("LaunchBox 中读取到游戏条目数:", len(result))
+    return result
+
 
-    root = ET.fromstring(data)
+def games_by_title(records: Iterable[Dict[str, str]]) -> Dict[str, Dict[str, str]]:
+    """按 Title 索引 iter_launchbox_games 产出的记录，跳过缺少标题或 ApplicationPath 的条目。"""
     result: Dict[str, Dict[str, str]] = {}
-
-    for game_elem in root.findall("Game"):
-        title = (game_elem.findtext("Title") or "").strip()
-        app_path = (game_elem.findtext("ApplicationPath") or "").strip()
+    for game in records:
+        title = game["Title"].strip()
+        app_path = game["ApplicationPath"].strip()
         if not title or not app_path:
             continue
         result[title] = {
             "title": title,
             "app_path": app_path,
         }
-
-    print("LaunchBox 中读取到游戏条目数:", len(result))
     return result
 
 
-def extract_profile_id_from_bat(bat_path: str) -> Optional[str]:
-    """
-    从 bat 第一行解析 TeknoParrot profileId:
-        START ..\\TeknoParrotUi.exe --profile=WMMT6RR.xml
-    返回 "WMMT6RR" 或 None。
-    """
-    try:
-        with io.open(bat_path, "r", encoding="utf-8", errors="ignore") as f:
-            first_line = f.readline()
-    except IOError:
-        return None
-
-    marker = "--profile="
-    idx = first_line.lower().find(marker)
-    if idx < 0:
-        return None
-
-    start = idx + len(marker)
-    end = first_line.lower().find(".xml", start)
-    if end <= start:
-        return None
-    return first_line[start:end].strip()
+def is_first_image(path: str) -> bool:
+    return re.search(r"-01\.(png|jpg|jpeg)$", path, re.IGNORECASE) is not None
 
 
-def choose_best_image(paths: List[str]) -> str:
+def choose_best_image(
+    paths: List[str],
+    content_index: Optional[ContentIndex] = None,
+    ranker: Optional[CoverRanker] = None,
+) -> str:
     """
     多个候选封面时，优先选择文件名中包含 "-01" 的那一个，否则返回第一个。
+    传入 content_index 时，先合并内容完全相同的候选（保留先出现的路径）。
+    传入 ranker（--rank-covers）时按图片头部的宽高比、分辨率、文件大小挑选，
+    这些都相同时仍按上面的规则。
     """
+    if content_index is not None:
+        paths = content_index.unique(paths)
+    if ranker is not None:
+        return ranker.best(sorted(paths, key=lambda p: not is_first_image(p)))
     for p in paths:
-        if re.search(r"-01\.(png|jpg|jpeg)$", p, re.IGNORECASE):
+        if is_first_image(p):
             return p
     return paths[0]
 
 
-def main() -> int:
-    lb_games = load_launchbox_games()
-    if not lb_games:
-        return 1
-
-    use_bat = os.path.isdir(BAT_DIR)
-    title_to_profile: Dict[str, str] = {}
-    if not use_bat:
-        print("未找到 bat 目录，改用 UserProfiles / launchbox_descriptions 按标题匹配 profileId")
-        title_to_profile = load_title_to_profile_without_bat()
-        if not title_to_profile:
-            print("也未找到 UserProfiles 或 launchbox_descriptions.json，无法解析 profileId")
-            return 1
-        print("已加载标题->profileId 映射数量:", len(set(title_to_profile.values())))
-
-    # 先加载 Box - 3D 封面
+def load_cover_mapping() -> Dict[str, List[str]]:
+    """
+    加载 Box - 3D 封面，再以 Arcade - Cabinet 作为补充，
+    返回 { 标准化标题: [候选图片路径（Box - 3D 在前）] }。
+    """
     mapping: Dict[str, List[str]] = {}
-    box3d_mapping = load_image_dir(BOX3D_DIR)
+    with stage("media_scan"):
+        box3d_mapping = load_image_dir(BOX3D_DIR)
+        arcade_mapping = load_image_dir(ARCADE_DIR)
     if box3d_mapping:
         print("Box - 3D 中发现封面条目数(按标准化标题):", len(box3d_mapping))
         mapping.update(box3d_mapping)
 
     # 再加载 Arcade - Cabinet 作为补充（如果 Box - 3D 没有对应 key，就用这里的）
-    arcade_mapping = load_image_dir(ARCADE_DIR)
     if arcade_mapping:
         print("Arcade - Cabinet 中发现封面条目数(按标准化标题):", len(arcade_mapping))
         for k, v in arcade_mapping.items():
@@ -257,18 +241,38 @@ def main() -> int:
                 mapping[k].extend(v)
             else:
                 mapping[k] = v
+    return mapping
 
-    if not mapping:
-        print("Box - 3D / Arcade - Cabinet 目录中未发现任何图片")
-        return 1
-
-    if not os.path.isdir(DEST_COVERS_DIR):
-        os.makedirs(DEST_COVERS_DIR)
 
-    copied = 0
-    skipped_no_image = 0
-    skipped_no_bat = 0
-    skipped_no_profile = 0
+def multi_candidate_paths(
+    lb_games: Dict[str, Dict[str, str]],
+    mapping: Dict[str, List[str]],
+) -> List[str]:
+    """lb_games 中有多张候选封面的游戏的全部候选路径（只有这些需要读取文件头排序）。"""
+    paths: List[str] = []
+    for title in lb_games:
+        candidates = mapping.get(normalize_title(title))
+        if candidates and len(candidates) > 1:
+            paths.extend(candidates)
+    return paths
+
+
+def plan_cover_tasks(
+    lb_games: Dict[str, Dict[str, str]],
+    mapping: Dict[str, List[str]],
+    bats: Optional[BatDirectory],
+    title_to_profile: Optional[Dict[str, str]] = None,
+    content_index: Optional[ContentIndex] = None,
+    ranker: Optional[CoverRanker] = None,
+) -> Tuple[List[TransferTask], Dict[str, int]]:
+    """
+    为每个 LaunchBox 游戏选出封面并解析 profileId，生成复制任务。
+    bats 为 None 时按标题从 title_to_profile 匹配 profileId。
+    ranker 见 choose_best_image。
+    返回 (任务列表, { "no_image" / "no_bat" / "no_profile": 跳过数量 })。
+    """
+    skipped = {"no_image": 0, "no_bat": 0, "no_profile": 0}
+    tasks: List[TransferTask] = []
 
     for title, info in lb_games.items():
         norm_title = normalize_title(title)
@@ -276,29 +280,30 @@ def main() -> int:
         # 1) 找到对应的封面图片（先 Box - 3D，再 Arcade - Cabinet）
         candidates = mapping.get(norm_title)
         if not candidates:
-            skipped_no_image += 1
+            skipped["no_image"] += 1
             continue
 
-        src_image = choose_best_image(candidates)
+        with stage("matching"):
+            src_image = choose_best_image(candidates, content_index, ranker)
 
         # 2) 解析 profileId：优先 bat，否则按标题从 UserProfiles/launchbox_descriptions 匹配
         profile_id = None
-        if use_bat:
+        if bats is not None:
             app_path = info["app_path"]
             bat_name = os.path.basename(app_path)
-            local_bat = os.path.join(BAT_DIR, bat_name)
-            if not os.path.isfile(local_bat):
-                skipped_no_bat += 1
+            if not bats.exists(bat_name):
+                skipped["no_bat"] += 1
                 continue
-            profile_id = extract_profile_id_from_bat(local_bat)
+            with stage("profile_resolution"):
+                profile_id = bats.profile_id(bat_name)
             if not profile_id:
-                skipped_no_profile += 1
+                skipped["no_profile"] += 1
                 continue
         else:
             norm_key = normalize_for_match(norm_title)
-            profile_id = title_to_profile.get(norm_key)
+            profile_id = (title_to_profile or {}).get(norm_key)
             if not profile_id:
-                skipped_no_profile += 1
+                skipped["no_profile"] += 1
                 continue
 
         # 3) 复制为 Media/Covers/{profileId}.png
@@ -307,21 +312,113 @@ def main() -> int:
             dest_ext = ".png"
 
         dest_path = os.path.join(DEST_COVERS_DIR, profile_id + dest_ext)
-        try:
-            shutil.copy2(src_image, dest_path)
+        tasks.append(TransferTask(src_image, dest_path))
+
+    return tasks, skipped
+
+
+def report_cover_results(results: List[TransferResult], skipped: Dict[str, int]) -> None:
+    copied = 0
+    resumed = 0
+    unchanged = 0
+    for result in results:
+        if result.ok:
             copied += 1
-        except Exception as exc:
-            print("复制封面失败:", src_image, "->", dest_path, "错误:", exc)
+            resumed += result.resumed
+            unchanged += result.unchanged
+        else:
+            task = result.task
+            print("复制封面失败:", task.src, "->", task.dest, "错误:", result.error)
 
     print("处理完成。")
     print("  成功复制封面数量:", copied)
-    print("  跳过（找不到对应图片）的条目:", skipped_no_image)
-    print("  跳过（找不到对应 bat 文件）的条目:", skipped_no_bat)
-    print("  跳过（bat 中未解析出 profileId）的条目:", skipped_no_profile)
+    if resumed:
+        print("    其中上次已完成、本次续传跳过:", resumed)
+    if unchanged:
+        print("    其中目标未变化、跳过复制:", unchanged)
+    print("  跳过（找不到对应图片）的条目:", skipped["no_image"])
+    print("  跳过（找不到对应 bat 文件）的条目:", skipped["no_bat"])
+    print("  跳过（bat 中未解析出 profileId）的条目:", skipped["no_profile"])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="将 Box - 3D / Arcade - Cabinet 封面按 profileId 复制到 Media/Covers"
+    )
+    add_cache_arguments(parser)
+    add_scanner_arguments(parser)
+    add_rank_arguments(parser)
+    add_transfer_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    with stage("xml_load"):
+        lb_games = load_launchbox_games()
+    if not lb_games:
+        return 1
+
+    cache = open_cache_from_args(args)
+
+    bats: Optional[BatDirectory] = None
+    title_to_profile: Dict[str, str] = {}
+    if os.path.isdir(BAT_DIR):
+        bats = BatDirectory(BAT_DIR, cache)
+    else:
+        print("未找到 bat 目录，改用 UserProfiles / launchbox_descriptions 按标题匹配 profileId")
+        with stage("profile_resolution"):
+            title_to_profile = load_title_to_profile_without_bat(
+                cache, args.profile_jobs, args.io_concurrency
+            )
+        if not title_to_profile:
+            print("也未找到 UserProfiles 或 launchbox_descriptions.json，无法解析 profileId")
+            return 1
+        print("已加载标题->profileId 映射数量:", len(set(title_to_profile.values())))
+
+    mapping = load_cover_mapping()
+    if not mapping:
+        print("Box - 3D / Arcade - Cabinet 目录中未发现任何图片")
+        return 1
+
+    if not os.path.isdir(DEST_COVERS_DIR):
+        os.makedirs(DEST_COVERS_DIR)
+
+    # --dedup：对 Box - 3D 与 Arcade - Cabinet 的全部图片建立内容索引
+    content_index = None
+    if args.dedup:
+        content_index = ContentIndex(p for paths in mapping.values() for p in paths)
+
+    if bats is not None:
+        # 有封面的游戏所用的 bat 一次并发 stat / 读取，不再逐个等待网络往返
+        with stage("profile_resolution"):
+            bats.prefetch(
+                [
+                    os.path.basename(info["app_path"])
+                    for title, info in lb_games.items()
+                    if normalize_title(title) in mapping
+                ],
+                args.io_concurrency,
+            )
+
+    # --rank-covers：有多张候选的游戏一次并发读取全部候选的文件头
+    ranker = open_ranker_from_args(args, cache)
+    if ranker is not None:
+        with stage("matching"):
+            ranker.prefetch(multi_candidate_paths(lb_games, mapping))
+
+    tasks, skipped = plan_cover_tasks(
+        lb_games, mapping, bats, title_to_profile, content_index, ranker
+    )
+    cache.save()
+
+    # 4) 并发复制（可续传；--incremental 跳过未变化的封面）
+    with stage("transfer"):
+        results = run_transfers_from_args(args, tasks, DEST_COVERS_DIR, "box3d", content_index)
+    report_cover_results(results, skipped)
+    cache.report()
+    finish_metrics(args, "rename_covers_from_box3d")
 
     return 0
 
 
 if __name__ == "__main__":
     sys.exit(main())
-
@@ -12,6 +12,13 @@
     python rename_covers_from_coverdata.py
     python rename_covers_from_coverdata.py --coverdata ./my_images
     python rename_covers_from_coverdata.py --dry-run
+    python rename_covers_from_coverdata.py --verify-cache   # 校验 profile XML 缓存
+    python rename_covers_from_coverdata.py --jobs 8         # 8 线程并发复制
+    python rename_covers_from_coverdata.py --incremental --prune
+    python rename_covers_from_coverdata.py --link hard      # 硬链接代替复制（--move 时忽略）
+    python rename_covers_from_coverdata.py --dedup          # 内容相同的图片只复制一次，其余以硬链接共享
+    python rename_covers_from_coverdata.py --rank-covers    # 同名多张图片时按尺寸（竖版比例、分辨率）挑选
+    python rename_covers_from_coverdata.py --metrics-out metrics.jsonl   # 记录各阶段耗时与计数
 
 默认假设:
 1. 源图片目录: ./coverdata
@@ -22,29 +29,40 @@
 - 精确匹配: 图片文件名（去扩展名）= profileId，如 WMMT6RR.png -> WMMT6RR
 - 路径匹配: 从 XML 的 GamePath 提取游戏文件夹名，如 "Time Crisis 5" 与图片名模糊匹配
 - 中文/英文: 支持游戏名与图片名的多种变体
+- 同名多张图片时优先 .png；--rank-covers 时按图片尺寸挑选（见 cover_rank.py）
 """
 
 from __future__ import annotations
 
 import argparse
-import io
 import os
-import re
-import shutil
 import sys
-import unicodedata
-import xml.etree.ElementTree as ET
 from typing import Dict, List, Optional, Tuple
 
-
-def normalize_for_match(s: str) -> str:
-    """规范化字符串用于模糊匹配：去空格、转小写、去标点、统一 Unicode"""
-    if not s:
-        return ""
-    s = unicodedata.normalize("NFKC", s)
-    s = re.sub(r"[\s\-_.]+", "", s.lower())
-    s = re.sub(r"[^\w\u4e00-\u9fff]", "", s)
-    return s
+from async_io import DEFAULT_CONCURRENCY
+from cover_rank import CoverRanker, add_rank_arguments, open_ranker_from_args
+from dir_index import DirIndex
+from match_keys import (
+    KeyIndex,
+    add_key_index_arguments,
+    normalize_for_match,
+    open_key_index_from_args,
+)
+from media_metrics import add_metrics_arguments, count, finish_metrics, stage
+from media_transfer import (
+    OP_COPY,
+    OP_MOVE,
+    TransferTask,
+    add_transfer_arguments,
+    run_transfers_from_args,
+)
+from profile_cache import (
+    ProfileResolutionCache,
+    add_cache_arguments,
+    open_cache_from_args,
+)
+from profile_scanner import add_scanner_arguments, scan_profiles
+from substring_index import SubstringIndex
 
 
 def extract_game_name_from_path(game_path: str) -> Optional[str]:
@@ -63,95 +81,137 @@ def extract_game_name_from_path(game_path: str) -> Optional[str]:
     return None
 
 
-def load_profiles(profiles_dirs: List[str]) -> Dict[str, Dict[str, str]]:
+def load_profiles(
+    profiles_dirs: List[str],
+    cache: Optional[ProfileResolutionCache] = None,
+    jobs: int = 0,
+    io_concurrency: int = DEFAULT_CONCURRENCY,
+) -> Dict[str, Dict[str, str]]:
     """
     扫描 UserProfiles 目录，加载所有 profile XML。
-    返回: { profileId: { "game_name": "从 GamePath 提取", "path": "..." } }
+    返回: { profileId: { "game_name": "从 GamePath 提取", "path": "...",
+                         "genre_folder": "分类子目录", "game_genre": "XML 中的类型" } }
+    传入 cache 时，未变化的 XML 不再重新解析；jobs 为并行解析的进程数（0 = 自动），
+    io_concurrency 为列目录、stat 时同时进行的请求数。
     """
     result: Dict[str, Dict[str, str]] = {}
-    for base_dir in profiles_dirs:
-        if not os.path.isdir(base_dir):
+    for profile_id, info in scan_profiles(profiles_dirs, cache, jobs, io_concurrency).items():
+        if info["error"]:
             continue
-        for root, _dirs, files in os.walk(base_dir):
-            for f in files:
-                if not f.lower().endswith(".xml"):
-                    continue
-                xml_path = os.path.join(root, f)
-                profile_id = os.path.splitext(f)[0]
-                if not profile_id:
-                    continue
-                try:
-                    tree = ET.parse(xml_path)
-                    game_path = None
-                    for elem in tree.getroot().iter():
-                        if elem.tag == "GamePath" and elem.text:
-                            game_path = elem.text.strip()
-                            break
-                    game_name = extract_game_name_from_path(game_path) if game_path else None
-                    result[profile_id] = {
-                        "game_name": game_name or "",
-                        "path": xml_path,
-                    }
-                except Exception:
-                    pass
+        game_path = info["game_path"]
+        game_name = extract_game_name_from_path(game_path) if game_path else None
+        result[profile_id] = {
+            "game_name": game_name or "",
+            "path": info["path"],
+            "genre_folder": info["genre_folder"],
+            "game_genre": info["game_genre"],
+        }
     return result
 
 
-def load_images(coverdata_dir: str) -> Dict[str, List[str]]:
+def load_images(
+    coverdata_dir: str,
+    key_index: Optional[KeyIndex] = None,
+    dir_index: Optional[DirIndex] = None,
+) -> Dict[str, List[str]]:
     """
     扫描 coverdata 目录，按「规范化文件名」索引图片路径。
     key = normalize_for_match(文件名去扩展名)
     value = [ 完整路径列表 ]
+    传入 key_index 时，已记录过的文件名直接使用索引中的 key；
+    传入 dir_index（该目录的 DirIndex）时直接使用其快照，不再列目录。
     """
     mapping: Dict[str, List[str]] = {}
-    if not os.path.isdir(coverdata_dir):
-        return mapping
-    for fname in os.listdir(coverdata_dir):
-        if not fname.lower().endswith((".png", ".jpg", ".jpeg", ".webp")):
-            continue
+    if dir_index is None:
+        dir_index = DirIndex(coverdata_dir)
+    for fname in dir_index.names((".png", ".jpg", ".jpeg", ".webp")):
         base = os.path.splitext(fname)[0]
-        key = normalize_for_match(base)
+        key = key_index.key(base) if key_index is not None else normalize_for_match(base)
         full_path = os.path.join(coverdata_dir, fname)
         mapping.setdefault(key, []).append(full_path)
     return mapping
 
 
-def choose_best_image(paths: List[str]) -> str:
-    """多个候选时，优先 .png，其次 .jpg"""
-    for ext in (".png", ".jpg", ".jpeg", ".webp"):
+PREFERRED_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+
+
+def _extension_rank(path: str) -> int:
+    ext = os.path.splitext(path)[1].lower()
+    if ext in PREFERRED_EXTENSIONS:
+        return PREFERRED_EXTENSIONS.index(ext)
+    return len(PREFERRED_EXTENSIONS)
+
+
+def choose_best_image(paths: List[str], ranker: Optional[CoverRanker] = None) -> str:
+    """
+    多个候选时，优先 .png，其次 .jpg。
+    传入 ranker（--rank-covers）时按图片头部的宽高比、分辨率、文件大小挑选，这些都相同时仍按扩展名。
+    """
+    if ranker is not None:
+        return ranker.best(sorted(paths, key=_extension_rank))
+    for ext in PREFERRED_EXTENSIONS:
         for p in paths:
             if p.lower().endswith(ext):
                 return p
     return paths[0]
 
 
+def dest_path_for(profile_id: str, src_image: str, dest_dir: str) -> str:
+    """目标封面路径 dest_dir/{profileId}.{源扩展名}（非常见图片扩展名时用 .png）。"""
+    ext = os.path.splitext(src_image)[1].lower()
+    if ext not in (".png", ".jpg", ".jpeg", ".webp"):
+        ext = ".png"
+    return os.path.join(dest_dir, profile_id + ext)
+
+
 def find_matching_image(
     profile_id: str,
     game_name: str,
     image_mapping: Dict[str, List[str]],
+    substring_index: Optional[SubstringIndex] = None,
+    ranker: Optional[CoverRanker] = None,
 ) -> Optional[str]:
     """
     为 profileId 找到匹配的图片。
     优先级: 1) 精确 profileId  2) 游戏名  3) 模糊匹配
+    substring_index 为 SubstringIndex(list(image_mapping))，传入时第 3 步不再逐个扫描图片 key。
+    同一 key 有多张图片时由 choose_best_image(paths, ranker) 挑选。
     """
     # 1) 精确匹配 profileId
     key_id = normalize_for_match(profile_id)
     if key_id in image_mapping:
-        return choose_best_image(image_mapping[key_id])
+        return choose_best_image(image_mapping[key_id], ranker)
 
     # 2) 游戏名匹配
     if game_name:
         key_name = normalize_for_match(game_name)
         if key_name in image_mapping:
-            return choose_best_image(image_mapping[key_name])
+            return choose_best_image(image_mapping[key_name], ranker)
 
     # 3) 模糊：图片 key 包含 profileId 或 profileId 包含图片 key
-    for img_key, paths in image_mapping.items():
-        if key_id in img_key or img_key in key_id:
-            return choose_best_image(paths)
+    if substring_index is not None:
+        found = substring_index.first_related(key_id)
+        count("comparisons")
         if game_name and key_name:
-            if key_name in img_key or img_key in key_name:
-                return choose_best_image(paths)
+            by_name = substring_index.first_related(key_name)
+            count("comparisons")
+            if by_name >= 0 and (found < 0 or by_name < found):
+                found = by_name
+        if found < 0:
+            return None
+        return choose_best_image(image_mapping[substring_index.keys[found]], ranker)
+
+    checked = 0
+    try:
+        for img_key, paths in image_mapping.items():
+            checked += 1
+            if key_id in img_key or img_key in key_id:
+                return choose_best_image(paths, ranker)
+            if game_name and key_name:
+                if key_name in img_key or img_key in key_name:
+                    return choose_best_image(paths, ranker)
+    finally:
+        count("comparisons", checked)
 
     return None
 
@@ -186,6 +246,12 @@ def main() -> int:
         action="store_true",
         help="移动而非复制（减少磁盘占用）",
     )
+    add_cache_arguments(parser)
+    add_key_index_arguments(parser, "coverdata")
+    add_scanner_arguments(parser)
+    add_rank_arguments(parser)
+    add_transfer_arguments(parser)
+    add_metrics_arguments(parser)
     args = parser.parse_args()
 
     base_dir = os.path.dirname(os.path.abspath(__file__))
@@ -195,7 +261,11 @@ def main() -> int:
             os.path.join(base_dir, "UserProfiles_by_genre"),
         ]
 
-    profiles = load_profiles(args.profiles)
+    cache = open_cache_from_args(args)
+    with stage("profile_resolution"):
+        profiles = load_profiles(args.profiles, cache, args.profile_jobs, args.io_concurrency)
+    if not args.dry_run:
+        cache.save()
     if not profiles:
         print("未找到任何游戏配置文件（UserProfiles/*.xml）")
         print("请确保 UserProfiles 或 UserProfiles_by_genre 目录存在且包含 .xml 文件")
@@ -203,13 +273,29 @@ def main() -> int:
 
     print("已加载 profile 数量:", len(profiles))
 
-    image_mapping = load_images(args.coverdata)
+    key_index = open_key_index_from_args(args)
+    with stage("media_scan"):
+        coverdata_index = DirIndex(args.coverdata)
+        image_mapping = load_images(args.coverdata, key_index, coverdata_index)
+    if not args.dry_run:
+        key_index.save()
     if not image_mapping:
         print("coverdata 目录中未发现任何图片:", args.coverdata)
         print("请将收集的封面图片放入 coverdata 目录后重试")
         return 1
 
     print("coverdata 中发现图片条目数:", len(image_mapping))
+    # 图片路径 -> 加载时算出的 key，标记 profileId 命中时直接复用
+    image_keys = {path: key for key, paths in image_mapping.items() for path in paths}
+
+    with stage("index_build"):
+        substring_index = SubstringIndex(list(image_mapping))
+
+    # --rank-covers：同一 key 有多张图片的，一次并发读取全部文件头
+    ranker = open_ranker_from_args(args, cache)
+    if ranker is not None:
+        with stage("matching"):
+            ranker.prefetch([p for paths in image_mapping.values() if len(paths) > 1 for p in paths])
 
     if not os.path.isdir(args.dest) and not args.dry_run:
         os.makedirs(args.dest)
@@ -218,48 +304,65 @@ def main() -> int:
     matched_by_id = 0
     matched_by_name = 0
     unmatched_images: List[str] = []
+    tasks: List[TransferTask] = []
+    planned_moves = set()
+    # 各 profile 的匹配结果，统计未匹配图片时直接复用
+    matched: Dict[str, str] = {}
 
     for profile_id, info in profiles.items():
         game_name = info.get("game_name", "")
-        src_image = find_matching_image(profile_id, game_name, image_mapping)
+        with stage("matching"):
+            src_image = find_matching_image(
+                profile_id, game_name, image_mapping, substring_index, ranker
+            )
         if not src_image:
             continue
+        matched[profile_id] = src_image
 
-        ext = os.path.splitext(src_image)[1].lower()
-        if ext not in (".png", ".jpg", ".jpeg", ".webp"):
-            ext = ".png"
-        dest_path = os.path.join(args.dest, profile_id + ext)
+        dest_path = dest_path_for(profile_id, src_image, args.dest)
 
         if args.dry_run:
             print("[预览] {} -> {}".format(os.path.basename(src_image), os.path.basename(dest_path)))
             copied += 1
             continue
 
-        if args.move and not os.path.exists(src_image):
-            continue  # 已被前一个 profile 移动，跳过
-
-        try:
-            if args.move:
-                shutil.move(src_image, dest_path)
-            else:
-                shutil.copy2(src_image, dest_path)
+        if args.move:
+            src_norm = os.path.normpath(src_image)
+            if src_norm in planned_moves or not coverdata_index.isfile(os.path.basename(src_image)):
+                continue  # 已被前一个 profile 移动，跳过
+            planned_moves.add(src_norm)
+
+        key_id = normalize_for_match(profile_id)
+        img_key = image_keys[src_image]
+        tasks.append(TransferTask(
+            src_image,
+            dest_path,
+            OP_MOVE if args.move else OP_COPY,
+            tag=(key_id == img_key),
+        ))
+
+    if not args.dry_run:
+        cache.save()
+
+    # 并发复制/移动（可续传；--incremental 跳过未变化的封面）
+    unchanged = 0
+    if not args.dry_run:
+        with stage("transfer"):
+            results = run_transfers_from_args(args, tasks, args.dest, "coverdata")
+        for result in results:
+            task = result.task
+            if not result.ok:
+                print("处理失败:", task.src, "->", task.dest, "错误:", result.error)
+                continue
             copied += 1
-            key_id = normalize_for_match(profile_id)
-            key_name = normalize_for_match(game_name)
-            img_key = normalize_for_match(os.path.splitext(os.path.basename(src_image))[0])
-            if key_id == img_key:
+            unchanged += result.unchanged
+            if task.tag:
                 matched_by_id += 1
             else:
                 matched_by_name += 1
-        except Exception as exc:
-            print("处理失败:", src_image, "->", dest_path, "错误:", exc)
 
     # 检查未匹配的图片
-    used_paths = set()
-    for profile_id, info in profiles.items():
-        src = find_matching_image(profile_id, info.get("game_name", ""), image_mapping)
-        if src:
-            used_paths.add(os.path.normpath(src))
+    used_paths = set(os.path.normpath(src) for src in matched.values())
     for img_key, paths in image_mapping.items():
         for p in paths:
             if os.path.normpath(p) not in used_paths:
@@ -269,12 +372,17 @@ def main() -> int:
     print("  成功处理数量:", copied)
     print("  - 按 profileId 精确匹配:", matched_by_id)
     print("  - 按游戏名/模糊匹配:", matched_by_name)
+    if unchanged:
+        print("  其中目标未变化、跳过复制:", unchanged)
     if unmatched_images:
         print("  未匹配的图片（可手动重命名为 profileId 后放入 coverdata 再运行）:")
         for p in unmatched_images[:20]:
             print("    -", os.path.basename(p))
         if len(unmatched_images) > 20:
             print("    ... 共", len(unmatched_images), "个")
+    cache.report()
+    key_index.report()
+    finish_metrics(args, "rename_covers_from_coverdata")
 
     return 0
 
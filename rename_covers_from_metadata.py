@@ -6,46 +6,51 @@
   配置文件名称.扩展名
 
 使用方式：
-  1. 把本脚本复制到你的图片目录
+  1. 把本脚本（连同 profile_cache.py、fuzzy_match.py、assignment.py、media_metrics.py、
+     match_keys.py、dir_index.py、async_io.py）复制到你的图片目录，
+     或在 BigBox 目录下运行并用 --images-dir 指定图片目录
   2. 在该目录下运行（需指定 Metadata 路径）:
      python rename_covers_from_metadata.py --metadata "D:\\path\\to\\Metadata"
   3. 图片会在原位置被重命名，不复制、不移动
 
   python rename_covers_from_metadata.py --metadata "D:\\path\\to\\Metadata" --dry-run   # 预览
+  python rename_covers_from_metadata.py --metadata "D:\\path\\to\\Metadata" --assign optimal   # 全局最优分配
+  python rename_covers_from_metadata.py --metadata "D:\\path\\to\\Metadata" --metrics   # 各阶段耗时与比较次数
 """
 
 from __future__ import annotations
 
 import argparse
-import difflib
-import io
-import json
 import os
-import re
 import sys
-import unicodedata
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Set, Tuple
+
+from assignment import max_weight_matching
+from dir_index import DirIndex
+from fuzzy_match import FuzzyIndex, linear_best
+from match_keys import add_key_index_arguments, normalize_for_match, open_key_index_from_args
+from media_metrics import METRICS, add_metrics_arguments, finish_metrics, stage
+from profile_cache import (
+    ProfileResolutionCache,
+    add_cache_arguments,
+    open_cache_from_args,
+    read_metadata_game_name,
+)
 
 # 支持的图片扩展名
 IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".bmp", ".gif")
 
 
-def normalize_for_match(s: str) -> str:
-    """规范化字符串用于相似度比较：去空格/标点、转小写、统一 Unicode"""
-    if not s:
-        return ""
-    s = unicodedata.normalize("NFKC", s)
-    s = re.sub(r"[\s\-_.,;:()\[\]']+", " ", s)
-    s = s.strip().lower()
-    s = re.sub(r"[^\w\u4e00-\u9fff]", "", s)
-    return s
-
-
-def load_metadata(metadata_dir: str) -> Tuple[Dict[str, str], List[str]]:
+def load_metadata(
+    metadata_dir: str,
+    cache: Optional[ProfileResolutionCache] = None,
+) -> Tuple[Dict[str, str], List[str]]:
     """
     扫描 Metadata 目录（含子目录）下所有 *.json，读取 game_name。
     返回: ( { 配置文件名称: game_name }, 扫描过的目录列表 )
+    传入 cache 时，未变化的 JSON 不再重新读取。
     """
+    read_game_name = cache.metadata_game_name if cache is not None else read_metadata_game_name
     result: Dict[str, str] = {}
     dirs_scanned: List[str] = []
     if not os.path.isdir(metadata_dir):
@@ -60,12 +65,9 @@ def load_metadata(metadata_dir: str) -> Tuple[Dict[str, str], List[str]]:
                 continue
             path = os.path.join(root, f)
             try:
-                with io.open(path, "r", encoding="utf-8") as fp:
-                    data = json.load(fp)
-                if isinstance(data, dict):
-                    name = (data.get("game_name") or "").strip()
-                    if name:
-                        result[config_name] = name
+                name = read_game_name(path)
+                if name:
+                    result[config_name] = name
             except Exception:
                 pass
     return result, dirs_scanned
@@ -93,41 +95,68 @@ def collect_images(root_dir: str) -> Tuple[List[Tuple[str, str]], List[str]]:
     return out, dirs_scanned
 
 
-def similarity(a: str, b: str) -> float:
-    """返回 0~1 的相似度。使用规范化后的字符串。"""
-    an = normalize_for_match(a)
-    bn = normalize_for_match(b)
-    if not an or not bn:
-        return 0.0
-    if an == bn:
-        return 1.0
-    return difflib.SequenceMatcher(None, an, bn).ratio()
-
-
 def best_matching_image(
-    game_name: str,
-    images: List[Tuple[str, str]],
-    used_paths: set,
+    game_key: str,
+    index: FuzzyIndex,
+    used: Set[int],
     min_ratio: float = 0.25,
-) -> Optional[Tuple[str, str]]:
+    matcher: str = "index",
+) -> Optional[int]:
     """
-    在未使用的图片中，找出与 game_name 相似度最高的那张。
-    返回 (完整路径, 文件名无扩展名) 或 None。
+    在未使用的图片中，找出与 game_key（已规范化）相似度最高的那张。
+    返回图片在 images 列表中的下标或 None。
+    matcher="scan" 时退回原先的全量线性扫描。
     """
-    best_path: Optional[str] = None
-    best_base: Optional[str] = None
-    best_score = min_ratio
-    for path, base in images:
-        if path in used_paths:
-            continue
-        score = similarity(game_name, base)
-        if score > best_score:
-            best_score = score
-            best_path = path
-            best_base = base
-    if best_path is None:
+    if matcher == "scan":
+        index.comparisons += len(index.keys) - len(used)
+        best = linear_best(game_key, index.keys, min_ratio, used)
+    else:
+        best = index.best(game_key, min_ratio, used)
+    if best is None:
         return None
-    return (best_path, best_base)
+    return best[1]
+
+
+def assign_greedy(
+    ordered: List[Tuple[str, str]],
+    index: FuzzyIndex,
+    min_ratio: float,
+    matcher: str = "index",
+) -> Dict[str, int]:
+    """
+    贪心分配：按给定顺序，每个配置取当前未使用图片中相似度最高的一张。
+    返回 { 配置文件名称: 图片下标 }。
+    """
+    used: Set[int] = set()
+    result: Dict[str, int] = {}
+    for config_name, game_name in ordered:
+        best = best_matching_image(
+            normalize_for_match(game_name), index, used, min_ratio, matcher
+        )
+        if best is None:
+            continue
+        used.add(best)
+        result[config_name] = best
+    return result
+
+
+def assign_optimal(
+    ordered: List[Tuple[str, str]],
+    index: FuzzyIndex,
+    min_ratio: float,
+    top_k: int = 5,
+) -> Dict[str, int]:
+    """
+    全局最优分配：每个配置只取相似度最高的 top_k 张图片作为候选边，
+    再求总相似度最大的二分匹配（允许部分配置不匹配）。
+    返回 { 配置文件名称: 图片下标 }。
+    """
+    edges: Dict[str, Dict[int, float]] = {}
+    for config_name, game_name in ordered:
+        top = index.top(normalize_for_match(game_name), top_k, min_ratio)
+        if top:
+            edges[config_name] = {idx: score for score, idx in top}
+    return max_weight_matching(edges, order=[c for c, _ in ordered])
 
 
 def main() -> int:
@@ -153,15 +182,40 @@ def main() -> int:
         default=0.25,
         help="最低相似度 0~1，低于此不匹配（默认 0.25）",
     )
+    parser.add_argument(
+        "--matcher",
+        choices=("index", "scan"),
+        default="index",
+        help="匹配方式: index=n-gram 索引（默认）, scan=逐张比较（原方式）",
+    )
+    parser.add_argument(
+        "--assign",
+        choices=("greedy", "optimal"),
+        default="greedy",
+        help="分配方式: greedy=按名称长度依次取最佳（默认）, optimal=全局总相似度最大",
+    )
+    parser.add_argument(
+        "--top-k",
+        type=int,
+        default=5,
+        help="optimal 模式下每个配置保留的候选图片数（默认 5）",
+    )
     parser.add_argument(
         "--dry-run",
         action="store_true",
         help="仅打印将要执行的操作，不实际重命名",
     )
+    add_cache_arguments(parser)
+    add_key_index_arguments(parser, "metadata")
+    add_metrics_arguments(parser)
     args = parser.parse_args()
 
     # ---------- 加载 Metadata ----------
-    metadata, meta_dirs = load_metadata(args.metadata)
+    cache = open_cache_from_args(args)
+    with stage("profile_resolution"):
+        metadata, meta_dirs = load_metadata(args.metadata, cache)
+    if not args.dry_run:
+        cache.save()
     if not metadata:
         print("未在 Metadata 目录中找到任何带 game_name 的 JSON:", args.metadata)
         return 1
@@ -178,7 +232,8 @@ def main() -> int:
     print()
 
     # ---------- 扫描图片 ----------
-    images, img_dirs = collect_images(args.images_dir)
+    with stage("media_scan"):
+        images, img_dirs = collect_images(args.images_dir)
     if not images:
         print("未在图片目录中发现任何图片:", os.path.abspath(args.images_dir))
         return 1
@@ -194,19 +249,39 @@ def main() -> int:
         print("  -", path)
     print()
 
-    used_paths: set = set()
+    # 每张图片的文件名只规范化一次（跨运行持久化），并建立 n-gram 索引
+    key_index = open_key_index_from_args(args)
+    with stage("index_build"):
+        index = FuzzyIndex([key_index.key(base) for _, base in images])
+    if not args.dry_run:
+        key_index.save()
+
+    # 按 game_name 长度降序处理，优先把长名（更具体）的游戏先匹配
+    ordered = sorted(metadata.items(), key=lambda x: -len(x[1]))
+    with stage("matching"):
+        assigned = assign_greedy(ordered, index, args.min_ratio, args.matcher)
+        changed = 0
+        if args.assign == "optimal":
+            greedy = assigned
+            assigned = assign_optimal(ordered, index, args.min_ratio, args.top_k)
+            changed = sum(
+                1 for config_name, _ in ordered
+                if greedy.get(config_name) != assigned.get(config_name)
+            )
+        METRICS.count("comparisons", index.comparisons)
+
     done = 0
     skipped = 0
     renamed_list: List[Tuple[str, str]] = []  # (原路径, 新路径)
+    # 每个图片目录只列一次，目标是否已存在在内存中判断；本脚本改名后同步更新
+    dir_indexes: Dict[str, DirIndex] = {}
 
-    # 按 game_name 长度降序处理，优先把长名（更具体）的游戏先匹配
-    for config_name, game_name in sorted(metadata.items(), key=lambda x: -len(x[1])):
-        best = best_matching_image(game_name, images, used_paths, args.min_ratio)
-        if not best:
+    for config_name, game_name in ordered:
+        best = assigned.get(config_name)
+        if best is None:
             skipped += 1
             continue
-        src_path, _ = best
-        used_paths.add(src_path)
+        src_path, _ = images[best]
         ext = os.path.splitext(src_path)[1].lower()
         dest_name = config_name + ext
         dest_path = os.path.join(os.path.dirname(src_path), dest_name)
@@ -219,11 +294,18 @@ def main() -> int:
 
         if os.path.normpath(src_path) == os.path.normpath(dest_path):
             continue
-        if os.path.exists(dest_path) and os.path.abspath(dest_path) != os.path.abspath(src_path):
+        src_dir = os.path.dirname(src_path)
+        dir_index = dir_indexes.get(src_dir)
+        if dir_index is None:
+            dir_index = dir_indexes[src_dir] = DirIndex(src_dir)
+        if dir_index.exists(dest_name) and os.path.abspath(dest_path) != os.path.abspath(src_path):
             print("跳过（目标已存在）:", dest_path)
             continue
         try:
-            os.rename(src_path, dest_path)
+            with stage("rename"):
+                os.rename(src_path, dest_path)
+            dir_index.note_removed(os.path.basename(src_path))
+            dir_index.note_written(dest_name)
             done += 1
             renamed_list.append((src_path, dest_path))
         except Exception as e:
@@ -242,6 +324,12 @@ def main() -> int:
     print("======== 处理完成 ========")
     print("  成功重命名: %d" % done)
     print("  未匹配（相似度不足或无可用图片）: %d" % skipped)
+    print("  相似度计算次数: %d" % index.comparisons)
+    if args.assign == "optimal":
+        print("  与贪心分配相比发生变化的配置: %d" % changed)
+    cache.report()
+    key_index.report()
+    finish_metrics(args, "rename_covers_from_metadata")
     return 0
 
 
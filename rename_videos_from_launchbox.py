@@ -4,13 +4,25 @@
 从 LaunchBox 风格的 videos 目录中，
 根据 Teknoparrot.xml 和 bat 脚本，重命名并“移动”视频到:
 
-    Media/Videos/{profileId}.mp4
+    Media/Videos/{profileId}.{扩展名}（与源文件相同，如 .mp4 / .mkv / .avi）
 
-注意：是移动（move），不是复制，以减少磁盘占用。
+只改名不转换格式；需要统一的 mp4 预览片段时，之后运行 build_video_previews.py（需要 ffmpeg）。
+放置成功后删除 Media/Videos 中同一 profileId 其它扩展名的旧视频
+（如以前的版本把 mkv 改名成的 {profileId}.mp4），否则前端按 .mp4 优先仍会播放旧文件。
+
+注意：默认是移动（move），不是复制，以减少磁盘占用。
+指定 --link hard/reflink/sym 时改为以链接方式放置，保留 videos 中的原文件且不额外占用空间。
 
 使用方式（在 TeknoParrotBigBox 目录下运行）:
 
     python rename_videos_from_launchbox.py
+    python rename_videos_from_launchbox.py --rebuild-cache   # 重新读取所有 bat
+    python rename_videos_from_launchbox.py --jobs 4 --max-inflight-mb 1024
+    python rename_videos_from_launchbox.py --metrics         # 打印各阶段耗时与文件读写计数
+    python rename_videos_from_launchbox.py --io-concurrency 64   # bat 在网络共享上时加大并发 stat / 读取
+
+中断后直接重新运行即可：已移动完成的视频已不在 videos 中，不会重复处理；
+指定 --incremental 时还会记录 Media/Videos/.transfer_journal.jsonl，已完成且源未变化的条目直接跳过。
 
 默认假设:
 1. Teknoparrot.xml 在当前目录下
@@ -28,13 +40,25 @@
 
 from __future__ import annotations
 
-import io
+import argparse
 import os
 import re
-import shutil
 import sys
-import xml.etree.ElementTree as ET
-from typing import Dict, Optional, List
+from typing import Dict, List, Tuple
+
+from async_io import add_io_arguments
+from dir_index import DirIndex
+from launchbox_xml import iter_launchbox_games
+from media_metrics import add_metrics_arguments, finish_metrics, stage
+from media_transfer import (
+    OP_COPY,
+    OP_MOVE,
+    TransferResult,
+    TransferTask,
+    add_transfer_arguments,
+    run_transfers_from_args,
+)
+from profile_cache import BatDirectory, add_cache_arguments, open_cache_from_args
 
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -43,6 +67,9 @@ BAT_DIR = os.path.join(BASE_DIR, "bat")
 VIDEOS_DIR = os.path.join(BASE_DIR, "videos")
 DEST_VIDEOS_DIR = os.path.join(BASE_DIR, "Media", "Videos")
 
+# 源视频扩展名；均为前端 ResolveVideoPath 能识别的扩展名
+VIDEO_EXTENSIONS = (".mp4", ".m4v", ".mov", ".avi", ".mkv", ".webm", ".wmv")
+
 
 def normalize_title(name: str) -> str:
     """
@@ -68,9 +95,7 @@ def load_video_files() -> Dict[str, List[str]]:
         print("videos 目录不存在:", VIDEOS_DIR)
         return mapping
 
-    for fname in os.listdir(VIDEOS_DIR):
-        if not fname.lower().endswith((".mp4", ".m4v", ".mov", ".avi", ".mkv")):
-            continue
+    for fname in DirIndex(VIDEOS_DIR).names(VIDEO_EXTENSIONS):
         key = normalize_title(fname)
         full_path = os.path.join(VIDEOS_DIR, fname)
         mapping.setdefault(key, []).append(full_path)
@@ -91,15 +116,11 @@ def load_launchbox_games() -> Dict[str, Dict[str, str]]:
         print("未找到 Teknoparrot.xml:", LAUNCHBOX_XML)
         return {}
 
-    with io.open(LAUNCHBOX_XML, "r", encoding="utf-8") as f:
-        data = f.read()
-
-    root = ET.fromstring(data)
     result: Dict[str, Dict[str, str]] = {}
 
-    for game_elem in root.findall("Game"):
-        title = (game_elem.findtext("Title") or "").strip()
-        app_path = (game_elem.findtext("ApplicationPath") or "").strip()
+    for game in iter_launchbox_games(LAUNCHBOX_XML, ("Title", "ApplicationPath")):
+        title = game["Title"].strip()
+        app_path = game["ApplicationPath"].strip()
         if not title or not app_path:
             continue
         result[title] = {
@@ -111,61 +132,28 @@ def load_launchbox_games() -> Dict[str, Dict[str, str]]:
     return result
 
 
-def extract_profile_id_from_bat(bat_path: str) -> Optional[str]:
-    """
-    从 bat 第一行解析 TeknoParrot profileId:
-        START ..\\TeknoParrotUi.exe --profile=WMMT6RR.xml
-    返回 "WMMT6RR" 或 None。
-    """
-    try:
-        with io.open(bat_path, "r", encoding="utf-8", errors="ignore") as f:
-            first_line = f.readline()
-    except IOError:
-        return None
-
-    marker = "--profile="
-    idx = first_line.lower().find(marker)
-    if idx < 0:
-        return None
-
-    start = idx + len(marker)
-    end = first_line.lower().find(".xml", start)
-    if end <= start:
-        return None
-    return first_line[start:end].strip()
-
-
 def choose_best_video(paths: List[str]) -> str:
     """
     多个候选视频时，优先选择文件名中包含 "-01" 的那一个，否则返回第一个。
     """
     for p in paths:
-        if re.search(r"-01\.(mp4|m4v|mov|avi|mkv)$", p, re.IGNORECASE):
+        if re.search(r"-01\.(mp4|m4v|mov|avi|mkv|webm|wmv)$", p, re.IGNORECASE):
             return p
     return paths[0]
 
 
-def main() -> int:
-    lb_games = load_launchbox_games()
-    if not lb_games:
-        return 1
-
-    if not os.path.isdir(BAT_DIR):
-        print("未找到 bat 目录:", BAT_DIR)
-        return 1
-
-    video_mapping = load_video_files()
-    if not video_mapping:
-        print("videos 目录中未发现任何视频:", VIDEOS_DIR)
-        return 1
-
-    if not os.path.isdir(DEST_VIDEOS_DIR):
-        os.makedirs(DEST_VIDEOS_DIR)
-
-    moved = 0
-    skipped_no_video = 0
-    skipped_no_bat = 0
-    skipped_no_profile = 0
+def plan_video_tasks(
+    lb_games: Dict[str, Dict[str, str]],
+    video_mapping: Dict[str, List[str]],
+    bats: BatDirectory,
+    op: str = OP_MOVE,
+) -> Tuple[List[TransferTask], Dict[str, int]]:
+    """
+    为每个 LaunchBox 游戏选出视频并从 bat 解析 profileId，生成移动（或链接）任务。
+    返回 (任务列表, { "no_video" / "no_bat" / "no_profile": 跳过数量 })。
+    """
+    skipped = {"no_video": 0, "no_bat": 0, "no_profile": 0}
+    tasks: List[TransferTask] = []
 
     for title, info in lb_games.items():
         norm_title = normalize_title(title)
@@ -173,7 +161,7 @@ def main() -> int:
         # 1) 找到对应视频
         candidates = video_mapping.get(norm_title)
         if not candidates:
-            skipped_no_video += 1
+            skipped["no_video"] += 1
             continue
 
         src_video = choose_best_video(candidates)
@@ -181,36 +169,136 @@ def main() -> int:
         # 2) 根据 ApplicationPath 找到对应 bat 文件
         app_path = info["app_path"]
         bat_name = os.path.basename(app_path)
-        local_bat = os.path.join(BAT_DIR, bat_name)
-        if not os.path.isfile(local_bat):
-            skipped_no_bat += 1
+        if not bats.exists(bat_name):
+            skipped["no_bat"] += 1
             continue
 
         # 3) 从 bat 解析 profileId
-        profile_id = extract_profile_id_from_bat(local_bat)
+        with stage("profile_resolution"):
+            profile_id = bats.profile_id(bat_name)
         if not profile_id:
-            skipped_no_profile += 1
+            skipped["no_profile"] += 1
             continue
 
-        # 4) 移动为 Media/Videos/{profileId}.mp4
-        dest_ext = ".mp4"  # 统一输出为 .mp4
+        # 4) 移动（或 --link 时链接）为 Media/Videos/{profileId}.{源扩展名}
+        #    不做格式转换，因此也不改扩展名（mkv 改名为 .mp4 会让播放器按错误的容器解析）
+        dest_ext = os.path.splitext(src_video)[1].lower()
         dest_path = os.path.join(DEST_VIDEOS_DIR, profile_id + dest_ext)
+        tasks.append(TransferTask(src_video, dest_path, op))
+
+    return tasks, skipped
+
 
-        try:
-            shutil.move(src_video, dest_path)
+def remove_stale_videos(results: List[TransferResult], dest_dir: str = DEST_VIDEOS_DIR) -> List[str]:
+    """
+    对放置成功的每个 {profileId}{扩展名}，删除 dest_dir 中同一 profileId、其它 VIDEO_EXTENSIONS 扩展名的文件
+    （前端 ResolveVideoPath 与 build_video_previews 都按固定扩展名顺序取第一个，旧文件会挡住新文件）。
+    返回已删除的路径；删除失败时打印并保留。
+    """
+    dir_index = DirIndex(dest_dir)
+    removed: List[str] = []
+    for result in results:
+        if not result.ok:
+            continue
+        base, ext = os.path.splitext(os.path.basename(result.task.dest))
+        for other in VIDEO_EXTENSIONS:
+            if other == ext.lower():
+                continue
+            name = dir_index.lookup(base + other)
+            if name is None:
+                continue
+            path = os.path.join(dest_dir, name)
+            try:
+                os.remove(path)
+            except OSError as exc:
+                print("删除旧视频失败:", path, "错误:", exc)
+                continue
+            dir_index.note_removed(name)
+            removed.append(path)
+    return removed
+
+
+def report_video_results(
+    results: List[TransferResult],
+    skipped: Dict[str, int],
+    stale_removed: int = 0,
+) -> None:
+    moved = 0
+    resumed = 0
+    for result in results:
+        if result.ok:
             moved += 1
-        except Exception as exc:
-            print("移动视频失败:", src_video, "->", dest_path, "错误:", exc)
+            resumed += result.resumed
+        else:
+            task = result.task
+            print("移动视频失败:", task.src, "->", task.dest, "错误:", result.error)
 
     print("处理完成。")
     print("  成功移动视频数量:", moved)
-    print("  跳过（找不到对应视频）的条目:", skipped_no_video)
-    print("  跳过（找不到对应 bat 文件）的条目:", skipped_no_bat)
-    print("  跳过（bat 中未解析出 profileId）的条目:", skipped_no_profile)
+    if resumed:
+        print("    其中上次已完成、本次续传跳过:", resumed)
+    if stale_removed:
+        print("  删除的同一 profileId 其它扩展名的旧视频:", stale_removed)
+    print("  跳过（找不到对应视频）的条目:", skipped["no_video"])
+    print("  跳过（找不到对应 bat 文件）的条目:", skipped["no_bat"])
+    print("  跳过（bat 中未解析出 profileId）的条目:", skipped["no_profile"])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="将 videos 中的视频按 profileId 移动到 Media/Videos"
+    )
+    add_cache_arguments(parser)
+    add_io_arguments(parser)
+    add_transfer_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    with stage("xml_load"):
+        lb_games = load_launchbox_games()
+    if not lb_games:
+        return 1
+
+    if not os.path.isdir(BAT_DIR):
+        print("未找到 bat 目录:", BAT_DIR)
+        return 1
+
+    with stage("media_scan"):
+        video_mapping = load_video_files()
+    if not video_mapping:
+        print("videos 目录中未发现任何视频:", VIDEOS_DIR)
+        return 1
+
+    if not os.path.isdir(DEST_VIDEOS_DIR):
+        os.makedirs(DEST_VIDEOS_DIR)
+
+    cache = open_cache_from_args(args)
+    bats = BatDirectory(BAT_DIR, cache)
+    # 有视频的游戏所用的 bat 一次并发 stat / 读取，不再逐个等待网络往返
+    with stage("profile_resolution"):
+        bats.prefetch(
+            [
+                os.path.basename(info["app_path"])
+                for title, info in lb_games.items()
+                if normalize_title(title) in video_mapping
+            ],
+            args.io_concurrency,
+        )
+    tasks, skipped = plan_video_tasks(
+        lb_games, video_mapping, bats, OP_COPY if args.link else OP_MOVE
+    )
+    cache.save()
+
+    # 5) 并发移动（中断后可续传）
+    with stage("transfer"):
+        results = run_transfers_from_args(args, tasks, DEST_VIDEOS_DIR, "videos")
+        removed = remove_stale_videos(results)
+    report_video_results(results, skipped, len(removed))
+    cache.report()
+    finish_metrics(args, "rename_videos_from_launchbox")
 
     return 0
 
 
 if __name__ == "__main__":
     sys.exit(main())
-
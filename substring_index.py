@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+子串包含关系索引，用于替代「每个 profile × 每个图片 key」双向 `in` 判断的全量扫描。
+
+对一组已规范化的 key（下标与传入列表顺序一致）建立两个结构:
+
+- Aho-Corasick 自动机：所有 key 作为模式串，扫描一遍查询串即可得到
+  「被查询串包含的 key」（key in query），耗时与查询串长度 + 命中数成正比。
+- 后缀数组：所有 key 的全部后缀排序后二分查找查询串，
+  得到「包含查询串的 key」（query in key），耗时 O(log N + 命中数)。
+
+first_related(query) 返回满足任一方向的最小下标，与按原顺序线性扫描、
+遇到第一个满足条件的 key 即返回的结果完全相同。
+
+独立运行时执行一个简单的规模测试（并与线性扫描核对结果）:
+
+    python substring_index.py --sizes 1000 4000 16000
+"""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import random
+import sys
+import time
+from typing import Dict, List
+
+
+class SubstringIndex(object):
+    """
+    对一组已规范化的 key 建立子串包含索引，候选通过下标标识。
+    空 key 是任何字符串的子串，与原先 `"" in s` 的行为一致。
+    """
+
+    def __init__(self, keys: List[str]):
+        self.keys = keys
+        self.comparisons = 0
+
+        # ---------- Aho-Corasick：goto / fail / 输出（各状态命中的最小下标） ----------
+        self._goto: List[Dict[str, int]] = [{}]
+        self._out: List[int] = [-1]
+        for idx, key in enumerate(keys):
+            state = 0
+            for ch in key:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._out.append(-1)
+                state = nxt
+            if self._out[state] < 0:
+                self._out[state] = idx
+        self._fail = [0] * len(self._goto)
+        # 按 BFS 顺序计算失配指针，并把沿失配链可达的输出合并为最小下标
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                inherited = self._out[self._fail[nxt]]
+                if inherited >= 0 and (self._out[nxt] < 0 or inherited < self._out[nxt]):
+                    self._out[nxt] = inherited
+
+        # ---------- 后缀数组：(后缀, key 下标)，按后缀排序 ----------
+        pairs = sorted(
+            (key[i:], idx) for idx, key in enumerate(keys) for i in range(len(key))
+        )
+        self._suffixes = [s for s, _ in pairs]
+        self._owners = [idx for _, idx in pairs]
+
+    def contained_in(self, query: str) -> int:
+        """被 query 包含的 key 中的最小下标（key in query），没有则返回 -1。"""
+        best = self._out[0]  # 空 key
+        state = 0
+        for ch in query:
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            found = self._out[state]
+            if found >= 0 and (best < 0 or found < best):
+                best = found
+        return best
+
+    def containing(self, query: str) -> int:
+        """包含 query 的 key 中的最小下标（query in key），没有则返回 -1。"""
+        if not query:
+            return 0 if self.keys else -1
+        best = -1
+        pos = bisect.bisect_left(self._suffixes, query)
+        suffixes = self._suffixes
+        while pos < len(suffixes) and suffixes[pos].startswith(query):
+            owner = self._owners[pos]
+            if best < 0 or owner < best:
+                best = owner
+            pos += 1
+        return best
+
+    def first_related(self, query: str) -> int:
+        """
+        返回与 query 存在包含关系（任一方向）的最小下标，没有则返回 -1。
+        等价于: next(i for i, k in enumerate(keys) if query in k or k in query)
+        """
+        a = self.contained_in(query)
+        b = self.containing(query)
+        self.comparisons += 1
+        if a < 0:
+            return b
+        if b < 0:
+            return a
+        return min(a, b)
+
+
+def linear_first_related(query: str, keys: List[str]) -> int:
+    """原先的全量线性扫描（用于对照）。"""
+    for idx, key in enumerate(keys):
+        if query in key or key in query:
+            return idx
+    return -1
+
+
+def _synthetic_keys(count: int, rng: random.Random) -> List[str]:
+    words = [
+        "time", "crisis", "wangan", "midnight", "maximum", "tune", "initial",
+        "house", "dead", "virtua", "fighter", "tekken", "mario", "kart",
+        "化解危机", "头文字", "湾岸", "午夜", "极速", "太鼓", "达人", "赛车",
+    ]
+    return [
+        "".join(rng.choice(words) for _ in range(rng.randint(1, 4))) + str(i)
+        for i in range(count)
+    ]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="SubstringIndex 与线性扫描的规模对比")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 4000, 16000])
+    parser.add_argument("--queries", type=int, default=1000, help="每个规模下的查询数")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    print("keys  queries  index_build(s)  index_query(s)  scan(s)  same")
+    for size in args.sizes:
+        keys = _synthetic_keys(size, rng)
+        queries: List[str] = []
+        for _ in range(args.queries):
+            key = rng.choice(keys)
+            queries.append(rng.choice([key[1:-1], key + "x", "zz" + key[:3], "不存在" + str(size)]))
+
+        t0 = time.perf_counter()
+        index = SubstringIndex(keys)
+        t1 = time.perf_counter()
+        got = [index.first_related(q) for q in queries]
+        t2 = time.perf_counter()
+        want = [linear_first_related(q, keys) for q in queries]
+        t3 = time.perf_counter()
+
+        same = sum(1 for a, b in zip(got, want) if a == b)
+        print("%5d  %7d  %14.3f  %14.3f  %7.2f  %d/%d" % (
+            size, len(queries), t1 - t0, t2 - t1, t3 - t2, same, len(queries)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+生成模拟的 LaunchBox / TeknoParrot 游戏库，用于基准测试（bench_media.py）。
+
+生成的目录结构与 TeknoParrotBigBox 目录一致:
+
+    Teknoparrot.xml                   N 个 <Game>，含真实长度的中英文 <Notes>
+    bat/{bat 名}.bat                  第一行: START ..\\TeknoParrotUi.exe --profile={id}.xml
+    UserProfiles/{id}.xml             含 <GamePath> 的 GameProfile
+    Metadata/{id}.json                {"game_name": ..., "game_genre": ...}
+    covers/Box - 3D/{标题}-01.png      约 2/3 的游戏有 -01，其中一半还有 -02
+    covers/Arcade - Cabinet/{标题}-01.png   约 1/6 的游戏
+    coverdata/{id 或 游戏文件夹名}.png   约 1/5 的游戏
+    videos/{标题}-01.mp4               约 1/4 的游戏
+
+标题、文件名混合中文与拉丁字母；同一 seed 生成的内容完全相同。
+图片带有合法的 PNG 文件头（含宽高），视频带 ftyp 头，其余为随机填充。
+
+使用方式:
+
+    python synthetic_library.py D:\\bench\\lib_1k --games 1000
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import random
+import struct
+import sys
+import zlib
+from typing import List
+from xml.sax.saxutils import escape
+
+
+GENRES = [
+    ("Fighting", "格鬥"),
+    ("Racing", "競速"),
+    ("Shooter / Gun", "光槍"),
+    ("Shooter", "射擊"),
+    ("Sports", "體育"),
+    ("Action", "動作"),
+    ("Music", "音樂"),
+    ("Puzzle", "益智"),
+]
+
+LATIN_WORDS = (
+    "Time Crisis Wangan Midnight Maximum Tune Taiko Tatsujin House Dead Initial Drive "
+    "Street Fighter Tekken Sega Rally Outrun Daytona Raiden Star Wars Battle Pod Storm "
+    "Mario Kart Arcade Tank Hero Ninja Dragon Spirit Blazing Zero Force Ultra Turbo"
+).split()
+
+CJK_CHARS = (
+    "化解危机灣岸午夜極速太鼓達人紅版死亡之屋頭文字街頭霸王鐵拳世嘉拉力賽雷電星球大戰"
+    "馬力歐賽車坦克英雄忍者神龍戰士烈焰零式超級渦輪極限運動會雪板狂潮"
+)
+
+# 除 <Game> 里实际被脚本读取的字段外，再带上一些常见的空字段，使 XML 体积与真实导出接近
+FILLER_TAGS = (
+    "GogAppId", "OriginAppId", "OriginInstallPath", "VideoPath", "ThemeVideoPath",
+    "CommandLine", "ConfigurationCommandLine", "ConfigurationPath", "DosBoxConfigurationPath",
+    "Emulator", "ManualPath", "MusicPath", "Rating", "ScummVMGameDataFolderPath",
+    "ScummVMGameType", "SortTitle", "Source", "WikipediaURL", "Version", "Series", "Region",
+    "CloneOf", "PauseAutoHotkeyScript", "ResumeAutoHotkeyScript", "LoadStateAutoHotkeyScript",
+    "SaveStateAutoHotkeyScript", "ResetAutoHotkeyScript", "SwapDiscsAutoHotkeyScript",
+    "CustomDosBoxVersionPath", "AndroidBoxFrontThumbPath", "AndroidBoxFrontFullPath",
+    "AndroidClearLogoThumbPath", "AndroidClearLogoFullPath", "AndroidBackgroundPath",
+    "AndroidVideoPath",
+)
+
+
+def _cjk(rng: random.Random, n: int) -> str:
+    return "".join(rng.choice(CJK_CHARS) for _ in range(n))
+
+
+def _latin(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(LATIN_WORDS) for _ in range(n))
+
+
+def _notes(rng: random.Random) -> str:
+    """中文说明 + [英文原文]，总长度约 300~4000 字符（真实数据平均约 1.7KB）。"""
+    zh = "。".join(_cjk(rng, rng.randint(8, 30)) for _ in range(rng.randint(5, 40)))
+    en = ". ".join(_latin(rng, rng.randint(5, 15)) for _ in range(rng.randint(3, 20)))
+    return zh + "。\n\n[英文原文]\n" + en + "."
+
+
+def fake_png(rng: random.Random, width: int, height: int, size: int) -> bytes:
+    """带合法 PNG 签名与 IHDR（宽高）的文件内容，其余为随机字节，总长约 size。"""
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    chunk = b"IHDR" + ihdr
+    head = (
+        b"\x89PNG\r\n\x1a\n"
+        + struct.pack(">I", len(ihdr))
+        + chunk
+        + struct.pack(">I", zlib.crc32(chunk) & 0xFFFFFFFF)
+    )
+    return head + _random_bytes(rng, size - len(head))
+
+
+def fake_mp4(rng: random.Random, size: int) -> bytes:
+    head = struct.pack(">I", 24) + b"ftypisom" + b"\x00\x00\x02\x00" + b"isomiso2"
+    return head + _random_bytes(rng, size - len(head))
+
+
+def _random_bytes(rng: random.Random, n: int) -> bytes:
+    if n <= 0:
+        return b""
+    return rng.getrandbits(8 * n).to_bytes(n, "little")
+
+
+def _write_text(path: str, text: str) -> None:
+    with io.open(path, "w", encoding="utf-8", newline="") as fp:
+        fp.write(text)
+
+
+def _write_bytes(path: str, data: bytes) -> None:
+    with io.open(path, "wb") as fp:
+        fp.write(data)
+
+
+def generate_library(
+    root: str,
+    games: int,
+    seed: int = 1,
+    media_bytes: int = 2048,
+    video_bytes: int = 8192,
+) -> List[str]:
+    """
+    在 root 下生成 games 个游戏的模拟库，返回生成的 profileId 列表（按生成顺序）。
+    root 已存在时直接覆盖其中的同名文件。
+    """
+    rng = random.Random(seed)
+    dirs = {
+        "bat": os.path.join(root, "bat"),
+        "profiles": os.path.join(root, "UserProfiles"),
+        "metadata": os.path.join(root, "Metadata"),
+        "box3d": os.path.join(root, "covers", "Box - 3D"),
+        "arcade": os.path.join(root, "covers", "Arcade - Cabinet"),
+        "coverdata": os.path.join(root, "coverdata"),
+        "videos": os.path.join(root, "videos"),
+    }
+    for d in dirs.values():
+        if not os.path.isdir(d):
+            os.makedirs(d)
+
+    profile_ids: List[str] = []
+    xml_parts = ['<?xml version="1.0" standalone="yes"?>\n<LaunchBox>\n']
+    for i in range(games):
+        genre_en, genre_zh = GENRES[i % len(GENRES)]
+        latin = "{} {}".format(_latin(rng, rng.randint(1, 4)), i)
+        cjk = _cjk(rng, rng.randint(2, 8))
+        profile_id = "{}{}".format("".join(w[:2] for w in latin.split()[:3]), i)
+        # 标题：约一半为中文（带分类前缀），其余为英文
+        title = "{}-{}{}".format(genre_zh, cjk, i) if i % 2 else latin
+        bat_name = "{}   {}-{}".format(latin, genre_zh, cjk)
+        game_folder = "{} {}".format(latin, cjk) if i % 3 else latin
+        profile_ids.append(profile_id)
+
+        app_path = os.path.join("Emulators", "Teknoparrot", "bat", bat_name + ".bat")
+        fields = [
+            ("ApplicationPath", app_path),
+            ("DateAdded", "2025-10-10T15:17:34.7151726+08:00"),
+            ("DateModified", "2025-12-02T10:{:02d}:{:02d}+08:00".format(i // 60 % 60, i % 60)),
+            ("Developer", _latin(rng, 2)),
+            ("ID", "{:08x}-0000-4000-8000-{:012x}".format(seed, i)),
+            ("Notes", _notes(rng)),
+            ("Platform", "Teknoparrot鹦鹉模拟器"),
+            ("Publisher", _latin(rng, 2)),
+            ("ReleaseDate", "20{:02d}-03-01T00:00:00+08:00".format(i % 25)),
+            ("Title", title),
+            ("Genre", genre_en),
+        ]
+        xml_parts.append("  <Game>\n")
+        for tag in FILLER_TAGS:
+            xml_parts.append("    <{} />\n".format(tag))
+        for tag, value in fields:
+            xml_parts.append("    <{0}>{1}</{0}>\n".format(tag, escape(value)))
+        xml_parts.append("  </Game>\n")
+
+        _write_text(
+            os.path.join(dirs["bat"], bat_name + ".bat"),
+            "START ..\\TeknoParrotUi.exe --profile={}.xml\r\nexit\r\n".format(profile_id),
+        )
+        config = "".join(
+            "    <FieldInformation><FieldName>Option{0}</FieldName>"
+            "<FieldValue>{1}</FieldValue></FieldInformation>\n".format(k, rng.randint(0, 9))
+            for k in range(20)
+        )
+        _write_text(
+            os.path.join(dirs["profiles"], profile_id + ".xml"),
+            '<?xml version="1.0" encoding="utf-8"?>\n<GameProfile>\n'
+            "  <GameName>{}</GameName>\n  <ConfigValues>\n{}  </ConfigValues>\n"
+            "  <GamePath>D:\\Games\\{}\\game.exe</GamePath>\n</GameProfile>\n".format(
+                escape(latin), config, escape(game_folder)
+            ),
+        )
+        with io.open(os.path.join(dirs["metadata"], profile_id + ".json"), "w", encoding="utf-8") as fp:
+            json.dump({"game_name": title, "game_genre": genre_en}, fp, ensure_ascii=False)
+
+        if i % 3 != 2:
+            _write_bytes(
+                os.path.join(dirs["box3d"], title + "-01.png"),
+                fake_png(rng, 600, 900, media_bytes),
+            )
+            if i % 2:
+                _write_bytes(
+                    os.path.join(dirs["box3d"], title + "-02.png"),
+                    fake_png(rng, 640, 480, media_bytes // 2),
+                )
+        if i % 6 == 5:
+            _write_bytes(
+                os.path.join(dirs["arcade"], title + "-01.png"),
+                fake_png(rng, 500, 900, media_bytes),
+            )
+        if i % 5 == 0:
+            name = profile_id if i % 2 == 0 else game_folder
+            _write_bytes(
+                os.path.join(dirs["coverdata"], name + ".png"),
+                fake_png(rng, 600, 800, media_bytes),
+            )
+        if i % 4 == 0:
+            _write_bytes(os.path.join(dirs["videos"], title + "-01.mp4"), fake_mp4(rng, video_bytes))
+
+    xml_parts.append("</LaunchBox>\n")
+    _write_text(os.path.join(root, "Teknoparrot.xml"), "".join(xml_parts))
+    return profile_ids
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="生成用于基准测试的模拟 LaunchBox / TeknoParrot 游戏库")
+    parser.add_argument("root", help="输出目录")
+    parser.add_argument("--games", type=int, default=1000, help="游戏数量（默认 1000）")
+    parser.add_argument("--seed", type=int, default=1, help="随机种子（默认 1）")
+    parser.add_argument("--media-bytes", type=int, default=2048, help="每张图片的大小（默认 2048 字节）")
+    parser.add_argument("--video-bytes", type=int, default=8192, help="每个视频的大小（默认 8192 字节）")
+    args = parser.parse_args()
+
+    ids = generate_library(args.root, args.games, args.seed, args.media_bytes, args.video_bytes)
+    print("已生成模拟游戏库:", os.path.abspath(args.root), "游戏数:", len(ids))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,673 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+监视模式：常驻运行，源目录中出现新文件（或文件被改名、修改）时只处理受影响的条目，
+不必每次手动重新运行对应脚本、重新扫描整个媒体库。
+
+使用方式（在 TeknoParrotBigBox 目录下运行，Ctrl+C 退出）:
+
+    python watch_media.py
+    python watch_media.py --interval 0.2 --debounce 0.5
+    python watch_media.py --no-initial-sync        # 启动时不先做一次增量同步
+    python watch_media.py --link hard              # 视频改为硬链接（同 media_ingest.py videos --link）
+    python watch_media.py --rank-covers            # 多张候选封面时按图片尺寸挑选（见 cover_rank.py）
+
+监视的位置与对应动作:
+    covers/Box - 3D、covers/Arcade - Cabinet   同 rename_covers_from_box3d.py：复制到 Media/Covers
+    coverdata                                  同 rename_covers_from_coverdata.py：复制到 Media/Covers
+    videos                                     同 rename_videos_from_launchbox.py：移动到 Media/Videos
+    bat                                        重新解析该 bat，重新处理用到它的游戏的封面与视频
+    UserProfiles、UserProfiles_by_genre        重新读取该 profile XML，重新匹配它的 coverdata 封面
+    Teknoparrot.xml                            重新读取，只处理新增或 ApplicationPath 有变化的游戏
+
+- LaunchBox 标题表、bat -> profileId、profile 信息以及各源目录按匹配 key 的索引都常驻内存；
+  事件到达时只更新对应的那一项，再只为受影响的游戏 / profile 生成复制任务。
+- 事件来源：安装了 watchdog（pip install watchdog）时使用系统的文件变更通知；
+  否则每 --interval 秒（默认 0.25）用 scandir 比较一次各目录的快照（mtime + size）。
+- 去抖：收到事件后，等到连续 --debounce 秒（默认 0.3）没有新事件再处理这一批，
+  但最多等 --max-wait 秒（默认 5）。仍在写入的大文件会持续产生事件，因此会等它写完。
+- 复制总是增量的（目标与源一致时跳过）；每批只涉及部分条目，因此忽略 --prune。
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import rename_covers_from_box3d as covers
+import rename_covers_from_coverdata as coverdata
+import rename_videos_from_launchbox as videos
+from cover_rank import add_rank_arguments, open_ranker_from_args
+from launchbox_xml import iter_launchbox_games
+from match_keys import normalize_for_match
+from media_metrics import add_metrics_arguments, finish_metrics, stage
+from media_transfer import (
+    OP_COPY,
+    OP_MOVE,
+    TransferTask,
+    add_transfer_arguments,
+    run_transfers_from_args,
+)
+from profile_cache import (
+    BatDirectory,
+    ProfileResolutionCache,
+    add_cache_arguments,
+    open_cache_from_args,
+)
+from profile_scanner import add_scanner_arguments, read_profile_info
+from substring_index import SubstringIndex
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # watchdog 为可选依赖，未安装时轮询
+    FileSystemEventHandler = object
+    Observer = None
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+COVERDATA_DIR = os.path.join(BASE_DIR, "coverdata")
+
+BOX3D_IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+COVERDATA_IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+
+# 事件分类
+SOURCE_BOX3D = "box3d"
+SOURCE_ARCADE = "arcade"
+SOURCE_COVERDATA = "coverdata"
+SOURCE_VIDEOS = "videos"
+SOURCE_BAT = "bat"
+SOURCE_PROFILES = "profiles"
+SOURCE_XML = "xml"
+
+# watchdog 中不代表内容变化的事件
+_IGNORED_EVENT_TYPES = ("opened", "closed_no_write")
+
+
+def _norm(path: str) -> str:
+    return os.path.normcase(os.path.abspath(path))
+
+
+class WatchTargets(object):
+    """
+    被监视的目录 / 文件，以及「路径 -> 事件分类」的判断。
+    UserProfiles 两个目录递归监视（按分类子目录存放），其余目录只看第一层。
+    """
+
+    def __init__(self, coverdata_dir: str = COVERDATA_DIR):
+        self.dirs: List[Tuple[str, str, bool]] = [
+            (covers.BOX3D_DIR, SOURCE_BOX3D, False),
+            (covers.ARCADE_DIR, SOURCE_ARCADE, False),
+            (coverdata_dir, SOURCE_COVERDATA, False),
+            (videos.VIDEOS_DIR, SOURCE_VIDEOS, False),
+            (covers.BAT_DIR, SOURCE_BAT, False),
+        ]
+        self.dirs.extend((d, SOURCE_PROFILES, True) for d in covers.USER_PROFILES_DIRS)
+        self.files: List[Tuple[str, str]] = [(covers.LAUNCHBOX_XML, SOURCE_XML)]
+        self._by_dir = {_norm(d): (source, recursive) for d, source, recursive in self.dirs}
+        self._by_file = {_norm(f): source for f, source in self.files}
+
+    def _find_root(self, path: str) -> Tuple[Optional[str], Optional[str]]:
+        """返回 (所在的被监视目录, 事件分类)；不在监视范围内时为 (None, None)。"""
+        full = _norm(path)
+        source = self._by_file.get(full)
+        if source is not None:
+            return os.path.dirname(full), source
+        parent = os.path.dirname(full)
+        while True:
+            hit = self._by_dir.get(parent)
+            if hit is not None:
+                if hit[1] or parent == os.path.dirname(full):
+                    return parent, hit[0]
+                return None, None
+            up = os.path.dirname(parent)
+            if up == parent:
+                return None, None
+            parent = up
+
+    def classify(self, path: str) -> Optional[str]:
+        """返回路径所属的事件分类；不在监视范围内时返回 None。"""
+        return self._find_root(path)[1]
+
+    def genre_folder(self, path: str) -> str:
+        """与 list_profile_files 相同：profile XML 相对所在根目录的第一级目录名。"""
+        root = self._find_root(path)[0]
+        if root is None:
+            return ""
+        rel = os.path.relpath(os.path.dirname(_norm(path)), root)
+        return "" if rel == os.curdir else rel.split(os.sep)[0]
+
+
+class PollingWatcher(object):
+    """每 interval 秒比较一次各目录的 scandir 快照，把变化的路径交给 sink。"""
+
+    def __init__(self, targets: WatchTargets, sink: Callable[[str], None], interval: float):
+        self.targets = targets
+        self.sink = sink
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._snapshot = self._take_snapshot()
+
+    def _scan_dir(self, root: str, recursive: bool, out: Dict[str, Tuple[int, int]]) -> None:
+        try:
+            it = os.scandir(root)
+        except OSError:
+            return
+        with it:
+            for entry in it:
+                try:
+                    if entry.is_dir():
+                        if recursive:
+                            self._scan_dir(entry.path, True, out)
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    continue
+                out[entry.path] = (st.st_mtime_ns, st.st_size)
+
+    def _take_snapshot(self) -> Dict[str, Tuple[int, int]]:
+        snapshot: Dict[str, Tuple[int, int]] = {}
+        for root, _source, recursive in self.targets.dirs:
+            self._scan_dir(root, recursive, snapshot)
+        for path, _source in self.targets.files:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            snapshot[path] = (st.st_mtime_ns, st.st_size)
+        return snapshot
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            current = self._take_snapshot()
+            previous = self._snapshot
+            for path, sig in current.items():
+                if previous.get(path) != sig:
+                    self.sink(path)
+            for path in previous:
+                if path not in current:
+                    self.sink(path)
+            self._snapshot = current
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="media-poll", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+class _EventHandler(FileSystemEventHandler):
+    def __init__(self, sink: Callable[[str], None]):
+        super(_EventHandler, self).__init__()
+        self.sink = sink
+
+    def on_any_event(self, event) -> None:
+        if event.is_directory or event.event_type in _IGNORED_EVENT_TYPES:
+            return
+        self.sink(os.fsdecode(event.src_path))
+        dest_path = getattr(event, "dest_path", None)
+        if dest_path:
+            self.sink(os.fsdecode(dest_path))
+
+
+class NotifyWatcher(object):
+    """基于 watchdog 的系统文件通知；启动时不存在的目录无法监视（之后创建也不会被发现）。"""
+
+    def __init__(self, targets: WatchTargets, sink: Callable[[str], None]):
+        self.observer = Observer()
+        handler = _EventHandler(sink)
+        scheduled: Set[str] = set()
+        for root, _source, recursive in targets.dirs:
+            if os.path.isdir(root):
+                self.observer.schedule(handler, root, recursive=recursive)
+                scheduled.add(_norm(root))
+        # 单个文件（Teknoparrot.xml）通过监视其所在目录获得事件，由 classify 过滤
+        for path, _source in targets.files:
+            parent = os.path.dirname(os.path.abspath(path))
+            if _norm(parent) not in scheduled and os.path.isdir(parent):
+                self.observer.schedule(handler, parent, recursive=False)
+                scheduled.add(_norm(parent))
+
+    def start(self) -> None:
+        self.observer.start()
+
+    def stop(self) -> None:
+        self.observer.stop()
+        self.observer.join()
+
+
+def next_batch(events: "queue.Queue[str]", debounce: float, max_wait: float) -> Set[str]:
+    """
+    阻塞到第一个事件，然后继续收集，直到连续 debounce 秒没有新事件
+    （或自第一个事件起已过 max_wait 秒）；返回这一批去重后的路径。
+    """
+    batch: Set[str] = set()
+    while not batch:
+        # 带超时地等待，Windows 上 Ctrl+C 才能及时生效
+        try:
+            batch.add(events.get(timeout=0.5))
+        except queue.Empty:
+            continue
+    deadline = time.monotonic() + max_wait
+    while True:
+        remaining = min(debounce, deadline - time.monotonic())
+        if remaining <= 0:
+            return batch
+        try:
+            batch.add(events.get(timeout=remaining))
+        except queue.Empty:
+            return batch
+
+
+class WatchSession(object):
+    """
+    常驻内存的索引，以及把一批变化的路径转换为复制 / 移动任务的逻辑。
+    """
+
+    def __init__(
+        self,
+        args: argparse.Namespace,
+        cache: ProfileResolutionCache,
+        targets: WatchTargets,
+    ):
+        self.args = args
+        self.cache = cache
+        self.targets = targets
+        self.video_op = OP_COPY if args.link else OP_MOVE
+
+        with stage("xml_load"):
+            self.games = self._load_games()
+        print("LaunchBox 中读取到游戏条目数:", len(self.games))
+        self._index_games()
+
+        self.bats: Optional[BatDirectory] = None
+        self.title_to_profile: Dict[str, str] = {}
+        with stage("profile_resolution"):
+            if os.path.isdir(covers.BAT_DIR):
+                self.bats = BatDirectory(covers.BAT_DIR, cache)
+                self.bats.prefetch(limit=args.io_concurrency)
+            else:
+                print("未找到 bat 目录，封面按标题匹配 profileId，视频不处理")
+                self.title_to_profile = covers.load_title_to_profile_without_bat(
+                    cache, args.profile_jobs, args.io_concurrency
+                )
+            self.profiles = coverdata.load_profiles(
+                covers.USER_PROFILES_DIRS, cache, args.profile_jobs, args.io_concurrency
+            )
+        print("已加载 profile 数量:", len(self.profiles))
+
+        with stage("media_scan"):
+            self.box3d_images = covers.load_image_dir(covers.BOX3D_DIR)
+            self.arcade_images = covers.load_image_dir(covers.ARCADE_DIR)
+            self.video_files = videos.load_video_files()
+            self.coverdata_images = coverdata.load_images(args.coverdata)
+        self.cover_mapping: Dict[str, List[str]] = {}
+        for key in set(self.box3d_images) | set(self.arcade_images):
+            self._merge_cover_key(key)
+        with stage("index_build"):
+            self.substring_index = SubstringIndex(list(self.coverdata_images))
+        self.coverdata_matched: Dict[str, str] = {}
+        self.ranker = open_ranker_from_args(args, cache)
+        if self.ranker is not None:
+            with stage("matching"):
+                self.ranker.prefetch(covers.multi_candidate_paths(self.games, self.cover_mapping))
+        print("监视中的封面条目数: Box - 3D {}，Arcade - Cabinet {}，coverdata {}；视频 {}".format(
+            len(self.box3d_images), len(self.arcade_images),
+            len(self.coverdata_images), len(self.video_files),
+        ))
+
+    # ---- 索引 ----
+
+    def _load_games(self) -> Dict[str, Dict[str, str]]:
+        if not os.path.isfile(covers.LAUNCHBOX_XML):
+            return {}
+        return covers.games_by_title(
+            iter_launchbox_games(covers.LAUNCHBOX_XML, ("Title", "ApplicationPath"))
+        )
+
+    def _index_games(self) -> None:
+        """标准化标题 -> [标题]，bat 文件名 -> [标题]。"""
+        self.titles_by_key: Dict[str, List[str]] = {}
+        self.titles_by_bat: Dict[str, List[str]] = {}
+        for title, info in self.games.items():
+            self.titles_by_key.setdefault(covers.normalize_title(title), []).append(title)
+            bat_name = os.path.normcase(os.path.basename(info["app_path"]))
+            self.titles_by_bat.setdefault(bat_name, []).append(title)
+
+    def _merge_cover_key(self, key: str) -> None:
+        """与 load_cover_mapping 相同：Box - 3D 的候选在前，Arcade - Cabinet 的在后。"""
+        merged = self.box3d_images.get(key, []) + self.arcade_images.get(key, [])
+        if merged:
+            self.cover_mapping[key] = merged
+        else:
+            self.cover_mapping.pop(key, None)
+
+    @staticmethod
+    def _update_listing(
+        mapping: Dict[str, List[str]],
+        key: str,
+        path: str,
+        extensions: Tuple[str, ...],
+    ) -> bool:
+        """按文件当前是否存在，在 mapping[key] 中加入或移除 path；返回是否有变化。"""
+        paths = mapping.get(key, [])
+        present = path.lower().endswith(extensions) and os.path.isfile(path)
+        if present == (path in paths):
+            return False
+        if present:
+            mapping.setdefault(key, []).append(path)
+        else:
+            paths.remove(path)
+            if not paths:
+                del mapping[key]
+        return True
+
+    # ---- 任务生成 ----
+
+    def _cover_tasks(self, titles: Set[str]) -> List[TransferTask]:
+        subset = {t: self.games[t] for t in titles if t in self.games}
+        if not subset:
+            return []
+        if self.bats is None and not self.title_to_profile:
+            return []
+        tasks, _skipped = covers.plan_cover_tasks(
+            subset, self.cover_mapping, self.bats, self.title_to_profile, ranker=self.ranker
+        )
+        return tasks
+
+    def _video_tasks(self, titles: Set[str]) -> List[TransferTask]:
+        subset = {t: self.games[t] for t in titles if t in self.games}
+        if not subset or self.bats is None:
+            return []
+        tasks, _skipped = videos.plan_video_tasks(
+            subset, self.video_files, self.bats, self.video_op
+        )
+        # 移动任务的源可能已被上一批移走
+        return [t for t in tasks if os.path.isfile(t.src)]
+
+    def _coverdata_tasks(self, profile_ids: Set[str]) -> List[TransferTask]:
+        tasks: List[TransferTask] = []
+        for profile_id in sorted(profile_ids):
+            info = self.profiles.get(profile_id)
+            if info is None:
+                self.coverdata_matched.pop(profile_id, None)
+                continue
+            with stage("matching"):
+                src_image = coverdata.find_matching_image(
+                    profile_id, info.get("game_name", ""),
+                    self.coverdata_images, self.substring_index, self.ranker,
+                )
+            if not src_image:
+                self.coverdata_matched.pop(profile_id, None)
+                continue
+            self.coverdata_matched[profile_id] = src_image
+            dest_path = coverdata.dest_path_for(profile_id, src_image, covers.DEST_COVERS_DIR)
+            tasks.append(TransferTask(src_image, dest_path))
+        return tasks
+
+    def _profiles_related_to(self, image_key: str) -> Set[str]:
+        """新增 / 删除图片 key 后可能改变匹配结果的 profile（与 find_matching_image 的规则一致）。"""
+        related: Set[str] = set()
+        for profile_id, info in self.profiles.items():
+            for key in (normalize_for_match(profile_id), normalize_for_match(info.get("game_name", ""))):
+                if key and (key in image_key or image_key in key):
+                    related.add(profile_id)
+                    break
+        return related
+
+    # ---- 事件处理 ----
+
+    def initial_sync(self) -> None:
+        """启动时对全部条目做一次增量同步（目标已是最新时只做 stat）。"""
+        titles = set(self.games)
+        self.place(
+            self._cover_tasks(titles),
+            self._coverdata_tasks(set(self.profiles)),
+            self._video_tasks(titles),
+        )
+
+    def handle(self, paths: Set[str]) -> None:
+        cover_titles: Set[str] = set()
+        video_titles: Set[str] = set()
+        coverdata_profiles: Set[str] = set()
+        coverdata_keys_changed = False
+        reload_xml = False
+        reload_title_profiles = False
+
+        for path in sorted(paths):
+            source = self.targets.classify(path)
+            fname = os.path.basename(path)
+            if source in (SOURCE_BOX3D, SOURCE_ARCADE):
+                images = self.box3d_images if source == SOURCE_BOX3D else self.arcade_images
+                key = covers.normalize_title(fname)
+                changed = self._update_listing(images, key, path, BOX3D_IMAGE_EXTENSIONS)
+                if changed:
+                    self._merge_cover_key(key)
+                if self.ranker is not None:
+                    # 按尺寸挑选时，已有图片被改写也可能改变选中的候选
+                    self.ranker.forget(path)
+                    changed = changed or key in self.cover_mapping
+                if changed:
+                    cover_titles.update(self.titles_by_key.get(key, ()))
+            elif source == SOURCE_VIDEOS:
+                key = videos.normalize_title(fname)
+                if self._update_listing(self.video_files, key, path, videos.VIDEO_EXTENSIONS):
+                    video_titles.update(self.titles_by_key.get(key, ()))
+            elif source == SOURCE_COVERDATA:
+                key = normalize_for_match(os.path.splitext(fname)[0])
+                had_key = key in self.coverdata_images
+                changed = self._update_listing(
+                    self.coverdata_images, key, path, COVERDATA_IMAGE_EXTENSIONS
+                )
+                if self.ranker is not None:
+                    self.ranker.forget(path)
+                    changed = changed or key in self.coverdata_images
+                if changed:
+                    coverdata_keys_changed |= had_key != (key in self.coverdata_images)
+                    coverdata_profiles.update(self._profiles_related_to(key))
+                    coverdata_profiles.update(
+                        pid for pid, src in self.coverdata_matched.items() if src == path
+                    )
+            elif source == SOURCE_BAT and self.bats is not None:
+                if not fname.lower().endswith(".bat"):
+                    continue
+                self.bats.refresh(fname)
+                titles = self.titles_by_bat.get(os.path.normcase(fname), ())
+                cover_titles.update(titles)
+                video_titles.update(titles)
+            elif source == SOURCE_PROFILES:
+                if not fname.lower().endswith(".xml"):
+                    continue
+                profile_id = os.path.splitext(fname)[0]
+                self._reload_profile(profile_id, path)
+                coverdata_profiles.add(profile_id)
+                reload_title_profiles = self.bats is None
+            elif source == SOURCE_XML:
+                reload_xml = True
+
+        if reload_xml:
+            changed = self._reload_games()
+            cover_titles.update(changed)
+            video_titles.update(changed)
+        if reload_title_profiles:
+            # 无 bat 时封面按标题匹配 profileId，profile 变化会影响任意游戏
+            with stage("profile_resolution"):
+                self.title_to_profile = covers.load_title_to_profile_without_bat(
+                    self.cache, self.args.profile_jobs, self.args.io_concurrency
+                )
+            cover_titles.update(self.games)
+        if coverdata_keys_changed:
+            with stage("index_build"):
+                self.substring_index = SubstringIndex(list(self.coverdata_images))
+
+        self.place(
+            self._cover_tasks(cover_titles),
+            self._coverdata_tasks(coverdata_profiles),
+            self._video_tasks(video_titles),
+        )
+        self.cache.save()
+
+    def _reload_profile(self, profile_id: str, path: str) -> None:
+        if not os.path.isfile(path):
+            self.profiles.pop(profile_id, None)
+            return
+        try:
+            info = read_profile_info(path)
+        except Exception:
+            self.profiles.pop(profile_id, None)
+            return
+        game_path = info["game_path"]
+        game_name = coverdata.extract_game_name_from_path(game_path) if game_path else None
+        self.profiles[profile_id] = {
+            "game_name": game_name or "",
+            "path": path,
+            "genre_folder": self.targets.genre_folder(path),
+            "game_genre": info["game_genre"],
+        }
+
+    def _reload_games(self) -> Set[str]:
+        """重新读取 Teknoparrot.xml，返回新增或 ApplicationPath 变化的标题。"""
+        with stage("xml_load"):
+            games = self._load_games()
+        if not games:
+            return set()  # 可能正在被改写，保留旧表，等下一次事件
+        changed = {t for t, info in games.items() if self.games.get(t) != info}
+        self.games = games
+        self._index_games()
+        print("Teknoparrot.xml 已重新读取，游戏条目数 {}，新增或变化 {}".format(len(games), len(changed)))
+        return changed
+
+    def place(
+        self,
+        cover_tasks: List[TransferTask],
+        coverdata_tasks: List[TransferTask],
+        video_tasks: List[TransferTask],
+    ) -> None:
+        for tasks, dest_dir, owner in (
+            (cover_tasks, covers.DEST_COVERS_DIR, "box3d"),
+            (coverdata_tasks, covers.DEST_COVERS_DIR, "coverdata"),
+            (video_tasks, videos.DEST_VIDEOS_DIR, "videos"),
+        ):
+            if not tasks:
+                continue
+            if not os.path.isdir(dest_dir):
+                os.makedirs(dest_dir)
+            with stage("transfer"):
+                results = run_transfers_from_args(self.args, tasks, dest_dir, owner)
+                stale = videos.remove_stale_videos(results) if owner == "videos" else []
+            stamp = time.strftime("%H:%M:%S")
+            for path in stale:
+                print("[{}] 删除旧扩展名的视频: {}".format(stamp, os.path.relpath(path, BASE_DIR)))
+            for result in results:
+                task = result.task
+                if not result.ok:
+                    print("[{}] 处理失败: {} -> {} 错误: {}".format(stamp, task.src, task.dest, result.error))
+                elif not result.unchanged:
+                    print("[{}] {} -> {}".format(
+                        stamp, os.path.basename(task.src), os.path.relpath(task.dest, BASE_DIR)
+                    ))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="常驻监视封面 / 视频源目录、bat、UserProfiles 与 Teknoparrot.xml，增量导入新媒体"
+    )
+    parser.add_argument(
+        "--coverdata",
+        default=COVERDATA_DIR,
+        help="coverdata 源图片目录（默认: ./coverdata）",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=0.25,
+        help="未安装 watchdog 时的轮询间隔，单位秒（默认 0.25）",
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=0.3,
+        help="连续多少秒没有新事件后处理这一批（默认 0.3）",
+    )
+    parser.add_argument(
+        "--max-wait",
+        type=float,
+        default=5.0,
+        help="一批事件最多等待的秒数（默认 5）",
+    )
+    parser.add_argument(
+        "--poll",
+        action="store_true",
+        help="即使安装了 watchdog 也使用轮询（网络共享目录上系统通知可能不可靠）",
+    )
+    parser.add_argument(
+        "--no-initial-sync",
+        action="store_true",
+        help="启动时不对现有文件做增量同步，只处理之后的变化",
+    )
+    add_cache_arguments(parser)
+    add_scanner_arguments(parser)
+    add_rank_arguments(parser)
+    add_transfer_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+
+    if args.prune:
+        print("监视模式每次只处理部分条目，忽略 --prune")
+    args.prune = False
+    args.incremental = True
+
+    if not os.path.isfile(covers.LAUNCHBOX_XML):
+        print("未找到 Teknoparrot.xml:", covers.LAUNCHBOX_XML)
+        return 1
+
+    cache = open_cache_from_args(args)
+    targets = WatchTargets(args.coverdata)
+    session = WatchSession(args, cache, targets)
+    if not args.no_initial_sync:
+        print("启动时增量同步 ...")
+        session.initial_sync()
+    cache.save()
+
+    events: "queue.Queue[str]" = queue.Queue()
+
+    def sink(path: str) -> None:
+        if targets.classify(path) is not None:
+            events.put(path)
+
+    if Observer is not None and not args.poll:
+        watcher = NotifyWatcher(targets, sink)
+        print("使用 watchdog 监视文件变化（Ctrl+C 退出）")
+    else:
+        watcher = PollingWatcher(targets, sink, args.interval)
+        print("每 {:g} 秒轮询一次文件变化（Ctrl+C 退出）".format(args.interval))
+
+    watcher.start()
+    try:
+        while True:
+            batch = next_batch(events, args.debounce, args.max_wait)
+            try:
+                session.handle(batch)
+            except Exception as exc:
+                # 单批处理失败（如文件被占用、目标目录暂不可写）不终止监视，等下次变化再处理
+                print("处理本批变化时出错:", exc, "（共 {} 个路径，继续监视）".format(len(batch)))
+    except KeyboardInterrupt:
+        print("\n已停止监视。")
+    finally:
+        watcher.stop()
+        cache.save()
+        finish_metrics(args, "watch_media")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())